@@ -0,0 +1,75 @@
+"""
+Measures what importing the persistence package costs compared with the
+first use of the repository.
+
+Run with `python -m benchmarks.boot_time`. For every backend a fresh
+interpreter, started in a temporary directory holding N stored countries,
+reports the milliseconds taken to import `src.persistence` (what CLI
+commands, migrations and tests pay) and then to build and load the
+repository on its first use.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+N = 100_000
+BACKENDS = ("memory", "file", "pickle", "kv", "sqlite")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import time
+start = time.perf_counter()
+from src.persistence import repo
+imported = time.perf_counter()
+repo.get_all("country")
+used = time.perf_counter()
+print((imported - start) * 1e3, (used - imported) * 1e3)
+"""
+
+
+def populate(kind: str) -> None:
+    """Stores N countries with a backend in the current directory"""
+    from src.persistence import build_repository
+    from src.persistence.records import Country
+
+    repository = build_repository(kind)
+    repository.save_many(
+        [Country(id=str(uuid.uuid4()), name=f"Country {i}") for i in range(N)]
+    )
+    repository.flush()
+
+    close = getattr(repository, "close", None)
+    if close is not None:
+        close()
+
+
+def run(kind: str) -> tuple[float, float]:
+    """Returns the import and first use milliseconds of a backend"""
+    env = dict(os.environ, REPOSITORY=kind, PYTHONPATH=ROOT)
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    imported, used = output.split()[-2:]
+
+    return float(imported), float(used)
+
+
+if __name__ == "__main__":
+    print(f"{N} countries stored")
+    print(f"{'backend':<8} {'import (ms)':>12} {'first use (ms)':>15}")
+
+    for kind in BACKENDS:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            populate(kind)
+            imported, used = run(kind)
+            print(f"{kind:<8} {imported:>12.1f} {used:>15.1f}")
@@ -0,0 +1,112 @@
+"""
+Compares the bulk repository operations with a loop of single operations,
+alone and inside `repo.transaction()`.
+
+Run with `python -m benchmarks.bulk_operations`. Each backend works in a
+temporary directory (the database one in an SQLite file there), and every
+row reports the seconds taken to save, update and delete N countries.
+"""
+
+import os
+import tempfile
+import time
+import uuid
+
+N = 1_000
+
+
+def countries() -> list:
+    """Builds N countries that are not stored anywhere yet"""
+    from src.models.country import Country
+
+    return [
+        Country(id=str(uuid.uuid4()), name=f"Country {i}") for i in range(N)
+    ]
+
+
+def timed(action) -> float:
+    """Returns the seconds an action takes"""
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def run(repo) -> tuple[float, float, float]:
+    """
+    Returns the (loop, bulk, transaction) seconds to save, update and
+    delete N objects
+    """
+    objs = countries()
+    loop = (
+        timed(lambda: [repo.save(obj) for obj in objs])
+        + timed(lambda: [repo.update(obj) for obj in objs])
+        + timed(lambda: [repo.delete(obj) for obj in objs])
+    )
+
+    objs = countries()
+    bulk = (
+        timed(lambda: repo.save_many(objs))
+        + timed(lambda: repo.update_many(objs))
+        + timed(lambda: repo.delete_many(objs))
+    )
+
+    def in_transaction(action):
+        """Runs an action inside a single transaction"""
+        with repo.transaction():
+            action()
+
+    objs = countries()
+    transaction = (
+        timed(lambda: in_transaction(lambda: [repo.save(o) for o in objs]))
+        + timed(lambda: in_transaction(lambda: [repo.update(o) for o in objs]))
+        + timed(lambda: in_transaction(lambda: [repo.delete(o) for o in objs]))
+    )
+
+    return loop, bulk, transaction
+
+
+def backends():
+    """Yields (name, repository factory) for every backend"""
+    from src.persistence.file import FileRepository
+    from src.persistence.memory import MemoryRepository
+    from src.persistence.pickled import PickleRepository
+    from src.persistence.sqlite import SQLiteRepository
+
+    yield "memory", MemoryRepository
+    yield "file", lambda: FileRepository(journal=False)
+    yield "file (journal)", lambda: FileRepository(journal=True)
+    yield "pickle", PickleRepository
+    yield "sqlite", SQLiteRepository
+    yield "db", None
+
+
+def run_db() -> tuple[float, float, float]:
+    """Runs the benchmark on DBRepository inside an application context"""
+    from src import create_app, db
+    from src.persistence.db import DBRepository
+
+    app = create_app("Testing")
+    app.config["SQLALCHEMY_ECHO"] = False
+
+    with app.app_context():
+        db.create_all()
+        return run(DBRepository())
+
+
+if __name__ == "__main__":
+    print(
+        f"{'backend':<16} {'loop (s)':>10} {'bulk (s)':>10}"
+        f" {'transaction (s)':>16}"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+
+        for name, factory in backends():
+            loop, bulk, transaction = (
+                run_db() if factory is None else run(factory())
+            )
+            print(
+                f"{name:<16} {loop:>10.3f} {bulk:>10.3f}"
+                f" {transaction:>16.3f}"
+            )
@@ -0,0 +1,124 @@
+"""
+Measures how long the caches of other processes keep serving an object
+after one process writes its model through an InvalidationBus.
+
+Run with `python -m benchmarks.cache_invalidation`. Each reader process
+keeps reading a cached place, and reports the time between the writer
+publishing a change and its next read missing the cache. It also reports
+the cost the bus adds to a cached read.
+"""
+
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+import timeit
+import uuid
+
+from src.persistence.cache import CachingRepository
+from src.persistence.invalidation import InvalidationBus
+from src.persistence.memory import MemoryRepository
+
+READERS = 4
+ROUNDS = 200
+LOOKUPS = 100_000
+
+
+class Place:
+    """Minimal stand-in for a place, only the id matters here"""
+
+    __slots__ = ("id", "created_at", "updated_at")
+
+    def __init__(self, id: str) -> None:
+        """Creates a place with the given id"""
+        self.id = id
+        self.created_at = None
+        self.updated_at = None
+
+
+def reader(path, place_id, published, latencies, done) -> None:
+    """Reads a cached place until stopped, reporting every invalidation"""
+    repo = MemoryRepository()
+    repo.save(Place(place_id))
+    cache = CachingRepository(repo, bus=InvalidationBus(path))
+    cache.get("place", place_id)
+    latencies.put(None)
+
+    misses = cache.misses
+
+    while not done.is_set():
+        cache.get("place", place_id)
+
+        if cache.misses != misses:
+            latencies.put(time.monotonic() - published.value)
+            misses = cache.misses
+
+
+def cached_read_cost(path: str, place_id: str) -> tuple[float, float]:
+    """Returns the cached `get` latency in nanoseconds without/with a bus"""
+    results = []
+
+    for bus in (None, InvalidationBus(path)):
+        repo = MemoryRepository()
+        repo.save(Place(place_id))
+        cache = CachingRepository(repo, bus=bus)
+        elapsed = timeit.timeit(
+            lambda: cache.get("place", place_id), number=LOOKUPS
+        )
+        results.append(elapsed / LOOKUPS * 1e9)
+
+    return results[0], results[1]
+
+
+def run() -> None:
+    """Publishes ROUNDS changes and prints the invalidation latencies"""
+    place_id = str(uuid.uuid4())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.generations")
+        bus = InvalidationBus(path)
+        published = multiprocessing.Value("d", 0.0, lock=False)
+        latencies = multiprocessing.Queue()
+        done = multiprocessing.Event()
+        readers = [
+            multiprocessing.Process(
+                target=reader,
+                args=(path, place_id, published, latencies, done),
+            )
+            for _ in range(READERS)
+        ]
+
+        for process in readers:
+            process.start()
+
+        # Every reader has cached the place
+        for _ in readers:
+            latencies.get()
+
+        samples = []
+
+        for _ in range(ROUNDS):
+            published.value = time.monotonic()
+            bus.publish("place")
+            samples.extend(latencies.get() for _ in readers)
+
+        done.set()
+
+        for process in readers:
+            process.join()
+
+        without_bus, with_bus = cached_read_cost(path, place_id)
+
+    samples = sorted(sample * 1e6 for sample in samples)
+    p99 = samples[int(len(samples) * 0.99)]
+    print(f"{READERS} readers, {ROUNDS} writes")
+    print(f"invalidation latency median: {statistics.median(samples):.1f} us")
+    print(f"invalidation latency p99:    {p99:.1f} us")
+    print(f"invalidation latency max:    {samples[-1]:.1f} us")
+    print(f"cached get without bus: {without_bus:.0f} ns")
+    print(f"cached get with bus:    {with_bus:.0f} ns")
+
+
+if __name__ == "__main__":
+    run()
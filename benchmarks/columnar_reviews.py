@@ -0,0 +1,79 @@
+"""
+Compares MemoryRepository storing reviews as records with its columnar
+review store.
+
+Run with `python -m benchmarks.columnar_reviews`. N reviews spread over
+PLACES places and USERS users are saved in each mode. Every row reports
+the bytes per review held by the repository and the milliseconds taken by
+`find_by` on a place and on a user. Filtering is vectorized when numpy is
+installed.
+"""
+
+from datetime import datetime, timedelta
+import gc
+import random
+import time
+import tracemalloc
+import uuid
+
+from src.persistence.columnar import numpy
+from src.persistence.memory import MemoryRepository
+from src.persistence.records import Review
+
+N = 1_000_000
+PLACES = 10_000
+USERS = 100_000
+LOOKUPS = 20
+
+
+def reviews() -> list:
+    """Builds N reviews"""
+    places = [str(uuid.uuid4()) for _ in range(PLACES)]
+    users = [str(uuid.uuid4()) for _ in range(USERS)]
+    start = datetime(2024, 1, 1)
+
+    return [
+        Review(
+            place_id=random.choice(places),
+            user_id=random.choice(users),
+            text=f"Review number {i}, a nice place to stay",
+            created_at=start + timedelta(seconds=i),
+        )
+        for i in range(N)
+    ]
+
+
+def run(columnar: bool, objs: list) -> tuple[float, float, float]:
+    """Returns the bytes per review and the place and user lookup times"""
+    gc.collect()
+    tracemalloc.start()
+    repo = MemoryRepository(columnar=columnar)
+
+    # Stored copies, so the records of `objs` are not counted
+    for obj in objs:
+        repo.save(Review(**obj.to_dict()))
+
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+
+    for field in ("place_id", "user_id"):
+        values = [getattr(random.choice(objs), field) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+
+        for value in values:
+            repo.find_by("review", field, value)
+
+        timings.append((time.perf_counter() - start) / LOOKUPS * 1e3)
+
+    return size / len(objs), timings[0], timings[1]
+
+
+if __name__ == "__main__":
+    objs = reviews()
+    print(f"{N} reviews, numpy {'on' if numpy is not None else 'off'}")
+    print(f"{'store':<10} {'bytes/obj':>10} {'place ms':>10} {'user ms':>10}")
+    for name, columnar in (("records", False), ("columnar", True)):
+        size, place, user = run(columnar, objs)
+        print(f"{name:<10} {size:>10.0f} {place:>10.2f} {user:>10.2f}")
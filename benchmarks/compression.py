@@ -0,0 +1,111 @@
+"""
+Compares the compression codecs of the file and pickle repositories.
+
+Run with `python -m benchmarks.compression`. For every codec and storage
+(FileRepository with a JSON or binary snapshot, PickleRepository) the same
+reviews are written in a fresh temporary directory. Every row reports the
+size on disk, the seconds to write everything, the milliseconds one save
+takes in journal mode (FileRepository only) and the seconds to reload.
+"""
+
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+import uuid
+
+REVIEWS = 50_000
+USERS = 2_000
+PLACES = 1_000
+JOURNAL_SAVES = 200
+
+
+def build() -> list:
+    """Builds reviews spread over some users and places"""
+    from src.persistence.records import Review
+
+    users = [str(uuid.uuid4()) for _ in range(USERS)]
+    places = [str(uuid.uuid4()) for _ in range(PLACES)]
+    start = datetime(2024, 1, 1)
+
+    return [
+        Review(
+            text=f"Review number {i}, a nice place to stay",
+            place_id=places[i % PLACES],
+            user_id=users[i % USERS],
+            created_at=start + timedelta(seconds=i),
+        )
+        for i in range(REVIEWS)
+    ]
+
+
+def timed(action) -> float:
+    """Returns the seconds an action takes"""
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def disk_usage(directory: str) -> int:
+    """Returns the bytes of every file under a directory"""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+def storages():
+    """Yields (name, factory taking the codec and journal mode)"""
+    from src.persistence.file import FileRepository
+    from src.persistence.pickled import PickleRepository
+
+    yield "file json", lambda codec, journal=False: FileRepository(
+        journal=journal, snapshot_format="json", codec=codec
+    )
+    yield "file binary", lambda codec, journal=False: FileRepository(
+        journal=journal, snapshot_format="binary", codec=codec
+    )
+    yield "pickle", lambda codec, journal=False: PickleRepository(
+        codec=codec
+    )
+
+
+def run(name: str, factory, codec: str, reviews: list) -> tuple:
+    """Returns the size, write, journal save and reload cost of a codec"""
+    from src.persistence.records import Review
+
+    repo = factory(codec)
+    write = timed(lambda: repo.save_many(reviews))
+    size = disk_usage(".")
+    reload = timed(lambda: factory(codec))
+    save = None
+
+    if name.startswith("file"):
+        repo = factory(codec, journal=True)
+        saves = [Review(text="New review") for _ in range(JOURNAL_SAVES)]
+        save = timed(lambda: [repo.save(obj) for obj in saves])
+        save = save / JOURNAL_SAVES * 1e3
+
+    return size, write, save, reload
+
+
+if __name__ == "__main__":
+    from src.persistence.codecs import CODECS
+
+    reviews = build()
+    print(
+        f"{'storage':<12} {'codec':<6} {'size (MB)':>10} {'write (s)':>10}"
+        f" {'save (ms)':>10} {'reload (s)':>11}"
+    )
+
+    for name, factory in storages():
+        for codec in CODECS:
+            with tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)
+                size, write, save, reload = run(name, factory, codec, reviews)
+                save = "-" if save is None else f"{save:.2f}"
+                print(
+                    f"{name:<12} {codec:<6} {size / 1e6:>10.2f}"
+                    f" {write:>10.2f} {save:>10} {reload:>11.2f}"
+                )
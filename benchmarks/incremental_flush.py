@@ -0,0 +1,75 @@
+"""
+Measures how the JSON snapshot of FileRepository is written once the
+encoded JSON of its objects is cached.
+
+Run with `python -m benchmarks.incremental_flush`. The reviews are written
+in a temporary directory, then every row reports the seconds to update a
+number of them in one transaction, which rewrites the snapshot once: the
+first row writes it with nothing cached, encoding every object, the others
+only encode the updated ones.
+"""
+
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+import uuid
+
+REVIEWS = 200_000
+UPDATES = (1, 10, 1_000, 50_000)
+
+
+def build() -> list:
+    """Builds the reviews of a mid-sized dataset"""
+    from src.persistence.records import Review
+
+    user_id = str(uuid.uuid4())
+    start = datetime(2024, 1, 1)
+
+    return [
+        Review(
+            text=f"Review number {i}, a nice place to stay",
+            place_id=str(uuid.uuid4()),
+            user_id=user_id,
+            created_at=start + timedelta(seconds=i),
+        )
+        for i in range(REVIEWS)
+    ]
+
+
+def timed(action) -> float:
+    """Returns the seconds an action takes"""
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def update(repo, reviews: list) -> None:
+    """Updates reviews in one transaction"""
+    with repo.transaction():
+        for review in reviews:
+            review.text = "Updated review"
+            repo.update(review)
+
+
+if __name__ == "__main__":
+    from src.persistence.file import FileRepository
+
+    reviews = build()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        repo = FileRepository(journal=False, snapshot_format="json")
+
+        with repo.transaction():
+            repo.save_many(reviews)
+
+        # Reloaded, so that nothing is cached yet
+        repo = FileRepository(journal=False, snapshot_format="json")
+        stored = repo.get_all("review")
+        print(f"{'updated':>8} {'write (s)':>10}")
+        print(f"{'all':>8} {timed(repo.compact):>10.2f}")
+
+        for count in UPDATES:
+            seconds = timed(lambda: update(repo, stored[:count]))
+            print(f"{count:>8} {seconds:>10.2f}")
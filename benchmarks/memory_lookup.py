@@ -0,0 +1,40 @@
+"""
+Measures MemoryRepository.get latency as the number of stored objects grows.
+
+Run with `python -m benchmarks.memory_lookup`. The latency should stay flat
+from 1k to 1M objects because objects are stored in an id-keyed dict.
+"""
+
+import random
+import timeit
+
+from src.persistence.memory import MemoryRepository
+from src.persistence.records import Review
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+LOOKUPS = 100_000
+
+
+def run(size: int) -> float:
+    """Returns the mean `get` latency in nanoseconds for `size` objects"""
+    repo = MemoryRepository()
+    ids = []
+
+    for _ in range(size):
+        review = repo.save(Review())
+        ids.append(review.id)
+
+    targets = [random.choice(ids) for _ in range(LOOKUPS)]
+    lookups = iter(targets)
+
+    elapsed = timeit.timeit(
+        lambda: repo.get("review", next(lookups)), number=LOOKUPS
+    )
+
+    return elapsed / LOOKUPS * 1e9
+
+
+if __name__ == "__main__":
+    print(f"{'objects':>10} {'get (ns)':>10}")
+    for size in SIZES:
+        print(f"{size:>10} {run(size):>10.0f}")
@@ -0,0 +1,106 @@
+"""
+Stress test of MemoryRepository shared by many threads.
+
+Run with `python -m benchmarks.memory_threads`. For each thread count,
+every thread runs a mix of reads (`get`, `find_by`, a page of `query`) and
+WRITE_RATIO writes (`save`, `update`, `delete`) on one repository for
+DURATION seconds. Every row reports the operations per second. After each
+run the secondary indexes must still agree with a full scan, otherwise the
+run is reported as corrupted.
+"""
+
+import random
+import threading
+import time
+import uuid
+
+from src.persistence.memory import MemoryRepository
+from src.persistence.records import Review
+
+THREADS = (1, 2, 4, 8, 16)
+DURATION = 3.0
+WRITE_RATIO = 0.1
+REVIEWS = 10_000
+PLACES = 100
+
+
+def work(repo, ids: list, places: list, deadline: float, counts: list):
+    """Runs random operations until the deadline, counting them"""
+    done = 0
+
+    while time.monotonic() < deadline:
+        if random.random() < WRITE_RATIO:
+            action = random.randrange(3)
+
+            if action == 0:
+                review = Review(
+                    place_id=random.choice(places), text="new review"
+                )
+                repo.save(review)
+                ids.append(review.id)
+            elif action == 1:
+                review = repo.get("review", random.choice(ids))
+                if review is not None:
+                    review.place_id = random.choice(places)
+                    repo.update(review)
+            else:
+                review = repo.get("review", random.choice(ids))
+                if review is not None:
+                    repo.delete(review)
+        else:
+            action = random.randrange(3)
+
+            if action == 0:
+                repo.get("review", random.choice(ids))
+            elif action == 1:
+                repo.find_by("review", "place_id", random.choice(places))
+            else:
+                repo.query(
+                    "review", order_by=("created_at", "id"), limit=20
+                )
+
+        done += 1
+
+    counts.append(done)
+
+
+def consistent(repo) -> bool:
+    """Whether the place index agrees with a scan of every review"""
+    reviews = repo.get_all("review")
+    places = {review.place_id for review in reviews}
+
+    return all(
+        sorted(r.id for r in repo.find_by("review", "place_id", place))
+        == sorted(r.id for r in reviews if r.place_id == place)
+        for place in places
+    )
+
+
+def run(threads: int) -> tuple[float, bool]:
+    """Returns the operations per second and whether the indexes held"""
+    repo = MemoryRepository()
+    places = [str(uuid.uuid4()) for _ in range(PLACES)]
+    reviews = [Review(place_id=random.choice(places)) for _ in range(REVIEWS)]
+    repo.save_many(reviews)
+    ids = [review.id for review in reviews]
+    counts: list[int] = []
+    deadline = time.monotonic() + DURATION
+    args = (repo, ids, places, deadline, counts)
+    workers = [
+        threading.Thread(target=work, args=args) for _ in range(threads)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+    return sum(counts) / DURATION, consistent(repo)
+
+
+if __name__ == "__main__":
+    print(f"{'threads':>8} {'ops/s':>10} {'consistent':>11}")
+    for threads in THREADS:
+        ops, ok = run(threads)
+        print(f"{threads:>8} {ops:>10.0f} {str(ok):>11}")
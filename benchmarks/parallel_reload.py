@@ -0,0 +1,82 @@
+"""
+Measures how the reload of a JSON snapshot scales with the number of
+worker processes of FileRepository.
+
+Run with `python -m benchmarks.parallel_reload`. The users, places and
+reviews are written once in a temporary directory, then every row reports
+the seconds to reload them with a number of workers and the speedup over
+the serial reload. Workers beyond the number of cores cannot help.
+"""
+
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+import uuid
+
+REVIEWS = 400_000
+USERS = 10_000
+PLACES = 5_000
+WORKERS = (1, 2, 4, 8)
+
+
+def build() -> list:
+    """Builds the records of a large dataset"""
+    from src.persistence.records import Place, Review, User
+
+    start = datetime(2024, 1, 1)
+    users = [
+        User(email=f"user{i}@example.com", password_hash=uuid.uuid4().hex)
+        for i in range(USERS)
+    ]
+    places = [
+        Place(name=f"Place {i}", city_id=str(uuid.uuid4()))
+        for i in range(PLACES)
+    ]
+    reviews = [
+        Review(
+            text=f"Review number {i}, a nice place to stay",
+            place_id=places[i % PLACES].id,
+            user_id=users[i % USERS].id,
+            created_at=start + timedelta(seconds=i),
+        )
+        for i in range(REVIEWS)
+    ]
+
+    return users + places + reviews
+
+
+def timed(action) -> float:
+    """Returns the seconds an action takes"""
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    from src.persistence.file import FileRepository
+
+    records = build()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        repo = FileRepository(journal=False, snapshot_format="json")
+
+        with repo.transaction():
+            repo.save_many(records)
+
+        del repo, records
+        print(f"{os.cpu_count()} cores")
+        print(f"{'workers':>8} {'reload (s)':>11} {'speedup':>8}")
+        serial = None
+
+        for workers in WORKERS:
+            seconds = timed(
+                lambda: FileRepository(
+                    journal=False,
+                    snapshot_format="json",
+                    reload_workers=workers,
+                )
+            )
+            serial = serial or seconds
+            print(f"{workers:>8} {seconds:>11.2f} {serial / seconds:>7.1f}x")
@@ -0,0 +1,94 @@
+"""
+Compares how long PickleRepository takes to reload reviews stored as
+records and as columnar shards whose columns are memory mapped.
+
+Run with `python -m benchmarks.pickle_reload`. The same reviews are written
+in a fresh temporary directory for every storage. Every row reports the
+size on disk, the seconds to write the reviews, to reload them and to
+answer the first lookup by place after the reload. The gzip row keeps its
+columns inside the pickle, so they are copied on reload.
+"""
+
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+import uuid
+
+REVIEWS = 500_000
+PLACES = 5_000
+TEXT = "A long review about the place, its host and the neighbourhood. " * 8
+
+
+def build() -> list:
+    """Builds text-heavy reviews spread over some places"""
+    from src.persistence.records import Review
+
+    user_id = str(uuid.uuid4())
+    places = [str(uuid.uuid4()) for _ in range(PLACES)]
+    start = datetime(2024, 1, 1)
+
+    return [
+        Review(
+            text=f"{i} {TEXT}",
+            place_id=places[i % PLACES],
+            user_id=user_id,
+            created_at=start + timedelta(seconds=i),
+        )
+        for i in range(REVIEWS)
+    ]
+
+
+def timed(action) -> float:
+    """Returns the seconds an action takes"""
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def disk_usage(directory: str) -> int:
+    """Returns the bytes of every file under a directory"""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+STORAGES = {
+    "records": {"columnar": False},
+    "columnar": {"columnar": True},
+    "columnar gzip": {"columnar": True, "codec": "gzip"},
+}
+
+
+if __name__ == "__main__":
+    from src.persistence.pickled import PickleRepository
+
+    reviews = build()
+    place_id = reviews[0].place_id
+    print(
+        f"{'storage':<14} {'size (MB)':>10} {'write (s)':>10}"
+        f" {'reload (s)':>11} {'lookup (ms)':>12}"
+    )
+
+    for name, options in STORAGES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            repo = PickleRepository(**options)
+            write = timed(lambda: repo.save_many(reviews))
+            size = disk_usage(".")
+            del repo
+
+            start = time.perf_counter()
+            repo = PickleRepository(**options)
+            reload = time.perf_counter() - start
+            lookup = timed(
+                lambda: repo.find_by("review", "place_id", place_id)
+            )
+            del repo
+
+            print(
+                f"{name:<14} {size / 1e6:>10.1f} {write:>10.2f}"
+                f" {reload:>11.2f} {lookup * 1e3:>12.2f}"
+            )
@@ -0,0 +1,73 @@
+"""
+Measures the memory taken per review by the records the non-database
+repositories store, compared with Flask-SQLAlchemy model instances.
+
+Run with `python -m benchmarks.record_memory`. Every row reports the bytes
+allocated per review (the object, its attribute values and, for the ORM
+model, its instance state) and the microseconds taken to build one.
+"""
+
+from datetime import datetime
+import gc
+import time
+import tracemalloc
+import uuid
+
+RECORDS = 1_000_000
+MODELS = 100_000
+
+
+def build(cls, count: int) -> list:
+    """Builds count reviews of a record or model class"""
+    place_id = str(uuid.uuid4())
+    user_id = str(uuid.uuid4())
+    now = datetime.now()
+    objs = []
+
+    for i in range(count):
+        review = cls(
+            text=f"Review {i}",
+            user_id=user_id,
+            place_id=place_id,
+            created_at=now,
+            updated_at=None,
+        )
+        # Some model constructors do not take the id
+        review.id = str(uuid.uuid4())
+        objs.append(review)
+
+    return objs
+
+
+def measure(cls, count: int) -> tuple[float, float]:
+    """Returns the bytes and microseconds per review of a class"""
+    gc.collect()
+    start = time.perf_counter()
+    build(cls, count)
+    elapsed = time.perf_counter() - start
+
+    # Tracing slows allocations down, so memory is measured separately
+    gc.collect()
+    tracemalloc.start()
+    objs = build(cls, count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+
+    return size / count, elapsed / count * 1e6
+
+
+def classes():
+    """Yields (name, review class, count) for records and models"""
+    from src.models.review import Review as ReviewModel
+    from src.persistence.records import Review
+
+    yield "record", Review, RECORDS
+    yield "model", ReviewModel, MODELS
+
+
+if __name__ == "__main__":
+    print(f"{'type':<8} {'objects':>10} {'bytes/obj':>10} {'us/obj':>8}")
+    for name, cls, count in classes():
+        size, elapsed = measure(cls, count)
+        print(f"{name:<8} {count:>10} {size:>10.0f} {elapsed:>8.2f}")
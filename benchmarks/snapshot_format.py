@@ -0,0 +1,86 @@
+"""
+Compares the JSON and binary snapshot formats of FileRepository.
+
+Run with `python -m benchmarks.snapshot_format`. Both snapshots hold the
+same users, places and reviews, written in a temporary directory. Every
+row reports the file size, the seconds to write the snapshot and to
+reload a FileRepository from it.
+"""
+
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+import uuid
+
+REVIEWS = 200_000
+USERS = 10_000
+PLACES = 5_000
+
+
+def build() -> dict[str, list]:
+    """Builds the records of a mid-sized dataset, keyed by model"""
+    from src.persistence.records import Place, Review, User
+
+    start = datetime(2024, 1, 1)
+    users = [
+        User(email=f"user{i}@example.com", password_hash=uuid.uuid4().hex)
+        for i in range(USERS)
+    ]
+    places = [
+        Place(name=f"Place {i}", city_id=str(uuid.uuid4()))
+        for i in range(PLACES)
+    ]
+    reviews = [
+        Review(
+            text=f"Review number {i}, a nice place to stay",
+            place_id=places[i % PLACES].id,
+            user_id=users[i % USERS].id,
+            created_at=start + timedelta(seconds=i),
+            updated_at=start + timedelta(seconds=2 * i),
+        )
+        for i in range(REVIEWS)
+    ]
+
+    return {"user": users, "place": places, "review": reviews}
+
+
+def timed(action) -> float:
+    """Returns the seconds an action takes"""
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def run(snapshot_format: str, data: dict) -> tuple[int, float, float]:
+    """Returns the size, write and reload cost of a format"""
+    from src.persistence.file import FileRepository
+
+    repo = FileRepository(journal=False, snapshot_format=snapshot_format)
+    repo.save_many([obj for objects in data.values() for obj in objects])
+    write = timed(repo.compact)
+
+    reload = timed(
+        lambda: FileRepository(journal=False, snapshot_format=snapshot_format)
+    )
+    filename = "data.bin" if snapshot_format == "binary" else "data.json"
+
+    return os.path.getsize(filename), write, reload
+
+
+if __name__ == "__main__":
+    data = build()
+    print(
+        f"{'format':<8} {'size (MB)':>10} {'write (s)':>10}"
+        f" {'reload (s)':>11}"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+
+        for snapshot_format in ("json", "binary"):
+            size, write, reload = run(snapshot_format, data)
+            print(
+                f"{snapshot_format:<8} {size / 1e6:>10.1f} {write:>10.2f}"
+                f" {reload:>11.2f}"
+            )
@@ -0,0 +1,120 @@
+"""
+Compares the read cost of SQLiteRepository with DBRepository.
+
+Run with `python -m benchmarks.sqlite_backend`. Both repositories read the
+same N reviews from an SQLite file in a temporary directory. Each row
+reports the microseconds per returned row of a full `get_all`, of a page
+of PAGE rows read with `query` and of a single `get`. The ORM session is
+reset before every read, as it is at the start of every request.
+"""
+
+from datetime import datetime, timedelta
+import os
+import random
+import tempfile
+import time
+import uuid
+
+N = 20_000
+PAGE = 100
+READS = 1_000
+
+
+def reviews() -> list:
+    """Builds N reviews that are not stored anywhere yet"""
+    from src.models.review import Review
+
+    start = datetime(2024, 1, 1)
+    objs = []
+
+    for i in range(N):
+        review = Review(
+            text=f"Review {i}",
+            user_id=str(uuid.uuid4()),
+            place_id=str(uuid.uuid4()),
+            created_at=start + timedelta(seconds=i),
+            updated_at=None,
+        )
+        review.id = str(uuid.uuid4())
+        objs.append(review)
+
+    return objs
+
+
+def per_row(read, rows: int, between=None) -> float:
+    """Returns the microseconds per row of READS calls to `read`"""
+    elapsed = 0.0
+
+    for _ in range(READS):
+        if between is not None:
+            between()
+
+        start = time.perf_counter()
+        read()
+        elapsed += time.perf_counter() - start
+
+    return elapsed / (READS * rows) * 1e6
+
+
+def run(repo, model, ids: list, between=None) -> tuple[float, float, float]:
+    """Returns the (get_all, query page, get) cost per row of a repository"""
+    order = ("created_at", "id")
+    start = time.perf_counter()
+
+    if between is not None:
+        between()
+
+    repo.get_all(model)
+    get_all = (time.perf_counter() - start) / N * 1e6
+
+    page = per_row(
+        lambda: repo.query(model, order_by=order, limit=PAGE), PAGE, between
+    )
+    get = per_row(lambda: repo.get(model, random.choice(ids)), 1, between)
+
+    return get_all, page, get
+
+
+def run_db(objs: list) -> tuple[float, float, float]:
+    """Runs the benchmark on DBRepository inside an application context"""
+    from src import create_app, db
+    from src.models.review import Review
+    from src.persistence.db import DBRepository
+
+    app = create_app("Testing")
+    app.config["SQLALCHEMY_ECHO"] = False
+
+    with app.app_context():
+        db.create_all()
+        repo = DBRepository()
+        repo.save_many(objs)
+        ids = [obj.id for obj in objs]
+
+        return run(repo, Review, ids, between=db.session.remove)
+
+
+def run_sqlite(objs: list) -> tuple[float, float, float]:
+    """Runs the benchmark on SQLiteRepository"""
+    from src.persistence.sqlite import SQLiteRepository
+
+    repo = SQLiteRepository()
+    repo.save_many(objs)
+    ids = [obj.id for obj in objs]
+
+    try:
+        return run(repo, "review", ids)
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    print(f"{N} reviews, microseconds per row")
+    print(f"{'backend':<8} {'get_all':>10} {'page':>10} {'get':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        objs = reviews()
+
+        for name, runner in (("sqlite", run_sqlite), ("db", run_db)):
+            get_all, page, get = runner(objs)
+            print(f"{name:<8} {get_all:>10.2f} {page:>10.2f} {get:>10.2f}")
@@ -0,0 +1,112 @@
+"""
+Compares SQLite read/write concurrency with the default settings and with
+the SQLITE_PRAGMAS profile of the configuration.
+
+Run with `python -m benchmarks.sqlite_concurrency`. For each profile,
+READERS and WRITERS processes share one database file for DURATION seconds
+and every row reports the reads and writes done per second and the number
+of operations that failed with "database is locked".
+"""
+
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, exc, text
+
+from src.config import Config
+from src.persistence.pragmas import register_sqlite_pragmas
+
+READERS = 4
+WRITERS = 2
+DURATION = 5.0
+ROWS = 10_000
+
+
+def engine_for(path: str, pragmas: dict):
+    """Creates an engine on the database file with the given profile"""
+    engine = create_engine(f"sqlite:///{path}")
+    register_sqlite_pragmas(engine, pragmas)
+    return engine
+
+
+def setup(path: str, pragmas: dict) -> None:
+    """Creates the table read and written by the workers"""
+    engine = engine_for(path, pragmas)
+
+    with engine.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE review (id INTEGER PRIMARY KEY, text TEXT)")
+        )
+        connection.execute(
+            text("INSERT INTO review (text) VALUES (:text)"),
+            [{"text": f"review {i}"} for i in range(ROWS)],
+        )
+
+    engine.dispose()
+
+
+def worker(path: str, pragmas: dict, write: bool, results) -> None:
+    """Reads or writes single rows until DURATION elapses"""
+    engine = engine_for(path, pragmas)
+    done = failed = 0
+    deadline = time.monotonic() + DURATION
+
+    while time.monotonic() < deadline:
+        try:
+            with engine.begin() as connection:
+                if write:
+                    connection.execute(
+                        text("INSERT INTO review (text) VALUES ('new')")
+                    )
+                else:
+                    connection.execute(
+                        text("SELECT text FROM review WHERE id = :id"),
+                        {"id": random.randint(1, ROWS)},
+                    ).fetchone()
+            done += 1
+        except exc.OperationalError:
+            failed += 1
+
+    results.put((write, done, failed))
+    engine.dispose()
+
+
+def run(pragmas: dict) -> tuple[float, float, int]:
+    """Returns the reads/s, writes/s and lock failures of a profile"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hbnb.db")
+        setup(path, pragmas)
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=worker, args=(path, pragmas, write, results)
+            )
+            for write in [False] * READERS + [True] * WRITERS
+        ]
+
+        for process in workers:
+            process.start()
+
+        totals = {False: 0, True: 0}
+        failures = 0
+
+        for _ in workers:
+            write, done, failed = results.get()
+            totals[write] += done
+            failures += failed
+
+        for process in workers:
+            process.join()
+
+    return totals[False] / DURATION, totals[True] / DURATION, failures
+
+
+if __name__ == "__main__":
+    print(f"{READERS} readers, {WRITERS} writers, {DURATION:.0f}s each")
+    print(f"{'profile':>10} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    for name, pragmas in (("default", {}), ("tuned", Config.SQLITE_PRAGMAS)):
+        reads, writes, failures = run(pragmas)
+        print(f"{name:>10} {reads:>10.0f} {writes:>10.0f} {failures:>8}")
@@ -1,10 +1,93 @@
 """ Entry point for the application. """
 
+from contextlib import nullcontext
+import os
+
+import click
 from flask.cli import FlaskGroup
 from src import create_app
+from src.persistence import BACKENDS, build_repository
+from src.persistence.binary import convert_snapshot
+from src.persistence.migrate import MIGRATION_ORDER, migrate
+from src.persistence.serialization import get_models
+from utils.constants import (
+    FILE_STORAGE_BINARY_FILENAME,
+    FILE_STORAGE_FILENAME,
+    MIGRATION_BATCH_SIZE,
+)
 
 cli = FlaskGroup(create_app=create_app)
 
 
+def app_context(*backends):
+    """
+    Returns an app context when one of the backends is the database, which
+    needs it, or a context doing nothing otherwise
+    """
+    if "db" not in backends:
+        return nullcontext()
+
+    config_name = os.getenv("ENV", "development").capitalize()
+
+    return create_app(config_name).app_context()
+
+
+@cli.command("migrate-data", with_appcontext=False)
+@click.option("--source", required=True, type=click.Choice(sorted(BACKENDS)))
+@click.option("--target", required=True, type=click.Choice(sorted(BACKENDS)))
+@click.option(
+    "--batch-size",
+    default=MIGRATION_BATCH_SIZE,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Objects read and saved at once.",
+)
+@click.option(
+    "--state-file",
+    default=None,
+    help="JSON file recording the progress, run again with it to resume.",
+)
+@click.option(
+    "--model",
+    "models",
+    multiple=True,
+    type=click.Choice(MIGRATION_ORDER),
+    help="Only copy this model, can be repeated.",
+)
+def migrate_data(source, target, batch_size, state_file, models):
+    """Copies every object of the SOURCE backend into the TARGET one."""
+    if source == target:
+        raise click.BadParameter(
+            "must differ from --source", param_hint="--target"
+        )
+
+    selected = [m for m in MIGRATION_ORDER if not models or m in models]
+
+    # The database only stores the models that have an ORM class
+    if "db" in (source, target):
+        selected = [m for m in selected if m in get_models()]
+
+    with app_context(source, target):
+        migrate(
+            build_repository(source),
+            build_repository(target),
+            batch_size=batch_size,
+            models=tuple(selected),
+            state_path=state_file,
+            report=click.echo,
+        )
+
+
+@cli.command("convert-snapshot", with_appcontext=False)
+@click.option("--source", default=FILE_STORAGE_FILENAME, show_default=True)
+@click.option(
+    "--target", default=FILE_STORAGE_BINARY_FILENAME, show_default=True
+)
+def convert_snapshot_command(source, target):
+    """Writes the binary snapshot of a JSON snapshot of FileRepository."""
+    count = convert_snapshot(source, target)
+    click.echo(f"{count} objects written to {target}")
+
+
 if __name__ == "__main__":
     cli()
@@ -31,6 +31,9 @@ CREATE TABLE IF NOT EXISTS Review (
     FOREIGN KEY (user_id) REFERENCES User (id)
 );
 
+CREATE INDEX IF NOT EXISTS ix_review_place_id ON Review (place_id);
+CREATE INDEX IF NOT EXISTS ix_review_user_id ON Review (user_id);
+
 -- Create the Country table to store information about countries
 CREATE TABLE IF NOT EXISTS Country (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -49,6 +52,8 @@ CREATE TABLE IF NOT EXISTS City (
     FOREIGN KEY (country_id) REFERENCES Country (id)
 );
 
+CREATE INDEX IF NOT EXISTS ix_city_country_id ON City (country_id);
+
 -- Create the Amenity table to store information about amenities
 CREATE TABLE IF NOT EXISTS Amenity (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
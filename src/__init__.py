@@ -5,9 +5,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from config import Config
 from src.config import DevelopmentConfig, TestingConfig, ProductionConfig
-from src.models.user import User
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -41,6 +39,16 @@ def create_app(config_class):
     # Initialize app with database
     db.init_app(app)
     Migrate(app, db)
+
+    # Tune every SQLite connection (WAL, mmap...), see SQLITE_PRAGMAS
+    from src.persistence.pragmas import register_sqlite_pragmas
+    with app.app_context():
+        register_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS'))
+
+    # Repository selection, startup loading and unit of work, see
+    # src/persistence/__init__.py
+    from src.persistence import init_app
+    init_app(app)
     
     # Setup JWT
     jwt = JWTManager(app)
@@ -52,6 +60,8 @@ def create_app(config_class):
    
     with app.app_context():
         if config_class == "Testing":
+            from src.models.user import User
+
             db.create_all()
             test_user = User(email='Juan123@example.com', is_admin=True)
             test_user.set_password('passcode123')
@@ -12,6 +12,23 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///hbnb.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied in this order to every new SQLite connection, see
+    # src/persistence/pragmas.py. busy_timeout comes first so switching to
+    # WAL waits for other connections instead of failing.
+    SQLITE_PRAGMAS = {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'temp_store': 'MEMORY',
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+    }
+    # Build and load the repository when the app starts rather than on its
+    # first use, see src/persistence/__init__.py
+    REPOSITORY_EAGER_INIT = os.environ.get('REPOSITORY_EAGER_INIT') == '1'
+    # Run each request in one repository transaction, see
+    # src/persistence/__init__.py
+    REPOSITORY_UNIT_OF_WORK = os.environ.get('REPOSITORY_UNIT_OF_WORK') == '1'
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -5,6 +5,7 @@ Countries controller module
 from flask import abort
 from src.models.city import City
 from src.models.country import Country
+from src.persistence import repo
 
 
 def get_countries():
@@ -31,10 +32,6 @@ def get_country_cities(code: str):
     if not country:
         abort(404, f"Country with ID {code} not found")
 
-    cities: list[City] = City.get_all()
+    cities: list[City] = repo.find_by("city", "country_id", country.id)
 
-    country_cities = [
-        city.to_dict() for city in cities if city.country_code == country.code
-    ]
-
-    return country_cities
+    return [city.to_dict() for city in cities]
@@ -4,6 +4,7 @@ Reviews controller module
 
 from flask import abort, request
 from src.models.review import Review
+from src.persistence import repo
 
 
 def get_reviews():
@@ -32,20 +33,16 @@ def create_review(place_id: str):
 
 def get_reviews_from_place(place_id: str):
     """Returns all reviews from a specific place"""
-    reviews = Review.get_all()
+    reviews = repo.find_by("review", "place_id", place_id)
 
-    return [
-        review.to_dict() for review in reviews if review.place_id == place_id
-    ], 200
+    return [review.to_dict() for review in reviews], 200
 
 
 def get_reviews_from_user(user_id: str):
     """Returns all reviews from a specific user"""
-    reviews = Review.get_all()
+    reviews = repo.find_by("review", "user_id", user_id)
 
-    return [
-        review.to_dict() for review in reviews if review.user_id == user_id
-    ], 200
+    return [review.to_dict() for review in reviews], 200
 
 
 def get_review_by_id(review_id: str):
@@ -2,6 +2,7 @@
 Amenity related functionality
 """
 
+from datetime import datetime
 from src.models.base import Base
 from src import db
 
@@ -10,8 +11,8 @@ class Amenity(db.Model):
 
     id = db.Column(db.String(36), primary_key=True)
     name = db.Column(db.String(128), nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
     def to_dict(self):
         return {
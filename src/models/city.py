@@ -2,6 +2,7 @@
 City related functionality
 """
 
+from datetime import datetime
 from src.models.base import Base
 from src import db
 
@@ -10,9 +11,10 @@ class City(db.Model):
 
     id = db.Column(db.String(36), primary_key=True)
     name = db.Column(db.String(128), nullable=False)
-    country_id = db.Column(db.String(36), db.ForeignKey('countries.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
+    country_id = db.Column(db.String(36), db.ForeignKey('countries.id'),
+                           nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
     def to_dict(self):
         return {
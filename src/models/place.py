@@ -2,6 +2,7 @@
 Place related functionality
 """
 
+from datetime import datetime
 from src.models.base import Base
 from src import db
 
@@ -10,10 +11,11 @@ class Place(db.Model):
 
     id = db.Column(db.String(36), primary_key=True)
     name = db.Column(db.String(128), nullable=False)
-    city_id = db.Column(db.String(36), db.ForeignKey('cities.id'), nullable=False)
+    city_id = db.Column(db.String(36), db.ForeignKey('cities.id'),
+                        nullable=False, index=True)
     description = db.Column(db.String(512))
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
     def to_dict(self):
         return {
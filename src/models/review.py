@@ -2,6 +2,7 @@
 Review related functionality
 """
 
+from datetime import datetime
 from src.models.base import Base
 from src import db
 
@@ -9,11 +10,13 @@ class Review(db.Model):
     __tablename__ = 'reviews'
 
     id = db.Column(db.String(36), primary_key=True)
-    place_id = db.Column(db.String(36), db.ForeignKey('places.id'), nullable=False)
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    place_id = db.Column(db.String(36), db.ForeignKey('places.id'),
+                         nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'),
+                        nullable=False, index=True)
     text = db.Column(db.String(1024), nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
     def __init__(self, text, user_id, place_id, created_at, updated_at, ):
         """
@@ -2,6 +2,7 @@
 User related functionality
 """
 
+from datetime import datetime
 from .base import Base
 from src import db
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -9,14 +10,13 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(Base, db.Model):
     """User representation"""
-    tablename__ = 'users'
+    __tablename__ = 'users'
     
-    id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
     
     """Password Config"""
     def set_password(self, password):
@@ -1,28 +1,241 @@
 """ This module is responsible for selecting the repository
-to be used based on the environment variable REPOSITORY_ENV_VAR."""
+to be used based on the environment variable REPOSITORY_ENV_VAR,
+wrapped in a cache when REPOSITORY_CACHE_ENV_VAR is set to "1". The caches
+of several workers share invalidations through the file named by
+REPOSITORY_CACHE_BUS_ENV_VAR.
 
+Nothing is imported, built or loaded when this module is imported: `repo`
+builds the repository the first time it is used, or `init_app`, called by
+`create_app`, builds it when the app starts if REPOSITORY_EAGER_INIT_ENV_VAR
+(or the app setting of the same name) is "1". Only the chosen backend module
+is imported.
+
+`init_app` also writes what the repository buffers (see WriteBehind) when an
+app context that served no request ends, and closes it at exit.
+
+With REPOSITORY_UNIT_OF_WORK_ENV_VAR set to "1" (or the app setting of the
+same name) `init_app` runs each request in one repository transaction, unless
+the repository opts out with `unit_of_work = False` as MemoryRepository
+does."""
+
+import atexit
+import importlib
 import os
+import threading
 
 from src.persistence.repository import Repository
-from utils.constants import REPOSITORY_ENV_VAR
+from utils.constants import (
+    REPOSITORY_CACHE_BUS_ENV_VAR,
+    REPOSITORY_CACHE_ENV_VAR,
+    REPOSITORY_CACHE_SIZE,
+    REPOSITORY_CACHE_SIZE_ENV_VAR,
+    REPOSITORY_CACHE_TTL,
+    REPOSITORY_CACHE_TTL_ENV_VAR,
+    REPOSITORY_EAGER_INIT_ENV_VAR,
+    REPOSITORY_ENV_VAR,
+    REPOSITORY_UNIT_OF_WORK_ENV_VAR,
+)
+
+# Backend name -> (module, class), unknown names use memory
+BACKENDS: dict[str, tuple[str, str]] = {
+    "db": ("src.persistence.db", "DBRepository"),
+    "file": ("src.persistence.file", "FileRepository"),
+    "kv": ("src.persistence.kv", "KVRepository"),
+    "memory": ("src.persistence.memory", "MemoryRepository"),
+    "pickle": ("src.persistence.pickled", "PickleRepository"),
+    "sqlite": ("src.persistence.sqlite", "SQLiteRepository"),
+}
+
+
+def build_repository(kind: str | None = None) -> Repository:
+    """
+    Imports and builds the repository of a backend, by default the one
+    named by REPOSITORY_ENV_VAR, wrapped in a cache if enabled
+    """
+    if kind is None:
+        kind = os.getenv(REPOSITORY_ENV_VAR)
+
+    module_name, class_name = BACKENDS.get(kind, BACKENDS["memory"])
+    repository = getattr(importlib.import_module(module_name), class_name)()
+
+    if os.getenv(REPOSITORY_CACHE_ENV_VAR) == "1":
+        from src.persistence.cache import CachingRepository
+
+        bus = None
+
+        if os.getenv(REPOSITORY_CACHE_BUS_ENV_VAR):
+            from src.persistence.invalidation import InvalidationBus
+
+            bus = InvalidationBus(os.environ[REPOSITORY_CACHE_BUS_ENV_VAR])
+
+        repository = CachingRepository(
+            repository,
+            max_size=int(
+                os.getenv(REPOSITORY_CACHE_SIZE_ENV_VAR, REPOSITORY_CACHE_SIZE)
+            ),
+            ttl=float(
+                os.getenv(REPOSITORY_CACHE_TTL_ENV_VAR, REPOSITORY_CACHE_TTL)
+            ),
+            bus=bus,
+        )
+
+    print(f"Using {repository.__class__.__name__} as repository")
+
+    return repository
+
+
+class LazyRepository:
+    """
+    Stands for the repository until it is first used, then builds it and
+    passes every attribute access on to it
+    """
+
+    def __init__(self) -> None:
+        """Creates the placeholder, nothing is built yet"""
+        self.__repository: Repository | None = None
+        self.__kind: str | None = None
+        self.__lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        """Repository methods are called on the built repository"""
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return getattr(self.repository, name)
+
+    @property
+    def repository(self) -> Repository:
+        """The repository, built on first access"""
+        if self.__repository is None:
+            with self.__lock:
+                if self.__repository is None:
+                    self.__repository = build_repository(self.__kind)
+
+        return self.__repository
+
+    @property
+    def is_built(self) -> bool:
+        """Whether the repository was built already"""
+        return self.__repository is not None
+
+    def init(self, kind: str | None = None) -> Repository:
+        """Builds the repository of a backend now, replacing any other"""
+        with self.__lock:
+            self.__kind = kind
+            self.__repository = build_repository(kind)
+
+        return self.__repository
+
+    def select(self, kind: str | None = None) -> None:
+        """Chooses the backend built on first use, unless one is built"""
+        with self.__lock:
+            self.__kind = kind
+
+
+repo = LazyRepository()
+
+
+def init_app(app) -> Repository | LazyRepository:
+    """
+    Sets up the repository of an app, using its REPOSITORY setting if it
+    has one. With REPOSITORY_EAGER_INIT it is built and loaded now, making
+    the app slower to start but its first request as fast as the others,
+    otherwise on its first use.
+    """
+    kind = app.config.get("REPOSITORY")
+    eager = app.config.get(
+        "REPOSITORY_EAGER_INIT",
+        os.getenv(REPOSITORY_EAGER_INIT_ENV_VAR) == "1",
+    )
+
+    if eager:
+        repository = repo.init(kind)
+    else:
+        repo.select(kind)
+        repository = repo
+
+    app.extensions["repository"] = repository
+    _register_shutdown(app)
+
+    unit_of_work = app.config.get(
+        "REPOSITORY_UNIT_OF_WORK",
+        os.getenv(REPOSITORY_UNIT_OF_WORK_ENV_VAR) == "1",
+    )
+
+    if unit_of_work:
+        _register_unit_of_work(app)
+
+    return repository
+
+
+def _close_repository() -> None:
+    """Closes the repository at exit, if it was ever built"""
+    if repo.is_built:
+        repo.close()
+
+
+def _register_shutdown(app) -> None:
+    """
+    Flushes the repository when an app context that served no request
+    ends, as for CLI commands, requests being left to the write-behind
+    thread. Closes the repository, once, when the process exits.
+    """
+    from flask import g
+
+    @app.before_request
+    def mark_request():
+        """Tells the teardown below that the context serves a request"""
+        g.repository_request = True
+
+    @app.teardown_appcontext
+    def flush_repository(error=None):
+        """Writes what the repository buffers, outside of requests"""
+        if not g.pop("repository_request", False) and repo.is_built:
+            repo.flush()
+
+    # Apps created several times (tests) must not close it more than once
+    atexit.unregister(_close_repository)
+    atexit.register(_close_repository)
+
+
+def _register_unit_of_work(app) -> None:
+    """
+    Opens a transaction before each request and commits it once a
+    successful response is ready, so a failed commit still turns into an
+    error response. Requests that fail or answer with a server error are
+    rolled back.
+    """
+    from flask import g
+
+    @app.before_request
+    def begin_unit_of_work():
+        """Opens the transaction of the request"""
+        if not repo.unit_of_work:
+            return
+
+        g.repository_transaction = repo.transaction()
+        g.repository_transaction.__enter__()
 
-repo: Repository
+    @app.after_request
+    def commit_unit_of_work(response):
+        """Commits the transaction of the request unless it failed"""
+        if response.status_code >= 500:
+            return response
 
-if os.getenv(key=REPOSITORY_ENV_VAR) == "db":
-    from src.persistence.db import DBRepository
+        transaction = g.pop("repository_transaction", None)
 
-    repo = DBRepository()
-elif os.getenv(REPOSITORY_ENV_VAR) == "file":
-    from src.persistence.file import FileRepository
+        if transaction is not None:
+            transaction.__exit__(None, None, None)
 
-    repo = FileRepository()
-elif os.getenv(REPOSITORY_ENV_VAR) == "pickle":
-    from src.persistence.pickled import PickleRepository
+        return response
 
-    repo = PickleRepository()
-else:
-    from src.persistence.memory import MemoryRepository
+    @app.teardown_request
+    def rollback_unit_of_work(error=None):
+        """Rolls back the transaction of a request that did not commit"""
+        transaction = g.pop("repository_transaction", None)
 
-    repo = MemoryRepository()
+        if transaction is not None:
+            if error is None:
+                error = RuntimeError("The request ended before committing")
 
-print(f"Using {repo.__class__.__name__} as repository")
+            transaction.__exit__(type(error), error, error.__traceback__)
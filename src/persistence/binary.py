@@ -0,0 +1,201 @@
+"""
+This module exports the compact binary snapshot format FileRepository can
+use instead of JSON, and the converter from a JSON snapshot
+
+A snapshot starts with MAGIC followed by one section per model:
+
+- the model name: `<H` byte length then UTF-8
+- `<IIQ`: number of strings, number of records, byte length of the text
+- the string table: the length in characters of each string as `<I`,
+  then all of them as one UTF-8 text
+- the records, each packed with the fixed size struct of its model: text
+  columns are `<I` positions in the string table (0 is None), booleans
+  `<b` (-1 is None) and timestamps the 10 bytes `datetime` packs its date
+  and time fields into when pickled (all zeros is None)
+
+Every distinct string of a model is stored once however many records use
+it (ids referenced by other rows, foreign keys, repeated names), and
+loading a section is one decode of its text and one `struct.iter_unpack`.
+Timestamps are read by `datetime` itself from their 10 bytes, several
+times faster than converting a number of seconds or parsing ISO text.
+"""
+
+from dataclasses import fields
+from datetime import datetime
+from itertools import accumulate
+import struct
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from src.persistence.records import RECORDS, Record
+from src.persistence.serialization import from_json, iter_snapshot
+
+MAGIC = b"HBNBSNAP\x01"
+
+_NAME = struct.Struct("<H")
+_SECTION = struct.Struct("<IIQ")
+_TIME_COLUMNS = ("created_at", "updated_at")
+# Stored for a missing timestamp, year 0 cannot be a datetime
+_NULL_TIME = bytes(10)
+
+
+def _pack_time(value: datetime | None) -> bytes:
+    """Returns the 10 bytes of a naive datetime, as pickle stores it"""
+    if value is None:
+        return _NULL_TIME
+
+    return value.__reduce__()[1][0]
+
+
+def _unpack_time(value: bytes) -> datetime | None:
+    """Returns the datetime of its 10 bytes"""
+    return None if value == _NULL_TIME else datetime(value)
+
+
+class _Layout:
+    """How the records of a model are packed"""
+
+    def __init__(self, cls: type[Record]) -> None:
+        """Derives the struct of a record class from its columns"""
+        self.cls = cls
+        self.columns = cls.columns()
+        types = {f.name: f.type for f in fields(cls)}
+        codes = []
+
+        for name in self.columns:
+            if name in _TIME_COLUMNS:
+                codes.append("10s")
+            elif types[name] is bool:
+                codes.append("b")
+            else:
+                codes.append("I")
+
+        self.codes = codes
+        self.struct = struct.Struct("<" + "".join(codes))
+
+
+_LAYOUTS = {model: _Layout(cls) for model, cls in RECORDS.items()}
+
+
+def write_snapshot(file: BinaryIO, data: dict[str, Iterable]) -> None:
+    """Writes the records of every model, as `{model: records}`"""
+    file.write(MAGIC)
+
+    for model, objects in data.items():
+        layout = _LAYOUTS[model]
+        # Position 0 stands for None
+        positions: dict[str, int] = {}
+        strings: list[str] = []
+        rows = []
+
+        def position(value) -> int:
+            """Returns the position of a string, adding it if needed"""
+            if value is None:
+                return 0
+
+            found = positions.get(value)
+
+            if found is None:
+                strings.append(value)
+                found = positions[value] = len(strings)
+
+            return found
+
+        for obj in objects:
+            row = []
+
+            for name, code in zip(layout.columns, layout.codes):
+                value = getattr(obj, name, None)
+
+                if code == "10s":
+                    row.append(_pack_time(value))
+                elif code == "b":
+                    row.append(-1 if value is None else int(value))
+                else:
+                    row.append(position(value))
+
+            rows.append(layout.struct.pack(*row))
+
+        text = "".join(strings).encode()
+        name = model.encode()
+
+        file.write(_NAME.pack(len(name)) + name)
+        file.write(_SECTION.pack(len(strings), len(rows), len(text)))
+        file.write(struct.pack(f"<{len(strings)}I", *map(len, strings)))
+        file.write(text)
+        file.write(b"".join(rows))
+
+
+def iter_binary_snapshot(file: BinaryIO) -> Iterator[tuple[str, Record]]:
+    """
+    Yields (model name, record) pairs from a binary snapshot, reading it
+    one model section at a time
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{file.name} is not a binary snapshot")
+
+    while True:
+        header = file.read(_NAME.size)
+
+        if not header:
+            return
+
+        model = file.read(_NAME.unpack(header)[0]).decode()
+        layout = _LAYOUTS[model]
+        count, records, size = _SECTION.unpack(file.read(_SECTION.size))
+        lengths = struct.unpack(f"<{count}I", file.read(4 * count))
+        text = file.read(size).decode()
+        ends = list(accumulate(lengths))
+        strings = [None] + [
+            text[end - length:end] for end, length in zip(ends, lengths)
+        ]
+        rows = file.read(records * layout.struct.size)
+
+        for record in _decode(layout, strings, rows):
+            yield model, record
+
+
+def _decode(layout: _Layout, strings: list, rows: bytes) -> Iterator[Record]:
+    """Helper method to build the records of a section"""
+    text = strings.__getitem__
+    # Converters of the record's own fields, between id and the timestamps
+    converters = [
+        _unpack_bool if code == "b" else text for code in layout.codes[1:-2]
+    ]
+    cls = layout.cls
+
+    for row in layout.struct.iter_unpack(rows):
+        yield cls(
+            *map(_apply, converters, row[1:-2]),
+            id=text(row[0]),
+            created_at=_unpack_time(row[-2]),
+            updated_at=_unpack_time(row[-1]),
+        )
+
+
+def _apply(convert: Callable, value):
+    """Helper method to convert a value, like operator.call of Python 3.11"""
+    return convert(value)
+
+
+def _unpack_bool(value: int) -> bool | None:
+    """Returns the boolean of a byte, -1 being None"""
+    return None if value < 0 else bool(value)
+
+
+def convert_snapshot(
+    json_filename: str, binary_filename: str, opener: Callable = open
+) -> int:
+    """
+    Writes the binary snapshot of a JSON one, both opened with opener,
+    returns the number of records converted
+    """
+    data: dict[str, list] = {model: [] for model in RECORDS}
+
+    with opener(json_filename, "rt") as file:
+        for model, item in iter_snapshot(file):
+            data[model].append(from_json(RECORDS[model], item))
+
+    with opener(binary_filename, "wb") as file:
+        write_snapshot(file, data)
+
+    return sum(len(records) for records in data.values())
@@ -0,0 +1,340 @@
+"""
+This module exports a Repository that caches the reads of another one
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import time
+from typing import Any, Iterator
+
+from src.persistence.invalidation import InvalidationBus
+from src.persistence.repository import Repository, model_key
+from utils.constants import REPOSITORY_CACHE_SIZE, REPOSITORY_CACHE_TTL
+
+# Returned by the cache lookup when a key is missing or expired
+_MISSING = object()
+
+
+class CachingRepository(Repository):
+    """
+    Wraps any repository with a bounded LRU cache for `get`, `get_many` and
+    `get_all`, entries expire after `ttl` seconds
+
+    Writes go through to the wrapped repository and make every cached entry
+    of the models written stale. Values are cached with the generation of
+    their model read before the read, so a read that raced a write never
+    caches what the write replaced. Other reads (`find_by`, `query`) are
+    not cached.
+
+    Objects are cached as the wrapped repository's `detach` returns them
+    and handed out through its `attach`: DBRepository caches records rather
+    than ORM instances, which belong to the session of one app context.
+
+    When several processes serve the app each one has its own cache. Given
+    an InvalidationBus, writes are published to it and every read first
+    polls it, dropping the whole cache of any model another process wrote.
+
+    Inside `transaction()` the written models are only published when the
+    block ends, once the wrapped repository committed them.
+    """
+
+    def __init__(
+        self,
+        repository: Repository,
+        max_size: int = REPOSITORY_CACHE_SIZE,
+        ttl: float = REPOSITORY_CACHE_TTL,
+        bus: InvalidationBus | None = None,
+    ) -> None:
+        """Wraps a repository with an empty cache"""
+        self.__repository = repository
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__bus = bus
+        self.__entries: OrderedDict[tuple, tuple[float, int, Any]] = (
+            OrderedDict()
+        )
+        # Bumping the generation of a model makes all its entries stale
+        # at once, they are dropped when looked up or evicted
+        self.__generations: dict[str, int] = {}
+        self.__lock = threading.Lock()
+        # Models written by the open transaction of each thread
+        self.__local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getattr__(self, name: str):
+        """Backend specific methods are called on the wrapped repository"""
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return getattr(self.__repository, name)
+
+    @property
+    def repository(self) -> Repository:
+        """The wrapped repository"""
+        return self.__repository
+
+    @property
+    def unit_of_work(self) -> bool:
+        """Whether the wrapped repository supports a unit of work"""
+        return self.__repository.unit_of_work
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters and the cache size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.__entries),
+        }
+
+    def clear(self) -> None:
+        """Drops every cached entry"""
+        with self.__lock:
+            self.__entries.clear()
+
+    def _sync(self) -> None:
+        """Helper method to drop the models changed by other processes"""
+        if self.__bus is None:
+            return
+
+        changed = self.__bus.poll()
+
+        if changed:
+            with self.__lock:
+                for model in changed:
+                    self.__generations[model] = (
+                        self.__generations.get(model, 0) + 1
+                    )
+
+    def _lookup(self, key: tuple):
+        """Helper method to get a fresh cached value, or _MISSING"""
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+            if (
+                entry is None
+                or entry[0] < time.monotonic()
+                or entry[1] != self.__generations.get(key[1], 0)
+            ):
+                self.__entries.pop(key, None)
+                self.misses += 1
+                return _MISSING
+
+            self.__entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[2]
+
+    def _generation(self, model: str) -> int:
+        """Helper method to get the generation of a model before a read"""
+        with self.__lock:
+            return self.__generations.get(model, 0)
+
+    def _store(self, key: tuple, value, generation: int) -> None:
+        """Helper method to cache a value, evicting the least recently used"""
+        with self.__lock:
+            self.__entries[key] = (
+                time.monotonic() + self.__ttl,
+                generation,
+                value,
+            )
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def _invalidate(self, objs) -> None:
+        """Helper method to make the entries of the models written stale"""
+        models = {obj.__class__.__name__.lower() for obj in objs}
+
+        with self.__lock:
+            for model in models:
+                self.__generations[model] = (
+                    self.__generations.get(model, 0) + 1
+                )
+
+        written = getattr(self.__local, "written", None)
+
+        if written is not None:
+            written.update(models)
+        elif self.__bus is not None:
+            for model in models:
+                self.__bus.publish(model)
+
+    def _expire(self, models) -> None:
+        """Helper method to make every entry of some models stale"""
+        with self.__lock:
+            for model in models:
+                self.__generations[model] = (
+                    self.__generations.get(model, 0) + 1
+                )
+
+        if self.__bus is not None:
+            for model in models:
+                self.__bus.publish(model)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Runs a transaction of the wrapped repository. Other threads may
+        cache the old objects while it is open, so the models it wrote are
+        expired again when it ends, and the cache is dropped if it fails.
+        """
+        if getattr(self.__local, "written", None) is not None:
+            with self.__repository.transaction():
+                yield
+            return
+
+        written: set[str] = set()
+        self.__local.written = written
+
+        try:
+            with self.__repository.transaction():
+                yield
+        except BaseException:
+            self.clear()
+            raise
+        finally:
+            self.__local.written = None
+            self._expire(written)
+
+    def reload(self) -> None:
+        """Reloads the wrapped repository and drops the cache"""
+        self.__repository.reload()
+        self.clear()
+
+    def get_all(self, model_name: str) -> list:
+        """Get all objects of a model, cached"""
+        self._sync()
+        key = ("all", model_key(model_name))
+        objects = self._lookup(key)
+
+        if objects is _MISSING:
+            generation = self._generation(key[1])
+            objects = list(self.__repository.get_all(model_name))
+            detach = self.__repository.detach
+            self._store(key, [detach(obj) for obj in objects], generation)
+
+            return objects
+
+        attach = self.__repository.attach
+
+        return [attach(obj) for obj in objects]
+
+    def get(self, model_name: str, id: str):
+        """Get an object by id, cached"""
+        self._sync()
+        key = ("get", model_key(model_name), id)
+        obj = self._lookup(key)
+
+        if obj is not _MISSING:
+            return self.__repository.attach(obj)
+
+        generation = self._generation(key[1])
+        obj = self.__repository.get(model_name, id)
+
+        # Missing objects are not cached, they may be created later
+        if obj is not None:
+            self._store(key, self.__repository.detach(obj), generation)
+
+        return obj
+
+    def get_many(self, model_name: str, ids: list) -> list:
+        """Get several objects by id, reading only the uncached ones"""
+        self._sync()
+        model = model_key(model_name)
+        found = {}
+        missing = []
+
+        for obj_id in ids:
+            obj = self._lookup(("get", model, obj_id))
+
+            if obj is _MISSING:
+                missing.append(obj_id)
+            else:
+                found[obj_id] = self.__repository.attach(obj)
+
+        if missing:
+            generation = self._generation(model)
+
+            for obj in self.__repository.get_many(model_name, missing):
+                found[obj.id] = obj
+                self._store(
+                    ("get", model, obj.id),
+                    self.__repository.detach(obj),
+                    generation,
+                )
+
+        return [found[obj_id] for obj_id in ids if obj_id in found]
+
+    def find_by(self, model_name: str, field: str, value) -> list:
+        """Get all objects of a model whose field equals value"""
+        return self.__repository.find_by(model_name, field, value)
+
+    def query(
+        self,
+        model_name: str,
+        filters: dict | None = None,
+        order_by: str | tuple | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ) -> list:
+        """Get the objects of a model matching a query"""
+        return self.__repository.query(
+            model_name, filters, order_by, limit, after
+        )
+
+    def save(self, obj):
+        """Save an object"""
+        result = self.__repository.save(obj)
+        self._invalidate([obj])
+        return result
+
+    def save_many(self, objs: list) -> None:
+        """Save several objects"""
+        self.__repository.save_many(objs)
+        self._invalidate(objs)
+
+    def upsert_many(self, objs: list) -> None:
+        """Save or update several objects"""
+        self.__repository.upsert_many(objs)
+        self._invalidate(objs)
+
+    def update(self, obj):
+        """Update an object"""
+        result = self.__repository.update(obj)
+        self._invalidate([obj])
+        return result
+
+    def update_many(self, objs: list) -> None:
+        """Update several objects"""
+        self.__repository.update_many(objs)
+        self._invalidate(objs)
+
+    def delete(self, obj) -> bool:
+        """Delete an object"""
+        result = self.__repository.delete(obj)
+        self._invalidate([obj])
+        return result
+
+    def delete_many(self, objs: list) -> int:
+        """Delete several objects"""
+        result = self.__repository.delete_many(objs)
+        self._invalidate(objs)
+        return result
+
+    def flush(self) -> None:
+        """Flushes the wrapped repository"""
+        self.__repository.flush()
+
+    def close(self) -> None:
+        """Closes the wrapped repository"""
+        self.__repository.close()
+
+    def iter_batches(self, model_name: str, size: int, after=None):
+        """Yields the batches of the wrapped repository, not cached"""
+        return self.__repository.iter_batches(model_name, size, after)
@@ -0,0 +1,141 @@
+"""
+This module exports the compression codecs the file and pickle
+repositories can write their snapshots and journals with
+
+A codec is selected by name, from the `codec` argument of the repository
+or the STORAGE_COMPRESSION_ENV_VAR environment variable, "none" by default.
+Another codec is added by registering it:
+
+    register_codec(Codec("zstd", ".zst", zstandard.open))
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+from typing import IO, Callable
+
+from utils.constants import (
+    STORAGE_COMPRESSION_ENV_VAR,
+    STORAGE_GZIP_LEVEL,
+    STORAGE_LZMA_PRESET,
+)
+
+# Name of the codec that writes files as they are
+NO_CODEC = "none"
+
+
+class Codec:
+    """
+    Opens files compressed in one format
+
+    `opener(filename, mode)` takes the modes of `open` ("rb", "wt",
+    "at"...) and returns a file object reading or writing the uncompressed
+    content. `suffix` is appended to the names of the files a codec
+    writes, so files written by another codec are never misread.
+    """
+
+    def __init__(
+        self, name: str, suffix: str, opener: Callable[[str, str], IO]
+    ) -> None:
+        """Creates a codec"""
+        self.name = name
+        self.suffix = suffix
+        self.__opener = opener
+
+    @property
+    def compressed(self) -> bool:
+        """Whether the codec changes the content of files"""
+        return self.name != NO_CODEC
+
+    def path(self, filename: str) -> str:
+        """Returns the name of a file written by this codec"""
+        return filename + self.suffix
+
+    def open(self, filename: str, mode: str = "rb") -> IO:
+        """Opens a file written by this codec"""
+        return self.__opener(filename, mode)
+
+
+def _open_gzip(filename: str, mode: str) -> IO:
+    """Opens a gzip file"""
+    return gzip.open(filename, mode, compresslevel=STORAGE_GZIP_LEVEL)
+
+
+def _open_lzma(filename: str, mode: str) -> IO:
+    """Opens an xz file, the preset only applies when writing"""
+    if "r" in mode:
+        return lzma.open(filename, mode)
+
+    return lzma.open(filename, mode, preset=STORAGE_LZMA_PRESET)
+
+
+# Codec name -> codec
+CODECS: dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> Codec:
+    """Makes a codec selectable by its name"""
+    CODECS[codec.name] = codec
+    return codec
+
+
+register_codec(Codec(NO_CODEC, "", open))
+register_codec(Codec("gzip", ".gz", _open_gzip))
+register_codec(Codec("lzma", ".xz", _open_lzma))
+register_codec(Codec("bz2", ".bz2", bz2.open))
+
+
+def get_codec(name: str | None = None) -> Codec:
+    """Returns a codec by name, by default the one of the environment"""
+    if name is None:
+        name = os.getenv(STORAGE_COMPRESSION_ENV_VAR, NO_CODEC)
+
+    if name not in CODECS:
+        raise ValueError(
+            f"Unknown codec {name!r}, expected one of {sorted(CODECS)}"
+        )
+
+    return CODECS[name]
+
+
+def codec_of(filename: str) -> Codec:
+    """Returns the codec a file was written by, judging by its name"""
+    for codec in CODECS.values():
+        if codec.suffix and filename.endswith(codec.suffix):
+            return codec
+
+    return CODECS[NO_CODEC]
+
+
+def adopt(filename: str, codec: Codec) -> None:
+    """
+    Rewrites with a codec the file another codec left under the same
+    name, if the codec's own file does not exist, and removes it
+    """
+    target = codec.path(filename)
+
+    if os.path.exists(target):
+        return
+
+    for other in CODECS.values():
+        source = other.path(filename)
+
+        if other is codec or not os.path.exists(source):
+            continue
+
+        tmp_filename = f"{target}.tmp"
+
+        with other.open(source, "rb") as src, codec.open(
+            tmp_filename, "wb"
+        ) as dst:
+            try:
+                shutil.copyfileobj(src, dst)
+            except EOFError:
+                # Cut short by a crash, what could be read is kept
+                pass
+
+        os.replace(tmp_filename, target)
+        os.remove(source)
+        return
@@ -0,0 +1,448 @@
+"""
+This module exports a column oriented store for reviews, which
+MemoryRepository can use instead of one object per review
+"""
+
+from array import array
+from datetime import datetime, timedelta
+import heapq
+import pickle
+import sys
+from typing import Any, Iterable, Iterator
+
+from src.persistence.indexes import ORDERED_FIELDS
+from src.persistence.query import apply_query, order_fields
+from src.persistence.records import Review
+
+try:
+    import numpy
+except ImportError:  # Filtering falls back to searching the bytes
+    numpy = None
+
+# Timestamps are stored as microseconds since this date
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# Stored for a missing timestamp, the largest value so None sorts last
+_NULL = 2**63 - 1
+# Text buffer bytes left by updates and deletes before it is rewritten
+_COMPACT_MIN_GARBAGE = 1 << 20
+
+
+def _encode_time(value: datetime | None) -> int:
+    """Returns the microseconds since the epoch of a naive datetime"""
+    if value is None:
+        return _NULL
+
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _decode_time(value: int) -> datetime | None:
+    """Returns the datetime of microseconds since the epoch"""
+    if value == _NULL:
+        return None
+
+    return _EPOCH + timedelta(microseconds=value)
+
+
+class _Dictionary:
+    """Gives each distinct value a small integer code"""
+
+    def __init__(self) -> None:
+        """Creates an empty dictionary"""
+        self.values: list = []
+        self.codes: dict[Any, int] = {}
+
+    def encode(self, value) -> int:
+        """Returns the code of a value, adding it if needed"""
+        code = self.codes.get(value)
+
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+
+        return code
+
+    def code(self, value) -> int:
+        """Returns the code of a value, -1 if it was never stored"""
+        return self.codes.get(value, -1)
+
+
+def _rows_equal(column: array, code: int) -> list[int]:
+    """Returns the rows of an integer column holding a code"""
+    size = column.itemsize
+
+    if numpy is not None:
+        values = numpy.frombuffer(column, dtype=f"i{size}")
+        return numpy.flatnonzero(values == code).tolist()
+
+    # Without numpy the column is searched for the code's bytes, which runs
+    # in C, skipping the matches that straddle two rows
+    data = column.tobytes()
+    pattern = code.to_bytes(size, sys.byteorder, signed=True)
+    rows = []
+    position = data.find(pattern)
+
+    while position >= 0:
+        if position % size:
+            position = data.find(pattern, position + 1)
+        else:
+            rows.append(position // size)
+            position = data.find(pattern, position + size)
+
+    return rows
+
+
+class ColumnarReviews:
+    """
+    Reviews stored column by column
+
+    - `place_id` and `user_id` are dictionary encoded: each distinct id is
+      kept once and every row stores its integer code in an array. Filtering
+      by place or user compares that whole array with numpy when it is
+      installed, or searches its bytes otherwise.
+    - `text` is UTF-8 in one bytearray, rows store its offset and length.
+    - `created_at` and `updated_at` are int64 microseconds since 1970.
+
+    A review only exists as an object while it is being read: `get`,
+    `get_all` and `query` build Review records from the columns. Deleting
+    a review moves the last row into its place, so `get_all` returns the
+    reviews in insertion order only until the first delete.
+
+    The store also reads and writes like the dict of a PickleRepository
+    shard (`values`, `store[id] = obj`, `pop`). Pickled with protocol 5,
+    its columns are PickleBuffers the pickler can write out-of-band, and
+    once unpickled they are views of those buffers, a memory mapped file
+    for instance, until the first write copies them.
+    """
+
+    fields = Review.columns()
+    encoded = ("place_id", "user_id")
+
+    def __init__(self) -> None:
+        """Creates an empty store"""
+        self.__ids: list[str] = []
+        self.__rows: dict[str, int] = {}
+        self.__dictionaries = {
+            field: _Dictionary() for field in self.encoded
+        }
+        self.__codes = {field: array("i") for field in self.encoded}
+        self.__text = bytearray()
+        self.__text_start = array("q")
+        self.__text_length = array("i")
+        self.__garbage = 0
+        self.__created_at = array("q")
+        self.__updated_at = array("q")
+
+    def __reduce_ex__(self, protocol: int):
+        """Pickles the ids and dictionaries, and the columns as buffers"""
+        wrap = pickle.PickleBuffer if protocol >= 5 else bytes
+        columns = [
+            wrap(column)
+            for column in (self.__text, *self._arrays().values())
+        ]
+        values = {
+            field: dictionary.values
+            for field, dictionary in self.__dictionaries.items()
+        }
+
+        return _restore, (self.__ids, values, columns, self.__garbage)
+
+    def _arrays(self) -> dict[tuple[str, str], Any]:
+        """Helper method to get the integer columns by typecode and name"""
+        return {
+            **{("i", field): codes for field, codes in self.__codes.items()},
+            ("q", "text_start"): self.__text_start,
+            ("i", "text_length"): self.__text_length,
+            ("q", "created_at"): self.__created_at,
+            ("q", "updated_at"): self.__updated_at,
+        }
+
+    def _load(self, ids: list, values: dict, columns: list, garbage: int):
+        """Helper method to point the store at unpickled columns"""
+        self.__ids = ids
+        self.__rows = {obj_id: row for row, obj_id in enumerate(ids)}
+
+        for field, dictionary in self.__dictionaries.items():
+            dictionary.values = values[field]
+            dictionary.codes = {
+                value: code for code, value in enumerate(values[field])
+            }
+
+        text, *arrays = (memoryview(column) for column in columns)
+        self.__text = text
+        views = {
+            name: view.cast(typecode)
+            for (typecode, name), view in zip(self._arrays(), arrays)
+        }
+        self.__codes = {field: views[field] for field in self.encoded}
+        self.__text_start = views["text_start"]
+        self.__text_length = views["text_length"]
+        self.__created_at = views["created_at"]
+        self.__updated_at = views["updated_at"]
+        self.__garbage = garbage
+
+    def _thaw(self) -> None:
+        """Helper method to copy columns that are views before a write"""
+        if isinstance(self.__text, bytearray):
+            return
+
+        self.__text = bytearray(self.__text)
+        copies = {}
+
+        for (typecode, name), view in self._arrays().items():
+            copies[name] = array(typecode)
+            copies[name].frombytes(view.cast("B"))
+
+        self.__codes = {field: copies[field] for field in self.encoded}
+        self.__text_start = copies["text_start"]
+        self.__text_length = copies["text_length"]
+        self.__created_at = copies["created_at"]
+        self.__updated_at = copies["updated_at"]
+
+    def __len__(self) -> int:
+        """Returns the number of reviews"""
+        return len(self.__ids)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the ids, as the keys of a dict"""
+        return iter(self.__ids)
+
+    def __contains__(self, obj_id) -> bool:
+        """Whether a review with this id is stored"""
+        return obj_id in self.__rows
+
+    def _record(self, row: int) -> Review:
+        """Helper method to build the record of a row"""
+        length = self.__text_length[row]
+        text = None
+
+        if length >= 0:
+            start = self.__text_start[row]
+            text = str(self.__text[start:start + length], "utf-8")
+
+        return Review(
+            id=self.__ids[row],
+            place_id=self.__value("place_id", row),
+            user_id=self.__value("user_id", row),
+            text=text,
+            created_at=_decode_time(self.__created_at[row]),
+            updated_at=_decode_time(self.__updated_at[row]),
+        )
+
+    def __value(self, field: str, row: int):
+        """Decodes a dictionary encoded value"""
+        return self.__dictionaries[field].values[self.__codes[field][row]]
+
+    def get(self, obj_id) -> Review | None:
+        """Returns the review with an id, None if missing"""
+        row = self.__rows.get(obj_id)
+
+        return None if row is None else self._record(row)
+
+    def get_all(self) -> list[Review]:
+        """Returns every review"""
+        return [self._record(row) for row in range(len(self.__ids))]
+
+    def values(self) -> list[Review]:
+        """Returns every review, as the values of a dict would"""
+        return self.get_all()
+
+    def __setitem__(self, obj_id, obj) -> None:
+        """Stores a review under its id, as a dict would"""
+        self.put(obj)
+
+    def pop(self, obj_id, default=None):
+        """Drops a review and returns it, or default if missing"""
+        obj = self.get(obj_id)
+
+        if obj is None:
+            return default
+
+        self.remove(obj_id)
+
+        return obj
+
+    def rows_where(self, field: str, value) -> list[int] | None:
+        """
+        Returns the rows whose field equals value, or None if the field is
+        not dictionary encoded
+        """
+        if field not in self.__dictionaries:
+            return None
+
+        code = self.__dictionaries[field].code(value)
+
+        if code < 0:
+            return []
+
+        return _rows_equal(self.__codes[field], code)
+
+    def find_by(self, field: str, value) -> list[Review]:
+        """Returns the reviews whose field equals value"""
+        rows = self.rows_where(field, value)
+
+        if rows is None:
+            return [
+                obj
+                for obj in self.get_all()
+                if getattr(obj, field, None) == value
+            ]
+
+        return [self._record(row) for row in rows]
+
+    def query(
+        self,
+        filters: dict | None = None,
+        order_by: str | tuple | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ) -> list[Review]:
+        """Returns the reviews matching a query, see Repository.query"""
+        filters = dict(filters or {})
+        rows: Iterable[int] | None = None
+
+        # Encoded filters are answered by comparing the code columns
+        for field in self.encoded:
+            if field in filters:
+                matched = self.rows_where(field, filters.pop(field))
+                rows = matched if rows is None else sorted(
+                    set(rows).intersection(matched)
+                )
+
+        if rows is None:
+            rows = range(len(self.__ids))
+
+        if not filters and order_fields(order_by) == ORDERED_FIELDS:
+            return [
+                self._record(row)
+                for row in self._page(rows, limit, after)
+            ]
+
+        objects = (self._record(row) for row in rows)
+
+        return apply_query(objects, filters, order_by, limit, after)
+
+    def _page(self, rows: Iterable[int], limit, after) -> list[int]:
+        """
+        Helper method to sort rows by (created_at, id) straight from the
+        columns, keeping those after the cursor and at most limit of them
+        """
+        created_at = self.__created_at
+        ids = self.__ids
+
+        def key(row: int) -> tuple:
+            """Sort key of a row"""
+            return created_at[row], ids[row]
+
+        if after is not None:
+            start = (_encode_time(after[0]), after[1])
+            rows = (row for row in rows if key(row) > start)
+
+        if limit is None:
+            return sorted(rows, key=key)
+
+        return heapq.nsmallest(limit, rows, key=key)
+
+    def put(self, obj) -> None:
+        """Stores a review, replacing the one with the same id"""
+        self._thaw()
+        row = self.__rows.get(obj.id)
+
+        if row is None:
+            row = len(self.__ids)
+            self.__rows[obj.id] = row
+            self.__ids.append(obj.id)
+
+            for field in self.encoded:
+                self.__codes[field].append(0)
+
+            self.__text_start.append(0)
+            self.__text_length.append(-1)
+            self.__created_at.append(_NULL)
+            self.__updated_at.append(_NULL)
+        else:
+            self.__garbage += max(self.__text_length[row], 0)
+
+        for field in self.encoded:
+            self.__codes[field][row] = self.__dictionaries[field].encode(
+                getattr(obj, field, None)
+            )
+
+        text = getattr(obj, "text", None)
+
+        if text is None:
+            self.__text_length[row] = -1
+        else:
+            encoded = text.encode()
+            self.__text_start[row] = len(self.__text)
+            self.__text_length[row] = len(encoded)
+            self.__text += encoded
+
+        self.__created_at[row] = _encode_time(getattr(obj, "created_at"))
+        self.__updated_at[row] = _encode_time(getattr(obj, "updated_at"))
+        self._compact()
+
+    def remove(self, obj_id) -> bool:
+        """Drops a review, moving the last row into its place"""
+        row = self.__rows.pop(obj_id, None)
+
+        if row is None:
+            return False
+
+        self._thaw()
+        self.__garbage += max(self.__text_length[row], 0)
+        last = len(self.__ids) - 1
+        columns = [
+            *self.__codes.values(),
+            self.__text_start,
+            self.__text_length,
+            self.__created_at,
+            self.__updated_at,
+        ]
+
+        if row != last:
+            moved = self.__ids[last]
+            self.__ids[row] = moved
+            self.__rows[moved] = row
+
+            for column in columns:
+                column[row] = column[last]
+
+        self.__ids.pop()
+
+        for column in columns:
+            column.pop()
+
+        self._compact()
+
+        return True
+
+    def _compact(self) -> None:
+        """Helper method to rewrite the text buffer once mostly garbage"""
+        if (
+            self.__garbage < _COMPACT_MIN_GARBAGE
+            or self.__garbage * 2 < len(self.__text)
+        ):
+            return
+
+        text = bytearray()
+
+        for row in range(len(self.__ids)):
+            length = self.__text_length[row]
+
+            if length >= 0:
+                start = self.__text_start[row]
+                self.__text_start[row] = len(text)
+                text += self.__text[start:start + length]
+
+        self.__text = text
+        self.__garbage = 0
+
+
+def _restore(ids: list, values: dict, columns: list, garbage: int):
+    """Builds a ColumnarReviews from its pickled state"""
+    store = ColumnarReviews()
+    store._load(ids, values, columns, garbage)
+
+    return store
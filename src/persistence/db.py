@@ -6,14 +6,28 @@
   The methods to implement are:
     - get_all
     - get
+    - get_many
+    - find_by
+    - query
     - save
+    - save_many
     - update
+    - update_many
     - delete
+    - delete_many
     - reload (which can be empty)
+    - transaction (defers the commits of a block to its end)
 """
 
+from contextlib import contextmanager
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import make_transient_to_detached
+
 from src import db
-from src.persistence.repository import Repository
+from src.persistence.records import Record, from_record, to_record
+from src.persistence.repository import Repository, model_key
+from src.persistence.serialization import get_models
 from src.models.user import User
 from src.models.city import City
 from src.models.country import Country
@@ -30,21 +44,156 @@ class DBRepository(Repository):
         self.review_model = Review
         self.amenity_model = Amenity
 
+    def _model(self, model):
+        """Models can be given by class or, like other backends, by name"""
+        return get_models()[model] if isinstance(model, str) else model
+
+    def _instance(self, obj):
+        """Records from other backends are saved as model instances"""
+        return from_record(obj) if isinstance(obj, Record) else obj
+
+    def _attached(self, obj):
+        """Objects read in another session are merged into the current one"""
+        obj = self._instance(obj)
+
+        return obj if obj in db.session else db.session.merge(obj)
+
+    def detach(self, obj):
+        """Caches keep records, instances expire when their session ends"""
+        return to_record(obj)
+
+    def attach(self, obj):
+        """
+        Returns an instance of the current session for a cached record,
+        without querying the database
+        """
+        if not isinstance(obj, Record):
+            return obj
+
+        instance = from_record(obj)
+        make_transient_to_detached(instance)
+
+        return db.session.merge(instance, load=False)
+
     def get(self, model, id):
-        return model.query.get(id)
+        return self._model(model).query.get(id)
+
+    def get_many(self, model, ids):
+        """Get the objects of a model with the given ids in one query"""
+        if not ids:
+            return []
+
+        model = self._model(model)
+
+        return model.query.filter(model.id.in_(ids)).all()
 
     def get_all(self, model):
-        return model.query.all()
+        return self._model(model).query.all()
+
+    def find_by(self, model, field, value):
+        """Get all objects of a model whose field equals value"""
+        return self._model(model).query.filter_by(**{field: value}).all()
+
+    def query(self, model, filters=None, order_by=None, limit=None,
+              after=None):
+        """Get the objects of a model matching a query with one SQL query"""
+        model = self._model(model)
+        query = model.query
+
+        if filters:
+            query = query.filter_by(**filters)
+
+        if order_by:
+            fields = (order_by,) if isinstance(order_by, str) else order_by
+            columns = [getattr(model, field) for field in fields]
+
+            if after is not None:
+                query = query.filter(tuple_(*columns) > tuple_(*after))
+
+            query = query.order_by(*columns)
+        elif after is not None:
+            raise ValueError("after requires order_by")
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query.all()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Defers the commits of the writes in a with block to its end, or
+        rolls them all back if it raises
+
+        The nesting depth is kept in the session, so the DBRepository
+        instances of every route share the same unit of work.
+        """
+        info = db.session.info
+        info["transaction_depth"] = info.get("transaction_depth", 0) + 1
+
+        try:
+            yield
+        except BaseException:
+            if info["transaction_depth"] == 1:
+                db.session.rollback()
+            raise
+        else:
+            if info["transaction_depth"] == 1:
+                db.session.commit()
+        finally:
+            info["transaction_depth"] -= 1
+
+    def _commit(self):
+        """Commits, or only flushes while a transaction is open"""
+        if db.session.info.get("transaction_depth"):
+            db.session.flush()
+        else:
+            db.session.commit()
 
     def save(self, obj):
-        db.session.add(obj)
-        db.session.commit()
+        db.session.add(self._instance(obj))
+        self._commit()
+
+    def save_many(self, objs):
+        """Save several objects in a single transaction"""
+        db.session.add_all([self._instance(obj) for obj in objs])
+        self._commit()
 
     def delete(self, obj):
-        db.session.delete(obj)
-        db.session.commit()
+        return self.delete_many([obj]) > 0
+
+    def delete_many(self, objs):
+        """
+        Delete several objects by id, with one query per model, returns how
+        many rows were deleted. Detached instances and records are deleted
+        too, they never need to be in the session.
+        """
+        ids = {}
+
+        for obj in objs:
+            ids.setdefault(model_key(obj.__class__), []).append(obj.id)
+
+        deleted = 0
+
+        for name, model_ids in ids.items():
+            model = self._model(name)
+            deleted += model.query.filter(model.id.in_(model_ids)).delete(
+                synchronize_session="fetch"
+            )
+
+        self._commit()
+
+        return deleted
 
     def update(self, obj):
-        db.session.commit()
+        self._attached(obj)
+        self._commit()
+
+    def update_many(self, objs):
+        """Update several objects in a single transaction"""
+        for obj in objs:
+            self._attached(obj)
+        self._commit()
         
     def reload(self) -> None:
+        """Nothing to reload, the database is the source of truth"""
@@ -1,132 +1,667 @@
 """
-This module exports a Repository that persists data in a JSON file
+This module exports a Repository that persists data in a JSON file, or
+a binary one
 """
 
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime
+import gc
 import json
+import os
+import threading
 from src.models.base import Base
+from src.persistence.binary import (
+    convert_snapshot,
+    iter_binary_snapshot,
+    write_snapshot,
+)
+from src.persistence.codecs import adopt, get_codec
+from src.persistence.indexes import SecondaryIndexes
+from src.persistence.parallel import (
+    load_chunks,
+    read_chunk_index,
+    write_chunk_index,
+)
+from src.persistence.query import (
+    apply_query,
+    indexed_filter,
+    sorted_batches,
+)
+from src.persistence.records import RECORDS, to_record
 from src.persistence.repository import Repository
-from utils.constants import FILE_STORAGE_FILENAME
+from src.persistence.serialization import (
+    from_json,
+    iter_snapshot,
+    json_default,
+    to_json,
+)
+from src.persistence.writebehind import WriteBehind
+from utils.constants import (
+    FILE_STORAGE_BINARY_FILENAME,
+    FILE_STORAGE_COMPACT_THRESHOLD,
+    FILE_STORAGE_FILENAME,
+    FILE_STORAGE_FORMAT_ENV_VAR,
+    FILE_STORAGE_JOURNAL_FILENAME,
+    FILE_STORAGE_MODE_ENV_VAR,
+    FILE_STORAGE_PROGRESS_EVERY,
+    FILE_STORAGE_RELOAD_CHUNK,
+    FILE_STORAGE_RELOAD_WORKERS,
+    FILE_STORAGE_RELOAD_WORKERS_ENV_VAR,
+)
 
 
 class FileRepository(Repository):
-    """File Repository"""
-
-    __filename = FILE_STORAGE_FILENAME
-    __data: dict[str, list] = {
-        "country": [],
-        "user": [],
-        "amenity": [],
-        "city": [],
-        "review": [],
-        "place": [],
-        "placeamenity": [],
-    }
-
-    def __init__(self) -> None:
+    """
+    File Repository
+
+    By default every write rewrites the whole snapshot file. In journal
+    mode (`FILE_STORAGE_MODE=journal`) each write is appended as one line
+    to a journal file instead, so writes cost the same whatever the size
+    of the data. `reload` replays the journal over the snapshot, and once
+    the journal holds `compact_threshold` records the snapshot is
+    rewritten and the journal emptied.
+
+    With `snapshot_format="binary"` (or `FILE_STORAGE_FORMAT=binary`) the
+    snapshot is FILE_STORAGE_BINARY_FILENAME in the format of binary.py,
+    several times smaller and faster to load. The journal stays JSON. A
+    JSON snapshot left by json mode is converted on reload.
+
+    The JSON of each object is kept once encoded, and only objects saved,
+    updated or deleted since are encoded again, so writing the snapshot
+    costs little more than copying the cached text. Objects changed in
+    place must be passed to `update` to be written, as with every backend.
+
+    With `codec="gzip"` (or `STORAGE_COMPRESSION=gzip`, see codecs.py) the
+    snapshot and the journal are compressed and their names get the
+    codec's suffix. Files left by another codec are converted on reload.
+
+    With `reload_workers=8` (or `FILE_STORAGE_RELOAD_WORKERS=8`) an
+    uncompressed JSON snapshot is reloaded by that many processes, each
+    parsing chunks of FILE_STORAGE_RELOAD_CHUNK objects listed in an index
+    written next to the snapshot (see parallel.py). Without a valid index,
+    or if the workers cannot run, the snapshot is read serially.
+
+    With `STORAGE_WRITE_BEHIND=1` changes are only recorded by the request
+    that makes them and a background thread writes them (see WriteBehind).
+
+    Inside `transaction()` changes are written once when the block ends.
+    If the block raises they are dropped and the data is reloaded.
+    """
+
+    __data: dict[str, dict[str, Base]]
+
+    def __init__(
+        self,
+        journal: bool | None = None,
+        compact_threshold: int = FILE_STORAGE_COMPACT_THRESHOLD,
+        snapshot_format: str | None = None,
+        codec: str | None = None,
+        reload_workers: int | None = None,
+    ) -> None:
         """Calls reload method"""
+        if journal is None:
+            journal = os.getenv(FILE_STORAGE_MODE_ENV_VAR) == "journal"
+
+        if snapshot_format is None:
+            snapshot_format = os.getenv(FILE_STORAGE_FORMAT_ENV_VAR, "json")
+
+        if snapshot_format not in ("json", "binary"):
+            raise ValueError("snapshot_format must be 'json' or 'binary'")
+
+        if reload_workers is None:
+            reload_workers = int(
+                os.getenv(
+                    FILE_STORAGE_RELOAD_WORKERS_ENV_VAR,
+                    FILE_STORAGE_RELOAD_WORKERS,
+                )
+            )
+
+        self.__binary = snapshot_format == "binary"
+        self.__reload_workers = reload_workers
+        self.__codec = get_codec(codec)
+        # Names without the codec's suffix
+        self.__basenames = (
+            FILE_STORAGE_BINARY_FILENAME
+            if self.__binary
+            else FILE_STORAGE_FILENAME,
+            FILE_STORAGE_JOURNAL_FILENAME,
+        )
+        self.__filename, self.__journal_filename = (
+            self.__codec.path(name) for name in self.__basenames
+        )
+
+        self.__journal = journal
+        self.__compact_threshold = compact_threshold
+        self.__journal_file = None
+        self.__journal_records = 0
+        self.__pending_records: list[str] = []
+        self.__dirty = False
+        self.__lock = threading.RLock()
+        self.__transaction_depth = 0
+        self.__data = {
+            "country": {},
+            "user": {},
+            "amenity": {},
+            "city": {},
+            "review": {},
+            "place": {},
+            "placeamenity": {},
+        }
+        # Model -> id -> JSON of the object, dropped when it changes
+        self.__fragments: dict[str, dict[str, str]] = {}
+        self.__indexes = SecondaryIndexes()
+        self.__write_behind = None
         self.reload()
+        self.__write_behind = WriteBehind.from_env(self.flush)
 
     def _save_to_file(self):
         """Helper method to save the current object data to the file"""
-        serialized = {
-            k: [v.to_dict() for v in l if type(v) is not dict]
-            for k, l in self.__data.items()
+        # The snapshot holds every change, written or not
+        self.__dirty = False
+        self.__pending_records.clear()
+        tmp_filename = f"{self.__filename}.tmp"
+
+        stored = {
+            k: [v for v in objects.values() if type(v) is not dict]
+            for k, objects in self.__data.items()
         }
 
-        with open(self.__filename, "w") as file:
-            json.dump(serialized, file)
+        if self.__binary:
+            with self.__codec.open(tmp_filename, "wb") as file:
+                write_snapshot(file, stored)
+        else:
+            with self.__codec.open(tmp_filename, "wt") as file:
+                chunks = self._write_json(file, stored)
+
+        os.replace(tmp_filename, self.__filename)
+
+        if not self.__binary and not self.__codec.compressed:
+            write_chunk_index(self.__filename, chunks)
+
+        if self.__journal or self.__journal_records:
+            self._truncate_journal()
+
+    def _write_json(self, file, stored: dict) -> list:
+        """
+        Helper method to write the JSON snapshot from the cached fragments,
+        as `json.dump` would write it. Returns the [model, start, end]
+        offsets of its chunks of FILE_STORAGE_RELOAD_CHUNK objects.
+        """
+        chunks = []
+        offset = file.write("{")
+
+        for number, (model, objects) in enumerate(stored.items()):
+            offset += file.write(
+                f"{', ' if number else ''}{json.dumps(model)}: ["
+            )
+
+            for position, obj in enumerate(objects):
+                if position:
+                    offset += file.write(", ")
+                if position % FILE_STORAGE_RELOAD_CHUNK == 0:
+                    chunks.append([model, offset, offset])
+
+                offset += file.write(self._fragment(model, obj))
+                chunks[-1][2] = offset
+
+            offset += file.write("]")
+
+        file.write("}")
+
+        return chunks
+
+    def _fragment(self, model: str, obj) -> str:
+        """Helper method to get the JSON of an object, encoded once"""
+        fragments = self.__fragments.setdefault(model, {})
+        fragment = fragments.get(obj.id)
+
+        if fragment is None:
+            fragment = json.dumps(to_json(obj), default=json_default)
+            fragments[obj.id] = fragment
+
+        return fragment
+
+    def _append_to_journal(self):
+        """Helper method to append the pending records to the journal"""
+        if self.__codec.compressed:
+            # Each append is a whole compressed stream, so the journal
+            # stays readable however the process stops. The codecs read
+            # consecutive streams as one.
+            with self.__codec.open(self.__journal_filename, "at") as file:
+                file.writelines(self.__pending_records)
+        else:
+            if self.__journal_file is None:
+                self.__journal_file = open(self.__journal_filename, "a")
+
+            self.__journal_file.writelines(self.__pending_records)
+            self.__journal_file.flush()
+        self.__journal_records += len(self.__pending_records)
+        self.__pending_records.clear()
+
+        if self.__journal_records >= self.__compact_threshold:
+            self.compact()
+
+    def _truncate_journal(self):
+        """Helper method to empty the journal once it is in the snapshot"""
+        if self.__journal_file is not None:
+            self.__journal_file.close()
+            self.__journal_file = None
+
+        # An empty compressed stream, some codecs cannot read empty files
+        with self.__codec.open(self.__journal_filename, "wt"):
+            pass
+
+        self.__journal_records = 0
+
+    def _record(self, op: str, model: str, obj: Base):
+        """Helper method to record a change that has not been written yet"""
+        if self.__journal:
+            if op == "delete":
+                record = json.dumps({"op": op, "model": model, "id": obj.id})
+            else:
+                # The fragment is reused by the next snapshot
+                record = json.dumps({"op": op, "model": model})
+                fragment = self._fragment(model, obj)
+                record = f'{record[:-1]}, "data": {fragment}}}'
+
+            self.__pending_records.append(record + "\n")
+        else:
+            self.__dirty = True
+
+    def _schedule(self):
+        """Helper method to write the recorded changes when they are due"""
+        if self.__transaction_depth:
+            return
+
+        if self.__write_behind is None:
+            self.flush()
+        else:
+            self.__write_behind.notify()
+
+    def flush(self):
+        """Writes the changes not written yet"""
+        with self.__lock:
+            if self.__pending_records:
+                self._append_to_journal()
+            elif self.__dirty:
+                self._save_to_file()
+
+    def close(self):
+        """Stops the background writer, then writes what is still pending"""
+        if self.__write_behind is not None:
+            self.__write_behind.close()
+
+        self.flush()
+
+    def compact(self):
+        """Rewrites the snapshot and empties the journal"""
+        with self.__lock:
+            self._save_to_file()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Writes the changes of a with block once when it ends, or drops them
+        and reloads the files if it raises. Other threads wait for the
+        block to end before writing.
+        """
+        with self.__lock:
+            if not self.__transaction_depth:
+                # What was written before must survive a rollback
+                self.flush()
+
+            self.__transaction_depth += 1
+
+            try:
+                yield
+            except BaseException:
+                self.__transaction_depth -= 1
+                if not self.__transaction_depth:
+                    self._rollback()
+                raise
+            else:
+                self.__transaction_depth -= 1
+                self._schedule()
+
+    def _rollback(self):
+        """Helper method to drop the unwritten changes and reload"""
+        self.__pending_records.clear()
+        self.__dirty = False
+        self.__indexes.clear()
+
+        for objects in self.__data.values():
+            objects.clear()
+
+        self.reload()
 
     def get_all(self, model_name: str):
         """Get all objects of a given model"""
-        return self.__data.get(model_name, [])
+        return list(self.__data.get(model_name, {}).values())
 
     def get(self, model_name: str, obj_id: str):
         """Get an object by its ID"""
-        for obj in self.get_all(model_name):
-            if obj.id == obj_id:
-                return obj
-        return None
+        return self.__data.get(model_name, {}).get(obj_id)
+
+    def iter_batches(self, model_name: str, size: int, after=None):
+        """Yields the objects of a model sorted by id, size at a time"""
+        return sorted_batches(self.get_all(model_name), size, after)
+
+    def get_many(self, model_name: str, ids: list) -> list:
+        """Get the objects of a given model with the given IDs"""
+        objects = self.__data.get(model_name, {})
+
+        return [objects[obj_id] for obj_id in ids if obj_id in objects]
+
+    def find_by(self, model_name: str, field: str, value) -> list:
+        """Get all objects of a given model whose field equals value"""
+        objects = self.__data.get(model_name, {})
+        ids = self.__indexes.lookup(model_name, field, value)
+
+        if ids is None:
+            return [
+                obj
+                for obj in objects.values()
+                if getattr(obj, field, None) == value
+            ]
+
+        return [objects[obj_id] for obj_id in ids]
+
+    def query(
+        self,
+        model_name: str,
+        filters: dict | None = None,
+        order_by: str | tuple | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ) -> list:
+        """Get the objects of a given model matching a query"""
+        indexed = indexed_filter(self.__indexes, model_name, filters)
+
+        if indexed is not None:
+            objects = self.find_by(model_name, *indexed)
+        elif self.__indexes.is_ordered_by(order_by):
+            # Already sorted and starting after the cursor
+            objects = (
+                self.get(model_name, obj_id)
+                for obj_id in self.__indexes.ordered_ids(model_name, after)
+            )
+            return apply_query(objects, filters, limit=limit)
+        else:
+            objects = self.__data.get(model_name, {}).values()
+
+        return apply_query(objects, filters, order_by, limit, after)
 
     def reload(self):
-        """Reloads the data from the file"""
-        file_data = {}
+        """
+        Reloads the data from the file, then replays the journal
+
+        The snapshot is parsed one object at a time, so memory peaks close
+        to the size of the loaded objects rather than twice the dataset.
+        Each model is indexed once it is loaded, in bulk.
+        """
+        models = RECORDS
+        loaded = 0
+        self.__fragments.clear()
+        # Records hold no reference cycles, so collections triggered by
+        # allocating them would only slow the load down
+        collecting = gc.isenabled()
+        gc.disable()
+
+        for basename in self.__basenames:
+            adopt(basename, self.__codec)
+
+        if self.__binary:
+            self._adopt_json_snapshot()
+
         try:
-            with open(self.__filename, "r") as file:
-                file_data = json.load(file)
+            with self.__lock:
+                if not self._reload_in_parallel():
+                    with self.__codec.open(
+                        self.__filename, "rb" if self.__binary else "rt"
+                    ) as file:
+                        for model, instance in self._iter_snapshot(file):
+                            self.__data.setdefault(model, {})[
+                                instance.id
+                            ] = instance
+
+                            loaded += 1
+                            if loaded % FILE_STORAGE_PROGRESS_EVERY == 0:
+                                print(
+                                    f"Loaded {loaded} objects from {file.name}"
+                                )
+
+                for model, objects in self.__data.items():
+                    self.__indexes.add_many(model, objects.values())
         except FileNotFoundError:
-            from src.models.country import Country
+            # Without a snapshot, a journal still holds every change
+            seed = not os.path.exists(self.__journal_filename)
+        else:
+            seed = False
+        finally:
+            if collecting:
+                gc.enable()
 
-            self.__data["country"] = [Country("Uruguay", "UY")]
+        # A journal left behind by journal mode is replayed in both modes
+        self._replay_journal(models)
 
-            self._save_to_file()
+        if seed:
+            from src.persistence.records import Country
 
-        from src.models.amenity import Amenity, PlaceAmenity
-        from src.models.city import City
-        from src.models.country import Country
-        from src.models.place import Place
-        from src.models.review import Review
-        from src.models.user import User
-
-        models = {
-            "amenity": Amenity,
-            "city": City,
-            "country": Country,
-            "place": Place,
-            "placeamenity": PlaceAmenity,
-            "review": Review,
-            "user": User,
-        }
+            self.save(Country("Uruguay", "UY"))
+            # Seeded once: the snapshot now exists, even in journal mode
+            self.compact()
+
+    def _adopt_json_snapshot(self) -> None:
+        """
+        Helper method to convert the JSON snapshot json mode left, when
+        there is no binary one yet, and remove it
+        """
+        if os.path.exists(self.__filename):
+            return
+
+        adopt(FILE_STORAGE_FILENAME, self.__codec)
+        json_filename = self.__codec.path(FILE_STORAGE_FILENAME)
+
+        if not os.path.exists(json_filename):
+            return
+
+        tmp_filename = f"{self.__filename}.tmp"
+        converted = convert_snapshot(
+            json_filename, tmp_filename, self.__codec.open
+        )
+        os.replace(tmp_filename, self.__filename)
+        os.remove(json_filename)
+        print(f"Converted {converted} objects of {json_filename}")
+
+    def _reload_in_parallel(self) -> bool:
+        """
+        Helper method to load the chunks of the JSON snapshot in worker
+        processes. Returns False, having loaded nothing, when the snapshot
+        has to be read serially instead.
+        """
+        if (
+            self.__reload_workers < 2
+            or self.__binary
+            or self.__codec.compressed
+        ):
+            return False
+
+        chunks = read_chunk_index(self.__filename)
+
+        if not chunks:
+            return False
+
+        loaded = []
+
+        try:
+            loaded.extend(
+                load_chunks(self.__filename, chunks, self.__reload_workers)
+            )
+        except (BrokenProcessPool, OSError, ValueError) as error:
+            print(f"Parallel reload failed, reading serially: {error}")
+            return False
 
-        for model, data in file_data.items():
-            for item in data:
-                instance: Base = models[model](**item)
+        for model, instances in loaded:
+            objects = self.__data.setdefault(model, {})
 
-                if "created_at" in item:
-                    instance.created_at = datetime.fromisoformat(
-                        item["created_at"]
-                    )
-                if "updated_at" in item:
-                    instance.updated_at = datetime.fromisoformat(
-                        item["updated_at"]
-                    )
+            for instance in instances:
+                objects[instance.id] = instance
 
-                self.save(data=instance, save_to_file=False)
+        count = sum(len(instances) for _, instances in loaded)
+        print(
+            f"Loaded {count} objects from {self.__filename}"
+            f" with {self.__reload_workers} workers"
+        )
+
+        return True
+
+    def _iter_snapshot(self, file):
+        """Helper method to read the (model, object) pairs of the snapshot"""
+        if self.__binary:
+            yield from iter_binary_snapshot(file)
+            return
+
+        for model, item in iter_snapshot(file):
+            yield model, from_json(RECORDS[model], item)
+
+    def _replay_journal(self, models: dict):
+        """Helper method to apply the journal records over the snapshot"""
+        self.__journal_records = 0
+
+        try:
+            with self.__codec.open(self.__journal_filename, "rt") as file:
+                for line in _lines(file):
+                    if not line.strip():
+                        continue
+
+                    record = json.loads(line)
+                    model = record["model"]
+
+                    if record["op"] == "delete":
+                        obj = self.__data[model].pop(record["id"], None)
+                        if obj is not None:
+                            self.__indexes.remove(model, obj.id)
+                    else:
+                        instance = from_json(models[model], record["data"])
+                        self.save(data=instance, save_to_file=False)
+
+                    self.__journal_records += 1
+        except FileNotFoundError:
+            return
+
+        if self.__journal_records and (
+            not self.__journal
+            or self.__journal_records >= self.__compact_threshold
+        ):
+            self.compact()
 
     def save(self, data: Base, save_to_file=True):
         """Save an object to the repository"""
+        with self.__lock:
+            data = self._store(data)
+
+            if save_to_file:
+                self._record("save", data.__class__.__name__.lower(), data)
+                self._schedule()
+
+    def save_many(self, objs: list):
+        """Save several objects to the repository with a single write"""
+        with self.__lock:
+            for obj in objs:
+                obj = self._store(obj)
+                self._record("save", obj.__class__.__name__.lower(), obj)
+
+            self._schedule()
+
+    def _store(self, data: Base):
+        """Helper method to keep and index the record of an object"""
+        data = to_record(data)
         model: str = data.__class__.__name__.lower()
 
         if model not in self.__data:
-            self.__data[model] = []
+            self.__data[model] = {}
 
-        self.__data[model].append(data)
+        self.__data[model][data.id] = data
+        self.__fragments.get(model, {}).pop(data.id, None)
+        self.__indexes.update(model, data)
 
-        if save_to_file:
-            self._save_to_file()
+        return data
 
     def update(self, obj: Base):
         """Update an object in the repository"""
+        with self.__lock:
+            if not self._replace(obj):
+                return None
+
+            self._schedule()
+
+        return obj
+
+    def update_many(self, objs: list):
+        """Update several objects in the repository with a single write"""
+        with self.__lock:
+            for obj in objs:
+                self._replace(obj)
+
+            self._schedule()
+
+    def _replace(self, obj: Base) -> bool:
+        """Helper method to replace a stored object and record the change"""
         cls = obj.__class__.__name__.lower()
 
-        for i, o in enumerate(self.__data[cls]):
-            if o.id == obj.id:
-                obj.updated_at = datetime.now()
-                self.__data[cls][i] = obj
-                self._save_to_file()
-                return obj
+        if obj.id not in self.__data[cls]:
+            return False
 
-        return None
+        obj.updated_at = datetime.utcnow()
+        obj = to_record(obj)
+        self.__data[cls][obj.id] = obj
+        self.__fragments.get(cls, {}).pop(obj.id, None)
+        self.__indexes.update(cls, obj)
+        self._record("update", cls, obj)
+
+        return True
 
     def delete(self, obj: Base):
         """Delete an object from the repository"""
+        with self.__lock:
+            if not self._remove(obj):
+                return False
+
+            self._schedule()
+
+        return True
+
+    def delete_many(self, objs: list) -> int:
+        """Delete several objects from the repository with a single write"""
+        with self.__lock:
+            deleted = sum(self._remove(obj) for obj in objs)
+
+            self._schedule()
+
+        return deleted
+
+    def _remove(self, obj: Base) -> bool:
+        """Helper method to drop a stored object and record the change"""
         class_name = obj.__class__.__name__.lower()
 
-        if obj not in self.__data[class_name]:
+        if obj.id not in self.__data[class_name]:
             return False
 
-        self.__data[class_name].remove(obj)
-
-        self._save_to_file()
+        del self.__data[class_name][obj.id]
+        self.__fragments.get(class_name, {}).pop(obj.id, None)
+        self.__indexes.remove(class_name, obj.id)
+        self._record("delete", class_name, obj)
 
         return True
+
+
+def _lines(file):
+    """
+    Yields the lines of a journal, stopping at a compressed stream cut
+    short by a crash, whose records were never acknowledged
+    """
+    try:
+        yield from file
+    except EOFError:
+        return
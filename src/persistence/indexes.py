@@ -0,0 +1,226 @@
+"""
+This module exports the secondary indexes used by the repositories that
+keep their objects in memory (memory, file and pickle)
+"""
+
+from bisect import bisect_right, insort
+from typing import Any, Iterator
+
+# Fields indexed per model, lookups on any other field fall back to a scan
+INDEXED_FIELDS: dict[str, tuple[str, ...]] = {
+    "city": ("country_id",),
+    "place": ("city_id",),
+    "review": ("place_id", "user_id"),
+    "user": ("email",),
+}
+
+# Every model is also kept sorted by these fields, the order used to
+# paginate collections
+ORDERED_FIELDS: tuple[str, ...] = ("created_at", "id")
+
+
+def order_key(obj, fields: tuple[str, ...]) -> tuple:
+    """Returns the key an object is sorted by, None values sort last"""
+    # List comprehensions build short tuples faster than generators
+    return tuple([
+        (value is None, value)
+        for value in [getattr(obj, field, None) for field in fields]
+    ])
+
+
+class SecondaryIndexes:
+    """
+    Maps (model, field, value) to the ids of the objects holding that value
+
+    Objects are usually modified in place before `update` is called, so the
+    values each object was indexed under are remembered to know which
+    entries have to be moved.
+
+    The ids of every model are also kept sorted by ORDERED_FIELDS, so a
+    page of a collection can be read from any position without sorting.
+    """
+
+    def __init__(
+        self, fields: dict[str, tuple[str, ...]] | None = None
+    ) -> None:
+        """Creates empty indexes for the given fields"""
+        self.__fields = INDEXED_FIELDS if fields is None else fields
+        self.__index: dict[str, dict[str, dict[Any, dict[str, None]]]] = {}
+        self.__values: dict[str, dict[str, tuple]] = {}
+        self.__ordered: dict[str, list[tuple]] = {}
+        self.__order_keys: dict[str, dict[str, tuple]] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        """Removes every indexed object"""
+        self.__index = {
+            model: {field: {} for field in fields}
+            for model, fields in self.__fields.items()
+        }
+        self.__values = {model: {} for model in self.__fields}
+        self.__ordered = {}
+        self.__order_keys = {}
+
+    def is_indexed(self, model_name: str, field: str) -> bool:
+        """Whether lookups on this field can be served by an index"""
+        return field in self.__fields.get(model_name, ())
+
+    def add(self, model_name: str, obj) -> None:
+        """Indexes an object under its current values"""
+        self.__reorder(model_name, obj)
+        self.__add_values(model_name, obj)
+
+    def add_many(self, model_name: str, objs) -> None:
+        """
+        Indexes several objects, sorting the model once at the end instead
+        of inserting each object at its position, as when loading a model
+        """
+        keys = self.__order_keys.setdefault(model_name, {})
+        ordered = self.__ordered.setdefault(model_name, [])
+        fields = self.__fields.get(model_name, ())
+        entries = [self.__index[model_name][field] for field in fields]
+        stored_values = self.__values.get(model_name)
+
+        for obj in objs:
+            if obj.id in keys:
+                self.update(model_name, obj)
+                continue
+
+            key = order_key(obj, ORDERED_FIELDS)
+            keys[obj.id] = key
+            ordered.append(key)
+
+            if not fields:
+                continue
+
+            values = tuple([getattr(obj, field, None) for field in fields])
+            stored_values[obj.id] = values
+
+            for entry, value in zip(entries, values):
+                entry.setdefault(value, {})[obj.id] = None
+
+        ordered.sort()
+
+    def __add_values(self, model_name: str, obj) -> None:
+        """Adds an object to the entries of its values of indexed fields"""
+        fields = self.__fields.get(model_name)
+
+        if not fields:
+            return
+
+        index = self.__index[model_name]
+        values = tuple(getattr(obj, field, None) for field in fields)
+        self.__values[model_name][obj.id] = values
+
+        for field, value in zip(fields, values):
+            index[field].setdefault(value, {})[obj.id] = None
+
+    def remove(self, model_name: str, obj_id: str) -> None:
+        """Removes an object from every index of its model"""
+        self.__unorder(model_name, obj_id)
+        fields = self.__fields.get(model_name)
+
+        if not fields:
+            return
+
+        values = self.__values[model_name].pop(obj_id, None)
+
+        if values is None:
+            return
+
+        for field, value in zip(fields, values):
+            self.__discard(model_name, field, value, obj_id)
+
+    def update(self, model_name: str, obj) -> None:
+        """Moves an object to the entries matching its current values"""
+        self.__reorder(model_name, obj)
+        fields = self.__fields.get(model_name)
+
+        if not fields:
+            return
+
+        old_values = self.__values[model_name].get(obj.id)
+
+        if old_values is None:
+            self.__add_values(model_name, obj)
+            return
+
+        index = self.__index[model_name]
+        values = tuple(getattr(obj, field, None) for field in fields)
+
+        for field, old, new in zip(fields, old_values, values):
+            if old != new:
+                self.__discard(model_name, field, old, obj.id)
+                index[field].setdefault(new, {})[obj.id] = None
+
+        self.__values[model_name][obj.id] = values
+
+    def lookup(self, model_name: str, field: str, value) -> list | None:
+        """
+        Returns the ids of the objects whose field equals value, in
+        insertion order, or None if the field is not indexed
+        """
+        if not self.is_indexed(model_name, field):
+            return None
+
+        return list(self.__index[model_name][field].get(value, ()))
+
+    def is_ordered_by(self, order_by) -> bool:
+        """Whether objects can be read in this order without sorting"""
+        if isinstance(order_by, str):
+            order_by = (order_by,)
+
+        return order_by is not None and tuple(order_by) == ORDERED_FIELDS
+
+    def ordered_ids(
+        self, model_name: str, after: tuple | None = None
+    ) -> Iterator[str]:
+        """
+        Yields the ids of a model sorted by ORDERED_FIELDS, starting after
+        the object whose values of those fields are `after`
+        """
+        ordered = self.__ordered.get(model_name, [])
+        start = 0
+
+        if after is not None:
+            start = bisect_right(
+                ordered, tuple((value is None, value) for value in after)
+            )
+
+        # Indexing instead of slicing avoids copying the rest of the list
+        for position in range(start, len(ordered)):
+            yield ordered[position][-1][1]
+
+    def __reorder(self, model_name: str, obj) -> None:
+        """Puts an object at the position matching its current values"""
+        key = order_key(obj, ORDERED_FIELDS)
+        keys = self.__order_keys.setdefault(model_name, {})
+
+        if keys.get(obj.id) == key:
+            return
+
+        self.__unorder(model_name, obj.id)
+        keys[obj.id] = key
+        insort(self.__ordered.setdefault(model_name, []), key)
+
+    def __unorder(self, model_name: str, obj_id) -> None:
+        """Removes an object from the sorted ids of its model"""
+        key = self.__order_keys.get(model_name, {}).pop(obj_id, None)
+
+        if key is None:
+            return
+
+        ordered = self.__ordered[model_name]
+        del ordered[bisect_right(ordered, key) - 1]
+
+    def __discard(self, model_name: str, field: str, value, obj_id) -> None:
+        """Removes one id from one index entry, dropping empty entries"""
+        ids = self.__index[model_name][field].get(value)
+
+        if ids is None:
+            return
+
+        ids.pop(obj_id, None)
+
+        if not ids:
+            del self.__index[model_name][field][value]
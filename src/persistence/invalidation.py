@@ -0,0 +1,123 @@
+"""
+This module exports the bus the caches of several worker processes use to
+tell each other which models changed
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+
+# Models with a generation counter, in the order they are stored
+MODELS = (
+    "amenity",
+    "city",
+    "country",
+    "place",
+    "placeamenity",
+    "review",
+    "user",
+)
+
+# One unsigned 64-bit generation counter per model
+_COUNTER = struct.Struct("=Q")
+
+
+class InvalidationBus:
+    """
+    One generation counter per model in a small memory mapped file shared
+    by every process of a host
+
+    A process that writes a model increments its counter. Other processes
+    call `poll`, which only reads a few bytes of shared memory, to learn
+    which models changed since their previous poll.
+    """
+
+    def __init__(self, path: str, models: tuple[str, ...] = MODELS) -> None:
+        """Opens the counters file, creating it if needed"""
+        self.__models = models
+        size = _COUNTER.size * len(models)
+
+        self.__fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        with self.__locked():
+            if os.fstat(self.__fd).st_size < size:
+                os.ftruncate(self.__fd, size)
+
+        self.__map = mmap.mmap(self.__fd, size)
+        self.__size = size
+        self.__raw = self.__map[:size]
+        self.__seen = self.generations()
+
+    def __locked(self):
+        """Helper method returning a context manager holding the file lock"""
+        return _FileLock(self.__fd)
+
+    def generations(self) -> dict[str, int]:
+        """Returns the current generation of every model"""
+        return self.__unpack(self.__map)
+
+    def __unpack(self, buffer) -> dict[str, int]:
+        """Reads the generation of every model from a copy of the file"""
+        return {
+            model: _COUNTER.unpack_from(buffer, i * _COUNTER.size)[0]
+            for i, model in enumerate(self.__models)
+        }
+
+    def publish(self, model: str) -> None:
+        """Tells the other processes that a model changed"""
+        if model not in self.__models:
+            return
+
+        offset = self.__models.index(model) * _COUNTER.size
+
+        with self.__locked():
+            generation = _COUNTER.unpack_from(self.__map, offset)[0]
+            _COUNTER.pack_into(self.__map, offset, generation + 1)
+
+        # Our own change does not have to be reported back to us, unless
+        # another process changed the model since our last poll
+        if self.__seen[model] == generation:
+            self.__seen[model] = generation + 1
+
+    def poll(self) -> list[str]:
+        """Returns the models changed by other processes since last poll"""
+        # Comparing the raw counters keeps the common case to one copy
+        raw = self.__map[:self.__size]
+
+        if raw == self.__raw:
+            return []
+
+        self.__raw = raw
+        generations = self.__unpack(raw)
+        changed = [
+            model
+            for model, generation in generations.items()
+            if generation != self.__seen[model]
+        ]
+        self.__seen = generations
+
+        return changed
+
+    def close(self) -> None:
+        """Unmaps and closes the counters file"""
+        self.__map.close()
+        os.close(self.__fd)
+
+
+class _FileLock:
+    """Holds an exclusive lock on a file descriptor while in a with block"""
+
+    def __init__(self, fd: int) -> None:
+        """Wraps a file descriptor"""
+        self.__fd = fd
+
+    def __enter__(self) -> None:
+        """Waits for the lock"""
+        # lockf locks belong to the process, unlike flock ones which are
+        # shared with the workers forked from a preloaded app
+        fcntl.lockf(self.__fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info) -> None:
+        """Releases the lock"""
+        fcntl.lockf(self.__fd, fcntl.LOCK_UN)
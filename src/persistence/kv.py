@@ -0,0 +1,547 @@
+"""
+This module exports a Repository that persists data in a key-value store
+of the standard library `dbm` family
+"""
+
+import atexit
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+import dbm
+import fcntl
+import json
+import os
+import threading
+from typing import Iterator
+import zlib
+
+from src.persistence.indexes import INDEXED_FIELDS, SecondaryIndexes
+from src.persistence.query import apply_query, indexed_filter
+from src.persistence.records import RECORDS, to_record
+from src.persistence.repository import Repository
+from src.persistence.serialization import from_json, json_default, to_json
+from utils.constants import KV_STORAGE_BUCKET_SIZE, KV_STORAGE_FILENAME
+from utils.populate import populate_db
+
+# Key holding the version of the layout of the id sets, stores without it
+# are new or were written by an older version
+_FORMAT_KEY = "kv#format"
+_FORMAT = "2"
+
+
+class KVRepository(Repository):
+    """
+    Key-Value Repository
+
+    Nothing is kept in memory: every object is stored as JSON under the
+    key `model:id` and read back when asked for, so `get` costs one lookup
+    and a write only touches the keys of the objects it changes.
+
+    The ids of each model, `model#ids`, are a set `get_all` and `query`
+    walk. The INDEXED_FIELDS have one set per value, `model#field=value`,
+    holding the matching ids, which back `find_by`. Each set is split over
+    buckets by linear hashing (see _IdSets) so that no bucket holds much
+    more than `bucket_size` ids, whatever the size of the set: a write
+    rewrites a few short buckets, not lists growing with the dataset.
+
+    A dbm file cannot be shared between processes: `dbm.gnu` allows one
+    writer at a time and `dbm.dumb` rewrites its index without any lock.
+    The store is locked by the process that opens it, another one fails to
+    open it, and a forked process cannot use the store of its parent. Run
+    a single worker (with threads) on this backend.
+
+    `transaction()` holds the lock of the repository for its block and
+    keeps the previous value of every key written (see _UndoLog), which
+    are written back if the block raises.
+    """
+
+    def __init__(
+        self,
+        filename: str = KV_STORAGE_FILENAME,
+        bucket_size: int = KV_STORAGE_BUCKET_SIZE,
+    ) -> None:
+        """Opens the store, creating it if needed"""
+        self.__filename = filename
+        self.__bucket_size = bucket_size
+        self.__lock = threading.RLock()
+        self.__db = None
+        self.__lock_file = None
+        self.__pid = None
+        # Previous values of the keys written by the open transaction
+        self.__undo = None
+        # Only used to know which fields are indexed
+        self.__indexes = SecondaryIndexes()
+        self.reload()
+        # Some dbm implementations only write their index when closed
+        atexit.register(self.close)
+
+    def _db(self):
+        """Helper method to get the open store, owned by this process"""
+        if self.__pid != os.getpid():
+            raise RuntimeError(
+                f"{self.__filename} was opened by process {self.__pid}, a"
+                " KVRepository cannot be shared with forked processes"
+            )
+
+        return self.__db if self.__undo is None else self.__undo
+
+    def _sets(self) -> "_IdSets":
+        """Helper method to start the changes of the id sets of a write"""
+        return _IdSets(self._db(), self.__bucket_size)
+
+    def _load(self, model: str, obj_id):
+        """Helper method to read and decode one object"""
+        raw = self._db().get(f"{model}:{obj_id}")
+
+        if raw is None:
+            return None
+
+        return from_json(RECORDS[model], json.loads(raw))
+
+    def reload(self):
+        """Reopens the store, whose content always lives on disk"""
+        with self.__lock:
+            self.close()
+            self._lock_store()
+            self.__db = dbm.open(self.__filename, "c")
+            self.__pid = os.getpid()
+
+            if self.__db.get(_FORMAT_KEY) == _FORMAT.encode():
+                return
+
+            if next(iter(self.__db.keys()), None) is None:
+                populate_db(self)
+            else:
+                self._rebuild_sets()
+
+            self.__db[_FORMAT_KEY] = _FORMAT
+
+    def _lock_store(self):
+        """
+        Helper method to lock the store for this process, failing if
+        another process has it open
+        """
+        self.__lock_file = open(f"{self.__filename}.lock", "a")
+
+        try:
+            fcntl.flock(self.__lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.__lock_file.close()
+            self.__lock_file = None
+            raise RuntimeError(
+                f"{self.__filename} is open in another process, the kv"
+                " repository only supports one process (gunicorn -w 1)"
+            ) from None
+
+    def _rebuild_sets(self):
+        """
+        Helper method to build the id sets again from the stored objects,
+        dropping the id lists of older versions
+        """
+        db = self.__db
+        keys = [key.decode() for key in db.keys()]
+        sets = _IdSets(db, self.__bucket_size)
+
+        for key in keys:
+            if "#" in key:
+                del db[key]
+
+        for key in keys:
+            model, _, obj_id = key.partition(":")
+
+            if "#" not in key and model in RECORDS:
+                sets.add(f"{model}#ids", obj_id)
+
+                for field in INDEXED_FIELDS.get(model, ()):
+                    value = getattr(self._load(model, obj_id), field, None)
+                    sets.add(_index_key(model, field, value), obj_id)
+
+        sets.store()
+
+    def flush(self):
+        """Writes the buffered changes of the dbm implementation to disk"""
+        with self.__lock:
+            sync = getattr(self._db(), "sync", None)
+
+            if sync is not None:
+                sync()
+
+    def close(self):
+        """Closes the store and releases it for other processes"""
+        with self.__lock:
+            if self.__db is not None and self.__pid == os.getpid():
+                self.__db.close()
+
+            self.__db = None
+
+            if self.__lock_file is not None:
+                self.__lock_file.close()
+                self.__lock_file = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Holds the lock for a with block, undoing its writes if it raises
+        """
+        with self.__lock:
+            if self.__undo is not None:
+                yield
+                return
+
+            self.__undo = _UndoLog(self._db())
+
+            try:
+                yield
+            except BaseException:
+                self.__undo.rollback()
+                raise
+            finally:
+                self.__undo = None
+
+    def get_all(self, model_name: str) -> list:
+        """Get all objects of a given model"""
+        with self.__lock:
+            return self._load_many(
+                model_name, _read_ids(self._db(), f"{model_name}#ids")
+            )
+
+    def get(self, model_name: str, obj_id: str):
+        """Get an object by its ID"""
+        with self.__lock:
+            return self._load(model_name, obj_id)
+
+    def iter_batches(self, model_name: str, size: int, after=None):
+        """
+        Yields the objects of a model sorted by id, size at a time. Only
+        the ids are read upfront, each batch loads its own objects.
+        """
+        with self.__lock:
+            ids = sorted(_read_ids(self._db(), f"{model_name}#ids"))
+
+        start = 0 if after is None else bisect_right(ids, after)
+
+        for position in range(start, len(ids), size):
+            yield self.get_many(model_name, ids[position:position + size])
+
+    def get_many(self, model_name: str, ids: list) -> list:
+        """Get the objects of a given model with the given IDs"""
+        with self.__lock:
+            return self._load_many(model_name, ids)
+
+    def _load_many(self, model_name: str, ids) -> list:
+        """Helper method to read several objects, skipping missing ones"""
+        objects = (self._load(model_name, obj_id) for obj_id in ids)
+
+        return [obj for obj in objects if obj is not None]
+
+    def find_by(self, model_name: str, field: str, value) -> list:
+        """Get all objects of a given model whose field equals value"""
+        if not self.__indexes.is_indexed(model_name, field):
+            return [
+                obj
+                for obj in self.get_all(model_name)
+                if getattr(obj, field, None) == value
+            ]
+
+        with self.__lock:
+            ids = _read_ids(self._db(), _index_key(model_name, field, value))
+
+            return self._load_many(model_name, ids)
+
+    def query(
+        self,
+        model_name: str,
+        filters: dict | None = None,
+        order_by: str | tuple | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ) -> list:
+        """Get the objects of a given model matching a query"""
+        indexed = indexed_filter(self.__indexes, model_name, filters)
+
+        if indexed is not None:
+            objects = self.find_by(model_name, *indexed)
+        else:
+            objects = self.get_all(model_name)
+
+        return apply_query(objects, filters, order_by, limit, after)
+
+    def save(self, obj):
+        """Save an object"""
+        self.save_many([obj])
+
+    def save_many(self, objs: list):
+        """Save several objects, writing each index key once"""
+        self._write(objs)
+
+    def update(self, obj):
+        """Update an object"""
+        if self.get(obj.__class__.__name__.lower(), obj.id) is None:
+            return None
+
+        self.update_many([obj])
+
+        return obj
+
+    def update_many(self, objs: list):
+        """Update several objects, writing each index key once"""
+        for obj in objs:
+            obj.updated_at = datetime.utcnow()
+
+        self._write(objs, existing_only=True)
+
+    def delete(self, obj) -> bool:
+        """Delete an object"""
+        return self.delete_many([obj]) > 0
+
+    def delete_many(self, objs: list) -> int:
+        """Delete several objects, writing each index key once"""
+        deleted = 0
+
+        with self.__lock:
+            db = self._db()
+            sets = self._sets()
+
+            for obj in objs:
+                model = obj.__class__.__name__.lower()
+                old = self._load(model, obj.id)
+
+                if old is None:
+                    continue
+
+                del db[f"{model}:{obj.id}"]
+                sets.discard(f"{model}#ids", obj.id)
+                self._unindex(model, old, sets)
+                deleted += 1
+
+            sets.store()
+
+        return deleted
+
+    def _write(self, objs: list, existing_only: bool = False):
+        """Helper method to store objects and move their index entries"""
+        with self.__lock:
+            db = self._db()
+            sets = self._sets()
+
+            for obj in objs:
+                obj = to_record(obj)
+                model = obj.__class__.__name__.lower()
+                old = self._load(model, obj.id)
+
+                if old is None and existing_only:
+                    continue
+
+                db[f"{model}:{obj.id}"] = json.dumps(
+                    to_json(obj), default=json_default
+                )
+
+                if old is None:
+                    sets.add(f"{model}#ids", obj.id)
+                else:
+                    self._unindex(model, old, sets)
+
+                for field in INDEXED_FIELDS.get(model, ()):
+                    key = _index_key(model, field, getattr(obj, field, None))
+                    sets.add(key, obj.id)
+
+            sets.store()
+
+    def _unindex(self, model: str, old, sets: "_IdSets"):
+        """Helper method to drop an object from the index keys of its values"""
+        for field in INDEXED_FIELDS.get(model, ()):
+            key = _index_key(model, field, getattr(old, field, None))
+            sets.discard(key, old.id)
+
+
+class _UndoLog:
+    """
+    The store as seen by a transaction of a KVRepository: writes go
+    through, and the value each key had before the first of them is kept
+    so that `rollback` can write it back
+    """
+
+    def __init__(self, db) -> None:
+        """Wraps a store with nothing written yet"""
+        self.__db = db
+        self.__previous: dict = {}
+
+    def __getattr__(self, name: str):
+        """Reads and other methods are those of the store"""
+        return getattr(self.__db, name)
+
+    def __contains__(self, key) -> bool:
+        """Whether the store has a key"""
+        return key in self.__db
+
+    def __setitem__(self, key, value) -> None:
+        """Writes a key, keeping its previous value"""
+        self._keep(key)
+        self.__db[key] = value
+
+    def __delitem__(self, key) -> None:
+        """Deletes a key, keeping its previous value"""
+        self._keep(key)
+        del self.__db[key]
+
+    def _keep(self, key) -> None:
+        """Helper method to keep the value of a key before its first write"""
+        if key not in self.__previous:
+            self.__previous[key] = self.__db.get(key)
+
+    def rollback(self) -> None:
+        """Writes back the previous value of every key written"""
+        for key, value in self.__previous.items():
+            if value is not None:
+                self.__db[key] = value
+            elif key in self.__db:
+                del self.__db[key]
+
+        self.__previous.clear()
+
+
+class _IdSets:
+    """
+    The id sets one write of a KVRepository reads and changes, each key
+    being written once when `store` is called
+
+    A set named `name` is stored as its state `[level, split, count]`
+    under `name` and its ids as JSON lists under `name:0`, `name:1`...
+    With linear hashing there are `2 ** level + split` buckets: an id goes
+    to bucket `hash % 2 ** level`, or `hash % 2 ** (level + 1)` when that
+    bucket was split already. Once the set holds more than `bucket_size`
+    ids per bucket on average, bucket `split` is split in two, so the
+    buckets grow with the set one at a time and a write rewrites a bucket
+    of about `bucket_size` ids. Deleting ids never merges buckets back.
+    """
+
+    def __init__(self, db, bucket_size: int) -> None:
+        """Starts with nothing read from the store"""
+        self.__db = db
+        self.__bucket_size = bucket_size
+        self.__states: dict[str, list] = {}
+        self.__buckets: dict[str, dict] = {}
+        self.__changed: set[str] = set()
+
+    def _state(self, name: str) -> list:
+        """Helper method to get the state of a set, read once"""
+        state = self.__states.get(name)
+
+        if state is None:
+            raw = self.__db.get(name)
+            state = self.__states[name] = json.loads(raw) if raw else [0, 0, 0]
+
+        return state
+
+    def _bucket(self, name: str, number: int) -> dict:
+        """Helper method to get the ids of a bucket, read once"""
+        key = f"{name}:{number}"
+        ids = self.__buckets.get(key)
+
+        if ids is None:
+            raw = self.__db.get(key)
+            ids = self.__buckets[key] = dict.fromkeys(json.loads(raw or "[]"))
+
+        return ids
+
+    def add(self, name: str, obj_id: str) -> None:
+        """Adds an id to a set"""
+        state = self._state(name)
+        number = _bucket_number(state, obj_id)
+        ids = self._bucket(name, number)
+
+        if obj_id in ids:
+            return
+
+        ids[obj_id] = None
+        state[2] += 1
+        self.__changed.update((name, f"{name}:{number}"))
+
+        level, split, count = state
+
+        if count > self.__bucket_size * (2**level + split):
+            self._split(name, state)
+
+    def _split(self, name: str, state: list) -> None:
+        """Helper method to split the next bucket of a set in two"""
+        level, split, _ = state
+        sibling = split + 2**level
+        ids = self._bucket(name, split)
+        moved = self._bucket(name, sibling)
+
+        for obj_id in list(ids):
+            if _hash(obj_id) % 2 ** (level + 1) == sibling:
+                moved[obj_id] = ids.pop(obj_id)
+
+        if sibling + 1 == 2 ** (level + 1):
+            state[0], state[1] = level + 1, 0
+        else:
+            state[1] = split + 1
+
+        self.__changed.update((f"{name}:{split}", f"{name}:{sibling}"))
+
+    def discard(self, name: str, obj_id: str) -> None:
+        """Removes an id from a set, if it is there"""
+        state = self._state(name)
+        number = _bucket_number(state, obj_id)
+        ids = self._bucket(name, number)
+
+        if obj_id not in ids:
+            return
+
+        del ids[obj_id]
+        state[2] -= 1
+        self.__changed.update((name, f"{name}:{number}"))
+
+    def store(self) -> None:
+        """Writes the states and buckets changed, dropping empty ones"""
+        db = self.__db
+
+        for key in self.__changed:
+            if key in self.__states:
+                value = self.__states[key]
+                empty = not value[2]
+            else:
+                value = list(self.__buckets[key])
+                empty = not value
+
+            if not empty:
+                db[key] = json.dumps(value)
+            elif key in db:
+                del db[key]
+
+        self.__changed.clear()
+
+
+def _hash(obj_id: str) -> int:
+    """Returns the hash of an id that picks its bucket"""
+    return zlib.crc32(str(obj_id).encode())
+
+
+def _bucket_number(state: list, obj_id: str) -> int:
+    """Returns the bucket of a set, given its state, holding an id"""
+    level, split, _ = state
+    number = _hash(obj_id) % 2**level
+
+    if number < split:
+        number = _hash(obj_id) % 2 ** (level + 1)
+
+    return number
+
+
+def _read_ids(db, name: str) -> Iterator[str]:
+    """Yields the ids of a set, bucket by bucket"""
+    raw = db.get(name)
+
+    if not raw:
+        return
+
+    level, split, _ = json.loads(raw)
+
+    for number in range(2**level + split):
+        yield from json.loads(db.get(f"{name}:{number}") or "[]")
+
+
+def _index_key(model: str, field: str, value) -> str:
+    """Returns the key listing the ids of the objects with a field value"""
+    return f"{model}#{field}={json.dumps(value, default=json_default)}"
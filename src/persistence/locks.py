@@ -0,0 +1,110 @@
+"""
+This module exports the reader/writer lock the in-memory repositories use
+so many threads can read while writes are serialized
+"""
+
+from contextlib import contextmanager
+import threading
+from typing import Iterator
+
+
+class RWLock:
+    """
+    Lets any number of threads read, or a single thread write
+
+    Once a writer waits no new reader gets in, so a steady flow of reads
+    cannot starve writes. Locks are reentrant per thread: a thread holding
+    the lock may take it again to read, and a writer may also write again,
+    but a reader cannot upgrade to writing.
+    """
+
+    def __init__(self) -> None:
+        """Creates an unlocked lock"""
+        self.__condition = threading.Condition(threading.Lock())
+        self.__readers = 0
+        self.__writer: int | None = None
+        self.__waiting_writers = 0
+        self.__local = threading.local()
+
+    def __depths(self) -> tuple[int, int]:
+        """Returns how many reads and writes the current thread holds"""
+        return (
+            getattr(self.__local, "reads", 0),
+            getattr(self.__local, "writes", 0),
+        )
+
+    def acquire_read(self) -> None:
+        """Waits until no writer holds or waits for the lock"""
+        reads, writes = self.__depths()
+
+        # Nested acquisitions must not wait for writers queued behind us
+        if not reads and not writes:
+            with self.__condition:
+                while self.__writer is not None or self.__waiting_writers:
+                    self.__condition.wait()
+
+                self.__readers += 1
+
+        self.__local.reads = reads + 1
+
+    def release_read(self) -> None:
+        """Releases a read, waking the writers once no reader is left"""
+        reads, writes = self.__depths()
+        self.__local.reads = reads - 1
+
+        if reads == 1 and not writes:
+            with self.__condition:
+                self.__readers -= 1
+
+                if not self.__readers:
+                    self.__condition.notify_all()
+
+    def acquire_write(self) -> None:
+        """Waits until no other thread reads or writes"""
+        reads, writes = self.__depths()
+
+        if writes:
+            self.__local.writes = writes + 1
+            return
+
+        if reads:
+            raise RuntimeError("Cannot upgrade a read lock to a write lock")
+
+        with self.__condition:
+            self.__waiting_writers += 1
+
+            while self.__writer is not None or self.__readers:
+                self.__condition.wait()
+
+            self.__waiting_writers -= 1
+            self.__writer = threading.get_ident()
+
+        self.__local.writes = 1
+
+    def release_write(self) -> None:
+        """Releases a write, waking every waiting thread once fully released"""
+        reads, writes = self.__depths()
+        self.__local.writes = writes - 1
+
+        if writes == 1:
+            with self.__condition:
+                self.__writer = None
+                self.__condition.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Holds the lock for reading inside a with block"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Holds the lock for writing inside a with block"""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
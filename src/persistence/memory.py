@@ -3,9 +3,22 @@ This module exports a Repository that does not persist data,
 it only stores it in memory
 """
 
+from contextlib import contextmanager
 from datetime import datetime
+import os
+from typing import Iterator
 from src.models.base import Base
+from src.persistence.columnar import ColumnarReviews
+from src.persistence.indexes import SecondaryIndexes
+from src.persistence.locks import RWLock
+from src.persistence.query import (
+    apply_query,
+    indexed_filter,
+    sorted_batches,
+)
+from src.persistence.records import to_record
 from src.persistence.repository import Repository
+from utils.constants import MEMORY_COLUMNAR_ENV_VAR
 from utils.populate import populate_db
 
 
@@ -13,68 +26,205 @@ class MemoryRepository(Repository):
     """
     A Repository that does not persist data, it only stores it in memory
 
+    Objects are kept in one dict per model keyed by id, so lookups,
+    updates and deletes do not depend on how many objects are stored.
+    Dicts keep insertion order, which is the order `get_all` returns.
+    Secondary indexes on foreign keys and emails back `find_by`. Objects
+    are stored as slotted records (see records.py), not ORM instances.
 
+    With `columnar=True` (or `MEMORY_COLUMNAR_REVIEWS=1`) reviews are kept
+    in a ColumnarReviews store instead, which takes a fraction of the
+    memory and filters by place or user without visiting every review.
+
+    Reads hold a shared lock and writes an exclusive one (see RWLock), so
+    threads read in parallel and never see a write half done.
+    `transaction()` holds the exclusive lock for a whole with block, so
+    other threads see all of its writes or none, but nothing is undone if
+    it raises since there is nothing to roll back to.
 
     Every time the server is restarted, the data is lost
     """
 
-    __data: dict[str, list] = {
-        "country": [],
-        "user": [],
-        "amenity": [],
-        "city": [],
-        "review": [],
-        "place": [],
-        "placeamenity": [],
-    }
-
-    def __init__(self) -> None:
+    # A transaction per request would hold the exclusive lock for the whole
+    # request, serializing every request, reads included
+    unit_of_work = False
+
+    __data: dict[str, dict[str, Base]]
+
+    def __init__(self, columnar: bool | None = None) -> None:
         """Calls reload method"""
+        if columnar is None:
+            columnar = os.getenv(MEMORY_COLUMNAR_ENV_VAR) == "1"
+
+        self.__columns = {"review": ColumnarReviews()} if columnar else {}
+        self.__data = {
+            "country": {},
+            "user": {},
+            "amenity": {},
+            "city": {},
+            "review": {},
+            "place": {},
+            "placeamenity": {},
+        }
+        self.__indexes = SecondaryIndexes()
+        self.__lock = RWLock()
         self.reload()
 
     def get_all(self, model_name: str) -> list:
         """Get all objects of a given model"""
-        return self.__data.get(model_name, [])
+        with self.__lock.read():
+            if model_name in self.__columns:
+                return self.__columns[model_name].get_all()
+
+            return list(self.__data.get(model_name, {}).values())
+
+    def iter_batches(self, model_name: str, size: int, after=None):
+        """Yields the objects of a model sorted by id, size at a time"""
+        return sorted_batches(self.get_all(model_name), size, after)
 
     def get(self, model_name: str, obj_id: str):
         """Get an object by its ID"""
-        for obj in self.get_all(model_name):
-            if obj.id == obj_id:
-                return obj
-        return None
+        with self.__lock.read():
+            if model_name in self.__columns:
+                return self.__columns[model_name].get(obj_id)
+
+            return self.__data.get(model_name, {}).get(obj_id)
+
+    def get_many(self, model_name: str, ids: list) -> list:
+        """Get the objects of a given model with the given IDs"""
+        with self.__lock.read():
+            if model_name in self.__columns:
+                objects = (self.get(model_name, obj_id) for obj_id in ids)
+                return [obj for obj in objects if obj is not None]
+
+            objects = self.__data.get(model_name, {})
+
+            return [objects[obj_id] for obj_id in ids if obj_id in objects]
+
+    def find_by(self, model_name: str, field: str, value) -> list:
+        """Get all objects of a given model whose field equals value"""
+        with self.__lock.read():
+            if model_name in self.__columns:
+                return self.__columns[model_name].find_by(field, value)
+
+            objects = self.__data.get(model_name, {})
+            ids = self.__indexes.lookup(model_name, field, value)
+
+            if ids is None:
+                return [
+                    obj
+                    for obj in objects.values()
+                    if getattr(obj, field, None) == value
+                ]
+
+            return [objects[obj_id] for obj_id in ids]
+
+    def query(
+        self,
+        model_name: str,
+        filters: dict | None = None,
+        order_by: str | tuple | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ) -> list:
+        """Get the objects of a given model matching a query"""
+        with self.__lock.read():
+            if model_name in self.__columns:
+                return self.__columns[model_name].query(
+                    filters, order_by, limit, after
+                )
+
+            indexed = indexed_filter(self.__indexes, model_name, filters)
+
+            if indexed is not None:
+                objects = self.find_by(model_name, *indexed)
+            elif self.__indexes.is_ordered_by(order_by):
+                # Already sorted and starting after the cursor
+                objects = (
+                    self.get(model_name, obj_id)
+                    for obj_id in self.__indexes.ordered_ids(model_name, after)
+                )
+                return apply_query(objects, filters, limit=limit)
+            else:
+                objects = self.__data.get(model_name, {}).values()
+
+            return apply_query(objects, filters, order_by, limit, after)
 
     def reload(self):
         """Populates the database with some dummy data"""
-        populate_db(self)
+        with self.__lock.write():
+            populate_db(self)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Holds the write lock for a with block"""
+        with self.__lock.write():
+            yield
 
     def save(self, obj: Base):
         """Save an object"""
-        cls = obj.__class__.__name__.lower()
+        with self.__lock.write():
+            obj = to_record(obj)
+            cls = obj.__class__.__name__.lower()
+
+            if cls in self.__columns:
+                if obj.id not in self.__columns[cls]:
+                    self.__columns[cls].put(obj)
+            elif obj.id not in self.__data[cls]:
+                self.__data[cls][obj.id] = obj
+                self.__indexes.add(cls, obj)
 
-        if obj not in self.__data[cls]:
-            # print(f"Saving {obj}, {cls}")
-            self.__data[cls].append(obj)
+            return obj
 
-        return obj
+    def save_many(self, objs: list) -> None:
+        """Save several objects"""
+        with self.__lock.write():
+            for obj in objs:
+                self.save(obj)
 
     def update(self, obj: Base):
         """Update an object"""
-        cls = obj.__class__.__name__.lower()
+        with self.__lock.write():
+            cls = obj.__class__.__name__.lower()
+            store = self.__columns.get(cls, self.__data[cls])
 
-        for i, o in enumerate(self.__data[cls]):
-            if o.id == obj.id:
-                obj.updated_at = datetime.now()
-                self.__data[cls][i] = obj
-                return obj
+            if obj.id not in store:
+                return None
 
-        return None
+            obj.updated_at = datetime.utcnow()
+            obj = to_record(obj)
+
+            if cls in self.__columns:
+                self.__columns[cls].put(obj)
+            else:
+                self.__data[cls][obj.id] = obj
+                self.__indexes.update(cls, obj)
+
+            return obj
+
+    def update_many(self, objs: list) -> None:
+        """Update several objects"""
+        with self.__lock.write():
+            for obj in objs:
+                self.update(obj)
 
     def delete(self, obj: Base) -> bool:
         """Delete an object"""
-        cls = obj.__class__.__name__.lower()
+        with self.__lock.write():
+            cls = obj.__class__.__name__.lower()
+
+            if cls in self.__columns:
+                return self.__columns[cls].remove(obj.id)
+
+            if obj.id not in self.__data[cls]:
+                return False
+
+            del self.__data[cls][obj.id]
+            self.__indexes.remove(cls, obj.id)
 
-        if obj in self.__data[cls]:
-            self.__data[cls].remove(obj)
             return True
 
-        return False
+    def delete_many(self, objs: list) -> int:
+        """Delete several objects"""
+        with self.__lock.write():
+            return sum(self.delete(obj) for obj in objs)
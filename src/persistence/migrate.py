@@ -0,0 +1,116 @@
+"""
+This module exports the copy of every object of one repository into
+another, which `python manage.py migrate-data` runs
+"""
+
+import json
+import os
+import time
+from typing import Callable
+
+from src.persistence.repository import Repository
+from utils.constants import MIGRATION_BATCH_SIZE
+
+# Parents first, so the foreign keys of a database target already exist
+MIGRATION_ORDER = (
+    "country",
+    "user",
+    "amenity",
+    "city",
+    "place",
+    "placeamenity",
+    "review",
+)
+
+
+class MigrationState:
+    """
+    Progress of a migration: the last id copied of each model and the
+    models already done, saved as JSON after every batch so a migration
+    that stopped can resume where it was
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """Reads the state saved at path, if any"""
+        self.path = path
+        self.last_ids: dict[str, str] = {}
+        self.done: list[str] = []
+
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+
+            self.last_ids = data.get("last_ids", {})
+            self.done = data.get("done", [])
+
+    def save(self) -> None:
+        """Writes the state, replacing the previous one at once"""
+        if self.path is None:
+            return
+
+        temporary = f"{self.path}.tmp"
+
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"last_ids": self.last_ids, "done": self.done}, file)
+
+        os.replace(temporary, self.path)
+
+
+def migrate(
+    source: Repository,
+    target: Repository,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    models: tuple[str, ...] = MIGRATION_ORDER,
+    state_path: str | None = None,
+    report: Callable[[str], None] = print,
+) -> dict[str, int]:
+    """
+    Copies the objects of each model from source to target, batch_size at
+    a time in id order. Each batch is read with `iter_batches`, saved with
+    one `upsert_many` in a transaction and flushed before the state records
+    its last id, so resuming never skips an object. A batch saved before
+    its id was recorded is saved again on resume, updating the copies.
+    Returns how many objects of each model were copied.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+
+    state = MigrationState(state_path)
+    copied: dict[str, int] = {}
+    started = time.perf_counter()
+
+    for model in models:
+        if model in state.done:
+            report(f"{model}: already copied, skipped")
+            continue
+
+        count = 0
+        model_started = time.perf_counter()
+        batches = source.iter_batches(
+            model, batch_size, state.last_ids.get(model)
+        )
+
+        for batch in batches:
+            with target.transaction():
+                target.upsert_many(batch)
+
+            target.flush()
+            count += len(batch)
+            state.last_ids[model] = batch[-1].id
+            state.save()
+
+            elapsed = time.perf_counter() - model_started
+            report(f"{model}: {count} copied ({count / elapsed:,.0f}/s)")
+
+        state.done.append(model)
+        state.save()
+        copied[model] = count
+
+    elapsed = time.perf_counter() - started
+    total = sum(copied.values())
+    report(
+        f"{total} objects copied in {elapsed:.1f}s"
+        f" ({total / elapsed if elapsed else 0:,.0f}/s)"
+    )
+
+    return copied
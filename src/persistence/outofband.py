@@ -0,0 +1,95 @@
+"""
+This module exports how PickleRepository pickles its shards: with
+protocol 5, the buffers of a shard (the columns of a ColumnarReviews) being
+written out-of-band to a sidecar file that is memory mapped on load
+
+A shard file starts with a header, `(HEADER, sidecar name or None)`,
+followed by the pickle of the shard. The sidecar holds every buffer in the
+order the pickle refers to them, each as its `<Q` length then its bytes,
+padded to 8 bytes so the columns stay aligned. On load the shard is
+unpickled with views of the mapped sidecar as its buffers, so the bulk of
+the data is neither read nor copied until it is used.
+
+A sidecar is never rewritten: each write of a shard gets a new name, and
+the previous sidecar is removed once the shard file refers to the new one.
+Files pickled without a header, by older versions, still load.
+"""
+
+import mmap
+import os
+import pickle
+import struct
+from typing import IO, Iterator
+
+PROTOCOL = 5
+HEADER = "hbnb-pickle5"
+SIDECAR_SUFFIX = ".buf"
+
+_LENGTH = struct.Struct("<Q")
+_ALIGNMENT = 8
+
+
+def dump(obj, file: IO, sidecar: str | None = None) -> bool:
+    """
+    Pickles an object to a file. With a sidecar filename its buffers are
+    written there rather than in the pickle. Returns whether the sidecar
+    was written, it is not when the object has no buffers.
+    """
+    name = None if sidecar is None else os.path.basename(sidecar)
+    pickle.dump((HEADER, name), file, protocol=PROTOCOL)
+
+    if sidecar is None:
+        pickle.dump(obj, file, protocol=PROTOCOL)
+        return False
+
+    with open(sidecar, "wb") as out:
+
+        def write(buffer: pickle.PickleBuffer) -> None:
+            """Appends a buffer to the sidecar, keeping it out-of-band"""
+            with buffer.raw() as view:
+                out.write(_LENGTH.pack(view.nbytes))
+                out.write(view)
+                out.write(bytes(-view.nbytes % _ALIGNMENT))
+
+        pickle.dump(obj, file, protocol=PROTOCOL, buffer_callback=write)
+        written = out.tell() > 0
+
+    if not written:
+        os.remove(sidecar)
+
+    return written
+
+
+def load(file: IO, directory: str) -> tuple[object, str | None]:
+    """
+    Unpickles an object written by dump, or by pickle.dump. Returns it and
+    the path of the sidecar its buffers are mapped from, if any.
+    """
+    obj = pickle.load(file)
+
+    if not (isinstance(obj, tuple) and obj[:1] == (HEADER,)):
+        return obj, None
+
+    name = obj[1]
+    sidecar = None if name is None else os.path.join(directory, name)
+
+    if sidecar is None or not os.path.exists(sidecar):
+        return pickle.load(file), None
+
+    return pickle.load(file, buffers=_mapped_buffers(sidecar)), sidecar
+
+
+def _mapped_buffers(filename: str) -> Iterator[memoryview]:
+    """Helper method to yield the buffers of a sidecar, memory mapped"""
+    with open(filename, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # The views keep the mapping open as long as the data uses them
+    view = memoryview(mapped)
+    offset = 0
+
+    while offset < len(view):
+        (length,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        yield view[offset:offset + length]
+        offset += length + -length % _ALIGNMENT
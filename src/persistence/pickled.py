@@ -1,77 +1,483 @@
 """
-This module exports a Repository that persists data in a pickle file
+This module exports a Repository that persists data in pickle files
 """
 
+from contextlib import contextmanager, suppress
+import os
 import pickle
+import threading
+import uuid
+import zlib
+from src.persistence.codecs import codec_of, get_codec
+from src.persistence.columnar import ColumnarReviews
+from src.persistence.indexes import SecondaryIndexes
+from src.persistence.outofband import SIDECAR_SUFFIX, dump, load
+from src.persistence.query import (
+    apply_query,
+    indexed_filter,
+    sorted_batches,
+)
+from src.persistence.records import to_record
 from src.persistence.repository import Repository
-from utils.constants import PICKLE_STORAGE_FILENAME
+from src.persistence.writebehind import WriteBehind
+from utils.constants import (
+    PICKLE_COLUMNAR_ENV_VAR,
+    PICKLE_STORAGE_DIRNAME,
+    PICKLE_STORAGE_FILENAME,
+    PICKLE_STORAGE_SHARDS,
+)
 
 
 class PickleRepository(Repository):
-    """Pickle Repository"""
-
-    __filename = PICKLE_STORAGE_FILENAME
-    __data: dict[str, list] = {
-        "country": [],
-        "user": [],
-        "amenity": [],
-        "city": [],
-        "review": [],
-        "place": [],
-        "placeamenity": [],
-    }
-
-    def __init__(self) -> None:
+    """
+    Pickle Repository
+
+    Each model is split into `shards` dicts by a hash of the object id and
+    every shard is pickled to its own file. Writes only mark the shard they
+    touch as dirty, and only dirty shards are rewritten, so saving a review
+    does not rewrite the users, places or cities.
+
+    With `codec="gzip"` (or `STORAGE_COMPRESSION=gzip`, see codecs.py) the
+    shard files are compressed and their names get the codec's suffix.
+    Shards written by another codec are rewritten on reload.
+
+    Shards are pickled with protocol 5 (see outofband.py). With
+    `columnar=True` (or `PICKLE_COLUMNAR_REVIEWS=1`) each review shard is
+    a ColumnarReviews store whose columns are written out-of-band to a
+    sidecar file next to the shard, unless the shards are compressed. On
+    reload that file is memory mapped and the store reads from it, so
+    reviews are served without being loaded or copied first. Columnar
+    review shards have no secondary indexes, the store filters by place
+    and user itself.
+
+    With `STORAGE_WRITE_BEHIND=1` the dirty shards are written by a
+    background thread instead of the request that changed them.
+
+    Inside `transaction()` the dirty shards are written once when the block
+    ends. If the block raises the changes are dropped and the shards are
+    reloaded.
+    """
+
+    __dirname = PICKLE_STORAGE_DIRNAME
+    __legacy_filename = PICKLE_STORAGE_FILENAME
+    __data: dict[str, list[dict]]
+
+    def __init__(
+        self,
+        shards: int = PICKLE_STORAGE_SHARDS,
+        codec: str | None = None,
+        columnar: bool | None = None,
+    ) -> None:
         """Calls reload method"""
+        if columnar is None:
+            columnar = os.getenv(PICKLE_COLUMNAR_ENV_VAR) == "1"
+
+        self.__shards = shards
+        self.__codec = get_codec(codec)
+        self.__columnar = {"review"} if columnar else set()
+        # Shard filename -> sidecar its buffers are mapped from
+        self.__sidecars: dict[str, str] = {}
+        self.__data = {
+            model: self._new_shards(model)
+            for model in (
+                "country",
+                "user",
+                "amenity",
+                "city",
+                "review",
+                "place",
+                "placeamenity",
+            )
+        }
+        self.__dirty: set[tuple[str, int]] = set()
+        self.__lock = threading.RLock()
+        self.__transaction_depth = 0
+        self.__indexes = SecondaryIndexes()
+        self.__write_behind = None
         self.reload()
+        self.__write_behind = WriteBehind.from_env(self.flush)
+
+    def _new_shards(self, model: str) -> list:
+        """Helper method to create the empty shards of a model"""
+        if model in self.__columnar:
+            return [ColumnarReviews() for _ in range(self.__shards)]
+
+        return [{} for _ in range(self.__shards)]
+
+    def _shard(self, obj_id) -> int:
+        """Helper method to get the shard an id belongs to"""
+        return zlib.crc32(str(obj_id).encode()) % self.__shards
+
+    def _shard_filename(self, model: str, shard: int) -> str:
+        """Helper method to get the file a shard is stored in"""
+        return self.__codec.path(
+            os.path.join(self.__dirname, f"{model}.{shard}.pkl")
+        )
+
+    def _objects(self, model: str, obj_id) -> dict:
+        """Helper method to get the shard dict an id belongs to"""
+        return self.__data[model][self._shard(obj_id)]
 
     def _save_to_file(self):
-        """Helper method to save the current object data to the file"""
-        with open(self.__filename, "wb") as file:
-            pickle.dump(self.__data, file)
+        """Helper method to save the dirty shards to their files"""
+        os.makedirs(self.__dirname, exist_ok=True)
+
+        for model, shard in self.__dirty:
+            filename = self._shard_filename(model, shard)
+            tmp_filename = f"{filename}.tmp"
+            # Mapped files cannot be compressed, their buffers stay inline
+            sidecar = None
+
+            if not self.__codec.compressed:
+                sidecar = f"{filename}.{uuid.uuid4().hex}{SIDECAR_SUFFIX}"
+
+            with self.__codec.open(tmp_filename, "wb") as file:
+                written = dump(self.__data[model][shard], file, sidecar)
+
+            os.replace(tmp_filename, filename)
+            previous = self.__sidecars.pop(filename, None)
+
+            if written:
+                self.__sidecars[filename] = sidecar
+
+            if previous is not None:
+                self._remove_sidecar(previous)
+
+        self.__dirty.clear()
+
+    def _remove_sidecar(self, sidecar: str):
+        """
+        Helper method to delete a sidecar no shard refers to anymore. Where
+        a file still mapped cannot be deleted, the next reload does it.
+        """
+        with suppress(OSError):
+            os.remove(sidecar)
+
+    def _persist(self):
+        """Helper method to write the dirty shards when they are due"""
+        if self.__transaction_depth:
+            return
+
+        if self.__write_behind is None:
+            self.flush()
+        else:
+            self.__write_behind.notify()
+
+    def flush(self):
+        """Writes the shards changed since the last write"""
+        with self.__lock:
+            self._save_to_file()
+
+    def close(self):
+        """Stops the background writer, then writes what is still pending"""
+        if self.__write_behind is not None:
+            self.__write_behind.close()
+
+        self.flush()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Writes the shards changed by a with block once when it ends, or
+        drops the changes and reloads the shards if it raises. Other threads
+        wait for the block to end before writing.
+        """
+        with self.__lock:
+            if not self.__transaction_depth:
+                # What was written before must survive a rollback
+                self.flush()
+
+            self.__transaction_depth += 1
+
+            try:
+                yield
+            except BaseException:
+                self.__transaction_depth -= 1
+                if not self.__transaction_depth:
+                    self._rollback()
+                raise
+            else:
+                self.__transaction_depth -= 1
+                self._persist()
+
+    def _rollback(self):
+        """Helper method to drop the unwritten changes and reload"""
+        self.__dirty.clear()
+        self.__indexes.clear()
+
+        for model in self.__data:
+            self.__data[model] = self._new_shards(model)
+
+        self.reload()
 
     def get_all(self, model_name: str) -> list:
         """Get all objects of a given model"""
-        return self.__data[model_name]
+        return [
+            obj
+            for objects in self.__data[model_name]
+            for obj in objects.values()
+        ]
 
     def get(self, model_name: str, obj_id: str):
         """Get an object by its ID"""
-        for obj in self.__data[model_name]:
-            if obj.id == obj_id:
-                return obj
-        return None
+        return self._objects(model_name, obj_id).get(obj_id)
+
+    def iter_batches(self, model_name: str, size: int, after=None):
+        """Yields the objects of a model sorted by id, size at a time"""
+        return sorted_batches(self.get_all(model_name), size, after)
+
+    def get_many(self, model_name: str, ids: list) -> list:
+        """Get the objects of a given model with the given IDs"""
+        objects = (self.get(model_name, obj_id) for obj_id in ids)
+
+        return [obj for obj in objects if obj is not None]
+
+    def find_by(self, model_name: str, field: str, value) -> list:
+        """Get all objects of a given model whose field equals value"""
+        if model_name in self.__columnar:
+            return [
+                obj
+                for store in self.__data[model_name]
+                for obj in store.find_by(field, value)
+            ]
+
+        ids = self.__indexes.lookup(model_name, field, value)
+
+        if ids is None:
+            return [
+                obj
+                for obj in self.get_all(model_name)
+                if getattr(obj, field, None) == value
+            ]
+
+        return [self.get(model_name, obj_id) for obj_id in ids]
+
+    def query(
+        self,
+        model_name: str,
+        filters: dict | None = None,
+        order_by: str | tuple | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ) -> list:
+        """Get the objects of a given model matching a query"""
+        if model_name in self.__columnar:
+            stores = self.__data[model_name]
+            objects = [
+                obj
+                for store in stores
+                for obj in store.query(filters, order_by, limit, after)
+            ]
+
+            if len(stores) == 1:
+                return objects
+
+            # The pages of every shard are merged into one
+            return apply_query(objects, order_by=order_by, limit=limit)
+
+        indexed = indexed_filter(self.__indexes, model_name, filters)
+
+        if indexed is not None:
+            objects = self.find_by(model_name, *indexed)
+        elif self.__indexes.is_ordered_by(order_by):
+            # Already sorted and starting after the cursor
+            objects = (
+                self.get(model_name, obj_id)
+                for obj_id in self.__indexes.ordered_ids(model_name, after)
+            )
+            return apply_query(objects, filters, limit=limit)
+        else:
+            objects = self.get_all(model_name)
+
+        return apply_query(objects, filters, order_by, limit, after)
 
     def reload(self):
-        """Reloads the data from the pickle file"""
-        try:
-            with open(self.__filename, "rb") as file:
-                self.__data = pickle.load(file)
-        except FileNotFoundError:
-            from src.models.country import Country
-
-            self.__data["country"] = [Country("Uruguay", "UY")]
+        """Reloads the data from the pickle files"""
+        self.__indexes.clear()
+
+        if os.path.isdir(self.__dirname):
+            self._load_shards()
+        elif os.path.exists(self.__legacy_filename):
+            self._load_legacy_file()
+        else:
+            from src.persistence.records import Country
+
+            self.save(Country("Uruguay", "UY"))
+
+    def _load_shards(self):
+        """Helper method to load every shard file of the storage directory"""
+        expected = {
+            self._shard_filename(model, shard): shard
+            for model in self.__data
+            for shard in range(self.__shards)
+        }
+        stale = []
+        sidecars = []
+        redistribute = set()
+        self.__sidecars.clear()
+
+        for name in sorted(os.listdir(self.__dirname)):
+            codec = codec_of(name)
+            model, _, extension = name[
+                :len(name) - len(codec.suffix)
+            ].partition(".")
+            filename = os.path.join(self.__dirname, name)
+
+            if name.endswith(SIDECAR_SUFFIX):
+                sidecars.append(filename)
+                continue
+
+            if model not in self.__data or not extension.endswith("pkl"):
+                continue
+
+            with codec.open(filename, "rb") as file:
+                objects, sidecar = load(file, self.__dirname)
+
+            if sidecar is not None:
+                self.__sidecars[filename] = sidecar
+
+            columnar = isinstance(objects, ColumnarReviews)
+            shard = expected.get(filename)
+            # After a shard count change some names are the same, but
+            # their ids belong to other shards
+            misplaced = shard is None or (
+                self.__shards > 1
+                and any(self._shard(obj_id) != shard for obj_id in objects)
+            )
+
+            if columnar and model in self.__columnar and not misplaced:
+                # Kept as loaded, its columns stay in the mapped file
+                self.__data[model][shard] = objects
+                continue
+
+            for obj in objects.values():
+                self._add(model, obj)
+
+            # Files left by a different shard count or codec are rewritten
+            if misplaced:
+                if shard is None:
+                    stale.append(filename)
+
+                redistribute.update(
+                    (model, shard) for shard in range(self.__shards)
+                )
+            elif columnar != (model in self.__columnar):
+                redistribute.add((model, shard))
+
+        self.__dirty = redistribute
+
+        if self.__dirty:
             self._save_to_file()
 
+        for filename in stale:
+            os.remove(filename)
+            sidecar = self.__sidecars.pop(filename, None)
+
+            if sidecar is not None:
+                self._remove_sidecar(sidecar)
+
+        # Sidecars of writes that did not finish
+        in_use = set(self.__sidecars.values())
+
+        for sidecar in sidecars:
+            if sidecar not in in_use:
+                self._remove_sidecar(sidecar)
+
+    def _load_legacy_file(self):
+        """Helper method to import the single file written by older versions"""
+        with open(self.__legacy_filename, "rb") as file:
+            data = pickle.load(file)
+
+        for model, objects in data.items():
+            if isinstance(objects, dict):
+                objects = objects.values()
+
+            for obj in objects:
+                self._add(model, obj)
+
+        self.__dirty.update(
+            (model, shard)
+            for model in self.__data
+            for shard in range(self.__shards)
+        )
+        self._save_to_file()
+
+    def _add(self, model: str, obj):
+        """Helper method to store and index an object, marking it dirty"""
+        obj = to_record(obj)
+        shard = self._shard(obj.id)
+
+        self.__data[model][shard][obj.id] = obj
+        self.__dirty.add((model, shard))
+
+        if model not in self.__columnar:
+            self.__indexes.update(model, obj)
+
     def save(self, obj, save_to_file=True):
         """Save an object"""
-        self.__data[obj.__class__.__name__.lower()].append(obj)
-        if save_to_file:
-            self._save_to_file()
+        with self.__lock:
+            self._add(obj.__class__.__name__.lower(), obj)
+
+            if save_to_file:
+                self._persist()
+
+    def save_many(self, objs: list):
+        """Save several objects, writing each dirty shard once"""
+        with self.__lock:
+            for obj in objs:
+                self._add(obj.__class__.__name__.lower(), obj)
+
+            self._persist()
 
     def update(self, obj):
         """Update an object"""
-        for i, o in enumerate(self.__data[obj.__class__.__name__.lower()]):
-            if o.id == obj.id:
-                self.__data[obj.__class__.__name__.lower()][i] = obj
-                self._save_to_file()
-                return
+        with self.__lock:
+            if self._replace(obj):
+                self._persist()
+
+    def update_many(self, objs: list):
+        """Update several objects, writing each dirty shard once"""
+        with self.__lock:
+            for obj in objs:
+                self._replace(obj)
+
+            self._persist()
+
+    def _replace(self, obj) -> bool:
+        """Helper method to replace a stored object, marking it dirty"""
+        model = obj.__class__.__name__.lower()
+
+        if obj.id not in self._objects(model, obj.id):
+            return False
+
+        self._add(model, obj)
+
+        return True
 
     def delete(self, obj) -> bool:
         """Delete an object"""
-        for i, o in enumerate(self.__data[obj.__class__.__name__.lower()]):
-            if o.id == obj.id:
-                del self.__data[obj.__class__.__name__.lower()][i]
-                break
+        with self.__lock:
+            self._remove(obj)
+            self._persist()
+
+        return True
+
+    def delete_many(self, objs: list) -> int:
+        """Delete several objects, writing each dirty shard once"""
+        with self.__lock:
+            deleted = sum(self._remove(obj) for obj in objs)
+            self._persist()
+
+        return deleted
+
+    def _remove(self, obj) -> bool:
+        """Helper method to drop a stored object, marking it dirty"""
+        model = obj.__class__.__name__.lower()
+
+        if self._objects(model, obj.id).pop(obj.id, None) is None:
+            return False
+
+        self.__indexes.remove(model, obj.id)
+        self.__dirty.add((model, self._shard(obj.id)))
 
-        self._save_to_file()
         return True
@@ -0,0 +1,40 @@
+"""
+This module exports the helpers that apply a performance profile of
+PRAGMA statements to every new SQLite connection of an engine
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict) -> None:
+    """Runs `PRAGMA name=value` on a DB-API connection for each pragma"""
+    cursor = dbapi_connection.cursor()
+
+    try:
+        for name, value in pragmas.items():
+            # PRAGMA does not accept bound parameters
+            if not name.isidentifier():
+                raise ValueError(f"Invalid pragma: {name}")
+
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def register_sqlite_pragmas(engine: Engine, pragmas: dict | None) -> bool:
+    """
+    Applies the pragmas to every connection the engine opens from now on,
+    returns whether the engine is an SQLite one the pragmas were registered
+    on
+    """
+    if not pragmas or engine.dialect.name != "sqlite":
+        return False
+
+    def on_connect(dbapi_connection, connection_record) -> None:
+        """Applies the profile to a new connection"""
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    event.listen(engine, "connect", on_connect)
+
+    return True
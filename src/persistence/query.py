@@ -0,0 +1,96 @@
+"""
+This module exports the helpers the in-memory repositories (memory, file
+and pickle) use to answer `Repository.query` and `iter_batches`
+"""
+
+from bisect import bisect_right
+import heapq
+from itertools import islice
+from operator import attrgetter
+from typing import Any, Iterable, Iterator
+
+from src.persistence.indexes import SecondaryIndexes, order_key
+
+
+def order_fields(order_by: str | tuple | list | None) -> tuple[str, ...]:
+    """Normalizes the order_by argument of a query to a tuple of fields"""
+    if order_by is None:
+        return ()
+    if isinstance(order_by, str):
+        return (order_by,)
+
+    return tuple(order_by)
+
+
+def indexed_filter(
+    indexes: SecondaryIndexes, model_name: str, filters: dict | None
+) -> tuple[str, Any] | None:
+    """Returns a (field, value) filter that can be served by an index"""
+    for field, value in (filters or {}).items():
+        if indexes.is_indexed(model_name, field):
+            return field, value
+
+    return None
+
+
+def apply_query(
+    objects: Iterable,
+    filters: dict | None = None,
+    order_by: str | tuple | list | None = None,
+    limit: int | None = None,
+    after: tuple | list | None = None,
+) -> list:
+    """
+    Keeps the objects whose fields equal `filters`, sorted by `order_by`,
+    after the `after` values of those fields and at most `limit` of them
+
+    When a limit is given only the `limit` smallest objects are kept while
+    sorting, so the cost does not include sorting the whole model.
+    """
+    fields = order_fields(order_by)
+
+    if after is not None and not fields:
+        raise ValueError("after requires order_by")
+
+    if filters:
+        objects = (
+            obj
+            for obj in objects
+            if all(
+                getattr(obj, field, None) == value
+                for field, value in filters.items()
+            )
+        )
+
+    if not fields:
+        return list(islice(objects, limit))
+
+    def key(obj) -> tuple:
+        """Sort key of an object for this query"""
+        return order_key(obj, fields)
+
+    if after is not None:
+        start = tuple((value is None, value) for value in after)
+        objects = (obj for obj in objects if key(obj) > start)
+
+    if limit is None:
+        return sorted(objects, key=key)
+
+    return heapq.nsmallest(limit, objects, key=key)
+
+
+def sorted_batches(
+    objects: Iterable, size: int, after: str | None = None
+) -> Iterator[list]:
+    """
+    Yields objects sorted by id, at most `size` at a time, starting after
+    the id `after`. They are sorted once, unlike a keyset query per batch.
+    """
+    objects = sorted(objects, key=attrgetter("id"))
+    start = 0
+
+    if after is not None:
+        start = bisect_right(objects, after, key=attrgetter("id"))
+
+    for position in range(start, len(objects), size):
+        yield objects[position:position + size]
@@ -0,0 +1,172 @@
+"""
+This module exports the plain record types the repositories that do not use
+the database (memory, file, pickle, kv and sqlite) store instead of the
+Flask-SQLAlchemy models, and the converters between both
+
+Records have the columns of their model as `__slots__` and `to_dict`, but
+none of the ORM instrumentation (`_sa_instance_state`, attribute events),
+so they are several times smaller and faster to build. Each record class
+has the name of its model, which is what the repositories key objects by.
+"""
+
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from functools import cache
+import uuid
+
+# Columns of every record, in the order the models' to_dict puts them
+_FIRST = ("id",)
+_LAST = ("created_at", "updated_at")
+
+
+def _new_id() -> str:
+    """Returns a random id, the same kind the models use"""
+    return str(uuid.uuid4())
+
+
+@dataclass(slots=True, eq=False)
+class Record:
+    """Columns shared by every record, `id` must be passed by keyword"""
+
+    id: str = field(default_factory=_new_id, kw_only=True)
+    created_at: datetime | None = field(
+        default_factory=datetime.utcnow, kw_only=True
+    )
+    updated_at: datetime | None = field(default=None, kw_only=True)
+
+    def to_dict(self) -> dict:
+        """Returns the columns of the record, id first"""
+        return {name: getattr(self, name) for name in self.columns()}
+
+    @classmethod
+    def columns(cls) -> tuple[str, ...]:
+        """Returns the column names of the record, id first"""
+        return _columns(cls)
+
+
+@cache
+def _columns(cls: type) -> tuple[str, ...]:
+    """Computes the column names of a record class once"""
+    names = tuple(
+        f.name for f in fields(cls) if f.name not in _FIRST + _LAST
+    )
+
+    return _FIRST + names + _LAST
+
+
+@dataclass(slots=True, eq=False)
+class Amenity(Record):
+    """Amenity record"""
+
+    name: str | None = None
+
+
+@dataclass(slots=True, eq=False)
+class City(Record):
+    """City record"""
+
+    name: str | None = None
+    country_id: str | None = None
+
+
+@dataclass(slots=True, eq=False)
+class Country(Record):
+    """Country record, `code` is kept for the seed data that sets it"""
+
+    name: str | None = None
+    code: str | None = None
+
+
+@dataclass(slots=True, eq=False)
+class Place(Record):
+    """Place record"""
+
+    name: str | None = None
+    city_id: str | None = None
+    description: str | None = None
+
+
+@dataclass(slots=True, eq=False)
+class PlaceAmenity(Record):
+    """Association between a place and one of its amenities"""
+
+    place_id: str | None = None
+    amenity_id: str | None = None
+
+
+@dataclass(slots=True, eq=False)
+class Review(Record):
+    """Review record"""
+
+    place_id: str | None = None
+    user_id: str | None = None
+    text: str | None = None
+
+
+@dataclass(slots=True, eq=False)
+class User(Record):
+    """User record"""
+
+    email: str | None = None
+    password_hash: str | None = None
+    is_admin: bool = False
+
+
+# Model name -> record class
+RECORDS: dict[str, type[Record]] = {
+    cls.__name__.lower(): cls
+    for cls in (Amenity, City, Country, Place, PlaceAmenity, Review, User)
+}
+
+
+def to_record(obj):
+    """
+    Returns the record holding the columns of a model instance, records and
+    objects of unknown models are returned unchanged
+    """
+    if isinstance(obj, Record):
+        return obj
+
+    cls = RECORDS.get(obj.__class__.__name__.lower())
+
+    if cls is None:
+        return obj
+
+    # The caller keeps using its object, so it gets the generated values
+    prepare(obj)
+
+    return cls(**{name: getattr(obj, name, None) for name in cls.columns()})
+
+
+def prepare(obj) -> None:
+    """Gives a new object the id and creation time it is missing"""
+    if getattr(obj, "id", None) is None:
+        obj.id = _new_id()
+    if getattr(obj, "created_at", None) is None:
+        obj.created_at = datetime.utcnow()
+
+
+def from_record(record: Record, model_class: type | None = None):
+    """
+    Returns a model instance (by default the ORM one of the same name)
+    holding the columns of a record
+    """
+    if model_class is None:
+        from src.persistence.serialization import get_models
+
+        model_class = get_models()[record.__class__.__name__.lower()]
+
+    table = getattr(model_class, "__table__", None)
+    names = [
+        name
+        for name in record.columns()
+        if table is None or name in table.columns
+    ]
+    values = {name: getattr(record, name) for name in names}
+
+    # Some models take every column but the id in their constructor
+    obj_id = values.pop("id")
+    instance = model_class(**values)
+    instance.id = obj_id
+
+    return instance
@@ -1,11 +1,21 @@
 """ Repository pattern for data access layer """
 
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def model_key(model) -> str:
+    """Returns the name of a model given as a name or as a class"""
+    return model if isinstance(model, str) else model.__name__.lower()
 
 
 class Repository(ABC):
     """Abstract class for repository pattern"""
 
+    # Whether init_app may run each request in one `transaction()`
+    unit_of_work = True
+
     @abstractmethod
     def reload(self) -> None:
         """Reload data to the repository"""
@@ -18,14 +28,119 @@ class Repository(ABC):
     def get(self, model_name: str, id: str) -> None:
         """Get an object by id"""
 
+    @abstractmethod
+    def get_many(self, model_name: str, ids: list) -> list:
+        """Get the objects of a model with the given ids, skipping missing"""
+
+    @abstractmethod
+    def find_by(self, model_name: str, field: str, value) -> list:
+        """Get all objects of a model whose field equals value"""
+
+    @abstractmethod
+    def query(
+        self,
+        model_name: str,
+        filters: dict | None = None,
+        order_by: str | tuple | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ) -> list:
+        """
+        Get the objects of a model whose fields equal `filters`, sorted by
+        the `order_by` fields, that come after the `after` values of those
+        fields, at most `limit` of them
+        """
+
     @abstractmethod
     def save(self, obj) -> None:
         """Save an object"""
 
+    @abstractmethod
+    def save_many(self, objs: list) -> None:
+        """Save several objects at once"""
+
+    def upsert_many(self, objs: list) -> None:
+        """
+        Save several objects, updating instead the ones whose id is already
+        stored, so saving the same objects again is harmless
+        """
+        ids: dict[str, list] = {}
+
+        for obj in objs:
+            ids.setdefault(model_key(obj.__class__), []).append(obj.id)
+
+        stored = {
+            obj.id
+            for model, model_ids in ids.items()
+            for obj in self.get_many(model, model_ids)
+        }
+
+        self.save_many([obj for obj in objs if obj.id not in stored])
+        self.update_many([obj for obj in objs if obj.id in stored])
+
     @abstractmethod
     def update(self, obj) -> None:
         """Update an object"""
 
+    @abstractmethod
+    def update_many(self, objs: list) -> None:
+        """Update several objects at once"""
+
     @abstractmethod
     def delete(self, obj) -> bool:
         """Delete an object"""
+
+    @abstractmethod
+    def delete_many(self, objs: list) -> int:
+        """Delete several objects at once, returns how many were deleted"""
+
+    def flush(self) -> None:
+        """Write changes buffered by the repository to its storage"""
+
+    def close(self) -> None:
+        """Write what is still buffered and stop any background work"""
+        self.flush()
+
+    def detach(self, obj):
+        """
+        Returns what a cache keeps of an object this repository returned,
+        it must stay valid once the read that returned it is over
+        """
+        return obj
+
+    def attach(self, obj):
+        """Returns the object to hand out for a value `detach` returned"""
+        return obj
+
+    def iter_batches(
+        self, model_name: str, size: int, after: str | None = None
+    ) -> Iterator[list]:
+        """
+        Yields the objects of a model sorted by id, at most `size` at a
+        time, starting after the id `after`. Each batch is one keyset query.
+        """
+        while True:
+            batch = self.query(
+                model_name,
+                order_by=("id",),
+                limit=size,
+                after=None if after is None else (after,),
+            )
+
+            if batch:
+                yield batch
+
+            if len(batch) < size:
+                return
+
+            after = batch[-1].id
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Groups the writes of a with block into one unit of work: they are
+        written once when it ends, or undone if it raises, where the
+        repository supports it. Blocks can be nested, only the outermost
+        one commits.
+        """
+        yield
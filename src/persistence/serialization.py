@@ -0,0 +1,167 @@
+"""
+This module exports the helpers used by the repositories that store
+objects as JSON to turn them into plain dicts and back
+"""
+
+from datetime import datetime
+import json
+from typing import Iterator, TextIO
+
+# Characters the snapshot reader skips between JSON values
+_WHITESPACE = " \t\n\r"
+
+
+def get_models() -> dict:
+    """Maps the name of every ORM model to its class"""
+    from src.models.amenity import Amenity
+    from src.models.city import City
+    from src.models.country import Country
+    from src.models.place import Place
+    from src.models.review import Review
+    from src.models.user import User
+
+    return {
+        "amenity": Amenity,
+        "city": City,
+        "country": Country,
+        "place": Place,
+        "review": Review,
+        "user": User,
+    }
+
+
+def json_default(value):
+    """Encodes the values `json` does not know about"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json(obj) -> dict:
+    """Returns the dict that represents an object on disk"""
+    return obj.to_dict()
+
+
+def from_json(model_class: type, item: dict):
+    """Builds an instance of a model from its on disk dict"""
+    instance = model_class(**item)
+
+    if item.get("created_at"):
+        instance.created_at = datetime.fromisoformat(item["created_at"])
+    if item.get("updated_at"):
+        instance.updated_at = datetime.fromisoformat(item["updated_at"])
+
+    return instance
+
+
+def iter_snapshot(
+    file: TextIO, chunk_size: int = 1 << 16
+) -> Iterator[tuple[str, dict]]:
+    """
+    Yields (model name, item) pairs from a snapshot shaped like
+    `{"model": [item, ...], ...}` one item at a time, reading the file in
+    chunks instead of parsing it as a whole
+    """
+    reader = _StreamReader(file, chunk_size)
+
+    if reader.peek() == "":
+        return
+
+    reader.expect("{")
+
+    if reader.peek() == "}":
+        return
+
+    while True:
+        model = reader.value()
+        reader.expect(":")
+        reader.expect("[")
+
+        if reader.peek() == "]":
+            reader.expect("]")
+        else:
+            while True:
+                yield model, reader.value()
+
+                if reader.expect(",]") == "]":
+                    break
+
+        if reader.expect(",}") == "}":
+            return
+
+
+class _StreamReader:
+    """Reads JSON values one at a time from a text file"""
+
+    def __init__(self, file: TextIO, chunk_size: int) -> None:
+        """Creates a reader with an empty buffer"""
+        self.__file = file
+        self.__chunk_size = chunk_size
+        self.__decoder = json.JSONDecoder()
+        self.__buffer = ""
+        self.__pos = 0
+
+    def __fill(self) -> bool:
+        """Reads the next chunk, returns False at the end of the file"""
+        pending = len(self.__buffer) - self.__pos
+        # Values larger than a chunk double the read so parsing them
+        # again after each read stays linear overall
+        chunk = self.__file.read(max(self.__chunk_size, pending))
+
+        if not chunk:
+            return False
+
+        self.__buffer = self.__buffer[self.__pos:] + chunk
+        self.__pos = 0
+
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non whitespace character without consuming it"""
+        while True:
+            while (
+                self.__pos < len(self.__buffer)
+                and self.__buffer[self.__pos] in _WHITESPACE
+            ):
+                self.__pos += 1
+
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+
+            if not self.__fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consumes the next character, which must be one of chars"""
+        char = self.peek()
+
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r}, found {char!r}")
+
+        self.__pos += 1
+
+        return char
+
+    def value(self):
+        """Consumes and returns the next JSON value"""
+        self.peek()
+
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(
+                    self.__buffer, self.__pos
+                )
+            except json.JSONDecodeError:
+                if not self.__fill():
+                    raise
+                continue
+
+            # A number right at the end of the buffer may continue in
+            # the next chunk
+            if end == len(self.__buffer) and self.__fill():
+                continue
+
+            self.__pos = end
+
+            return value
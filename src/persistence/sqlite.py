@@ -0,0 +1,434 @@
+"""
+This module exports a Repository that stores data in an SQLite database
+through the `sqlite3` module, without the ORM
+"""
+
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import sqlite3
+import threading
+from typing import Iterator
+
+from src.persistence.indexes import INDEXED_FIELDS, ORDERED_FIELDS
+from src.persistence.pragmas import apply_sqlite_pragmas
+from src.persistence.query import order_fields
+from src.persistence.records import RECORDS, prepare
+from src.persistence.repository import Repository, model_key
+from utils.constants import SQLITE_STORAGE_FILENAME
+from utils.populate import populate_db
+
+# Model name -> (table, columns other than id and timestamps), the tables
+# match the ones of the ORM models, plus the code records give countries
+TABLES: dict[str, tuple[str, tuple[tuple[str, str], ...]]] = {
+    "amenity": ("amenities", (("name", "VARCHAR(128)"),)),
+    "city": (
+        "cities",
+        (("name", "VARCHAR(128)"), ("country_id", "VARCHAR(36)")),
+    ),
+    "country": (
+        "countries",
+        (("name", "VARCHAR(128)"), ("code", "VARCHAR(2)")),
+    ),
+    "place": (
+        "places",
+        (
+            ("name", "VARCHAR(128)"),
+            ("city_id", "VARCHAR(36)"),
+            ("description", "VARCHAR(512)"),
+        ),
+    ),
+    "placeamenity": (
+        "place_amenity",
+        (("place_id", "VARCHAR(36)"), ("amenity_id", "VARCHAR(36)")),
+    ),
+    "review": (
+        "reviews",
+        (
+            ("place_id", "VARCHAR(36)"),
+            ("user_id", "VARCHAR(36)"),
+            ("text", "VARCHAR(1024)"),
+        ),
+    ),
+    "user": (
+        "users",
+        (
+            ("email", "VARCHAR(120)"),
+            ("password_hash", "VARCHAR(128)"),
+            ("is_admin", "BOOLEAN"),
+        ),
+    ),
+}
+
+# Turn the values SQLite returns back into Python values, by column type
+_CONVERTERS = {"BOOLEAN": bool, "TIMESTAMP": datetime.fromisoformat}
+
+
+class _Table:
+    """The statements and row factories of one model, built once"""
+
+    def __init__(self, model: str) -> None:
+        """Builds the statements of a model from its TABLES entry"""
+        name, columns = TABLES[model]
+        columns = (
+            (("id", "VARCHAR(36) PRIMARY KEY"),)
+            + columns
+            + (("created_at", "TIMESTAMP"), ("updated_at", "TIMESTAMP"))
+        )
+
+        self.name = name
+        self.columns = columns
+        self.fields = tuple(column for column, _ in columns)
+        self.record = RECORDS[model]
+        self.converters = [
+            (position, _CONVERTERS[kind])
+            for position, (_, kind) in enumerate(columns)
+            if kind in _CONVERTERS
+        ]
+
+        names = ", ".join(self.fields)
+        marks = ", ".join("?" for _ in self.fields)
+        updates = ", ".join(f"{field} = ?" for field in self.fields[1:])
+
+        self.create = [
+            f"CREATE TABLE IF NOT EXISTS {name} ("
+            + ", ".join(f"{column} {kind}" for column, kind in columns)
+            + ")",
+            f"CREATE INDEX IF NOT EXISTS ix_{name}_order "
+            f"ON {name} ({', '.join(ORDERED_FIELDS)})",
+        ] + [
+            f"CREATE INDEX IF NOT EXISTS ix_{name}_{field} ON {name} ({field})"
+            for field in INDEXED_FIELDS.get(model, ())
+        ]
+        self.select = f"SELECT {names} FROM {name}"
+        self.insert = (
+            f"INSERT OR REPLACE INTO {name} ({names}) VALUES ({marks})"
+        )
+        self.update = f"UPDATE {name} SET {updates} WHERE id = ?"
+        self.delete = f"DELETE FROM {name} WHERE id = ?"
+
+    def column(self, field: str) -> str:
+        """Returns a field name safe to put in SQL, if it is a column"""
+        if field not in self.fields:
+            raise ValueError(f"Unknown field: {field}")
+
+        return field
+
+    def values(self, obj) -> list:
+        """Returns the values to store for an object, in column order"""
+        return [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in (getattr(obj, field, None) for field in self.fields)
+        ]
+
+
+class SQLiteRepository(Repository):
+    """
+    SQLite Repository
+
+    Talks to SQLite through `sqlite3` directly. Statements are built once
+    per model and reused, so `sqlite3` serves them from its per-connection
+    statement cache, and rows become records (see records.py), or dicts
+    with `rows="dicts"`, instead of ORM instances with change tracking.
+
+    Every thread gets its own connection, with the SQLITE_PRAGMAS profile
+    of the configuration applied. Each write is committed on its own,
+    unless it runs inside `transaction()` which commits once at the end.
+
+    Objects of any class with the model's name can be saved, for example
+    the ORM models or the records returned by this repository.
+    """
+
+    def __init__(
+        self,
+        filename: str = SQLITE_STORAGE_FILENAME,
+        rows: str = "objects",
+        pragmas: dict | None = None,
+    ) -> None:
+        """Creates the tables if needed"""
+        if rows not in ("objects", "dicts"):
+            raise ValueError("rows must be 'objects' or 'dicts'")
+
+        if pragmas is None:
+            from src.config import Config
+
+            pragmas = Config.SQLITE_PRAGMAS
+
+        self.__filename = filename
+        self.__dicts = rows == "dicts"
+        self.__pragmas = pragmas
+        self.__local = threading.local()
+        self.__connections: list[sqlite3.Connection] = []
+        self.__lock = threading.Lock()
+        self.__tables = {model: _Table(model) for model in TABLES}
+        self.reload()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Helper method to get the connection of the current thread"""
+        connection = getattr(self.__local, "connection", None)
+
+        if connection is None:
+            # Only this thread uses it, the flag lets `close` close it
+            connection = sqlite3.connect(
+                self.__filename, check_same_thread=False
+            )
+            apply_sqlite_pragmas(connection, self.__pragmas)
+            self.__local.connection = connection
+
+            with self.__lock:
+                self.__connections.append(connection)
+
+        return connection
+
+    def _scope(self, connection: sqlite3.Connection):
+        """
+        Helper method to commit the statements of a write, unless a
+        transaction is open and commits them when it ends
+        """
+        if getattr(self.__local, "transaction_depth", 0):
+            return nullcontext()
+
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Commits the writes of a with block at once, or rolls them back"""
+        connection = self._connection()
+        depth = getattr(self.__local, "transaction_depth", 0)
+        self.__local.transaction_depth = depth + 1
+
+        try:
+            yield
+        except BaseException:
+            if not depth:
+                connection.rollback()
+            raise
+        else:
+            if not depth:
+                connection.commit()
+        finally:
+            self.__local.transaction_depth = depth
+
+    def _table(self, model) -> _Table:
+        """Helper method to get the table of a model name or class"""
+        return self.__tables[model_key(model)]
+
+    def _rows(self, table: _Table, sql: str, params=()) -> list:
+        """Helper method to run a SELECT and build its rows"""
+        cursor = self._connection().execute(sql, params)
+        fields = table.fields
+        converters = table.converters
+        rows = []
+
+        for row in cursor:
+            if converters:
+                row = list(row)
+                for position, convert in converters:
+                    if row[position] is not None:
+                        row[position] = convert(row[position])
+
+            if self.__dicts:
+                rows.append(dict(zip(fields, row)))
+            else:
+                rows.append(table.record(**dict(zip(fields, row))))
+
+        return rows
+
+    def close(self) -> None:
+        """Closes the connections of every thread"""
+        with self.__lock:
+            for connection in self.__connections:
+                connection.close()
+
+            self.__connections.clear()
+
+        self.__local = threading.local()
+
+    def reload(self) -> None:
+        """
+        Creates the tables, columns and indexes that do not exist yet, and
+        seeds a new database
+        """
+        connection = self._connection()
+        existing = {
+            name
+            for (name,) in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+
+        with connection:
+            for table in self.__tables.values():
+                if table.name in existing:
+                    self._add_columns(connection, table)
+
+                for statement in table.create:
+                    connection.execute(statement)
+
+        if not existing:
+            populate_db(self)
+
+    def _add_columns(self, connection: sqlite3.Connection, table: _Table):
+        """Helper method to add the columns a table made earlier lacks"""
+        stored = {
+            row[1]
+            for row in connection.execute(f"PRAGMA table_info({table.name})")
+        }
+
+        for column, kind in table.columns:
+            if column not in stored:
+                connection.execute(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column} {kind}"
+                )
+
+    def get_all(self, model_name) -> list:
+        """Get all objects of a given model"""
+        table = self._table(model_name)
+
+        return self._rows(table, table.select)
+
+    def get(self, model_name, obj_id: str):
+        """Get an object by its ID"""
+        table = self._table(model_name)
+        rows = self._rows(table, f"{table.select} WHERE id = ?", (obj_id,))
+
+        return rows[0] if rows else None
+
+    def get_many(self, model_name, ids: list) -> list:
+        """Get the objects of a given model with the given IDs"""
+        if not ids:
+            return []
+
+        table = self._table(model_name)
+        marks = ", ".join("?" for _ in ids)
+        found = {
+            row["id"] if self.__dicts else row.id: row
+            for row in self._rows(
+                table, f"{table.select} WHERE id IN ({marks})", list(ids)
+            )
+        }
+
+        return [found[obj_id] for obj_id in ids if obj_id in found]
+
+    def find_by(self, model_name, field: str, value) -> list:
+        """Get all objects of a given model whose field equals value"""
+        return self.query(model_name, filters={field: value})
+
+    def query(
+        self,
+        model_name,
+        filters: dict | None = None,
+        order_by: str | tuple | None = None,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ) -> list:
+        """Get the objects of a given model matching a query in one SELECT"""
+        table = self._table(model_name)
+        fields = [table.column(field) for field in order_fields(order_by)]
+        conditions = []
+        params = []
+
+        for field, value in (filters or {}).items():
+            if value is None:
+                conditions.append(f"{table.column(field)} IS NULL")
+            else:
+                conditions.append(f"{table.column(field)} = ?")
+                params.append(_to_sql(value))
+
+        if after is not None:
+            if not fields:
+                raise ValueError("after requires order_by")
+
+            marks = ", ".join("?" for _ in fields)
+            conditions.append(f"({', '.join(fields)}) > ({marks})")
+            params.extend(_to_sql(value) for value in after)
+
+        sql = table.select
+
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if fields:
+            sql += " ORDER BY " + ", ".join(fields)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return self._rows(table, sql, params)
+
+    def save(self, obj):
+        """Save an object"""
+        self.save_many([obj])
+
+        return obj
+
+    def save_many(self, objs: list):
+        """Save several objects in a single transaction"""
+        self._write("insert", objs, prepare)
+
+    def upsert_many(self, objs: list):
+        """Save several objects, the inserts replace rows with the same id"""
+        self._write("insert", objs, prepare)
+
+    def update(self, obj):
+        """Update an object"""
+        self.update_many([obj])
+
+        return obj
+
+    def update_many(self, objs: list):
+        """Update several objects in a single transaction"""
+
+        def prepare(obj):
+            """Stamps the update time"""
+            obj.updated_at = datetime.utcnow()
+
+        self._write("update", objs, prepare, id_last=True)
+
+    def delete(self, obj) -> bool:
+        """Delete an object"""
+        return self.delete_many([obj]) > 0
+
+    def delete_many(self, objs: list) -> int:
+        """Delete several objects in a single transaction"""
+        deleted = 0
+        connection = self._connection()
+
+        with self._scope(connection):
+            for model, group in _by_model(objs).items():
+                table = self.__tables[model]
+                cursor = connection.executemany(
+                    table.delete, [(obj.id,) for obj in group]
+                )
+                deleted += cursor.rowcount
+
+        return deleted
+
+    def _write(self, statement: str, objs: list, prepare, id_last=False):
+        """Helper method to run one statement per object with executemany"""
+        connection = self._connection()
+
+        with self._scope(connection):
+            for model, group in _by_model(objs).items():
+                table = self.__tables[model]
+                rows = []
+
+                for obj in group:
+                    prepare(obj)
+                    values = table.values(obj)
+                    rows.append(values[1:] + values[:1] if id_last else values)
+
+                connection.executemany(getattr(table, statement), rows)
+
+
+def _by_model(objs: list) -> dict[str, list]:
+    """Groups objects by model name, keeping their order"""
+    groups: dict[str, list] = {}
+
+    for obj in objs:
+        groups.setdefault(obj.__class__.__name__.lower(), []).append(obj)
+
+    return groups
+
+
+def _to_sql(value):
+    """Turns a value into the form it is stored in"""
+    return value.isoformat() if isinstance(value, datetime) else value
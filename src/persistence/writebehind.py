@@ -0,0 +1,112 @@
+"""
+This module exports the background writer used by the repositories that
+persist data in files when running in write-behind mode
+"""
+
+import atexit
+import os
+import threading
+import traceback
+from typing import Callable
+
+from utils.constants import (
+    STORAGE_FLUSH_INTERVAL,
+    STORAGE_FLUSH_INTERVAL_ENV_VAR,
+    STORAGE_FLUSH_THRESHOLD,
+    STORAGE_FLUSH_THRESHOLD_ENV_VAR,
+    STORAGE_WRITE_BEHIND_ENV_VAR,
+)
+
+
+class WriteBehind:
+    """
+    Calls `flush` from a background thread once changes have been pending
+    for `interval` seconds, or as soon as `threshold` changes are pending,
+    so a burst of writes ends up in a single flush
+
+    Pending changes are flushed one last time when the process exits.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[], None],
+        interval: float = STORAGE_FLUSH_INTERVAL,
+        threshold: int = STORAGE_FLUSH_THRESHOLD,
+    ) -> None:
+        """Starts the background thread"""
+        self.__flush = flush
+        self.__interval = interval
+        self.__threshold = threshold
+        self.__pending = 0
+        self.__closed = False
+        self.__condition = threading.Condition()
+        self.__thread = threading.Thread(
+            target=self.__run, name="write-behind", daemon=True
+        )
+        self.__thread.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def from_env(flush: Callable[[], None]) -> "WriteBehind | None":
+        """Returns a writer if write-behind mode is enabled, None otherwise"""
+        if os.getenv(STORAGE_WRITE_BEHIND_ENV_VAR) != "1":
+            return None
+
+        return WriteBehind(
+            flush,
+            interval=float(
+                os.getenv(
+                    STORAGE_FLUSH_INTERVAL_ENV_VAR, STORAGE_FLUSH_INTERVAL
+                )
+            ),
+            threshold=int(
+                os.getenv(
+                    STORAGE_FLUSH_THRESHOLD_ENV_VAR, STORAGE_FLUSH_THRESHOLD
+                )
+            ),
+        )
+
+    def notify(self) -> None:
+        """Records one pending change"""
+        with self.__condition:
+            self.__pending += 1
+
+            if self.__pending >= self.__threshold:
+                self.__condition.notify()
+
+    def close(self) -> None:
+        """Stops the background thread and flushes what is still pending"""
+        with self.__condition:
+            if self.__closed:
+                return
+
+            self.__closed = True
+            self.__condition.notify()
+
+        self.__thread.join()
+        self.__flush()
+
+    def __run(self) -> None:
+        """Waits for pending changes and flushes them"""
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(
+                    lambda: self.__closed
+                    or self.__pending >= self.__threshold,
+                    timeout=self.__interval,
+                )
+
+                if self.__closed:
+                    return
+
+                if not self.__pending:
+                    continue
+
+                self.__pending = 0
+
+            try:
+                self.__flush()
+            except Exception:
+                # The changes stay pending in the repository and are
+                # written by the next flush
+                traceback.print_exc()
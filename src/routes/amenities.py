@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request
 from models.amenity import Amenity
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 from src.persistence.db import DBRepository
+from src.routes.pagination import get_page
 
 # Create Blueprint for amenity-related endpoints
 amenities = Blueprint("amenities", __name__)
@@ -35,8 +36,7 @@ def manage_amenities():
             return jsonify({"Error": "Missing required field."}), 400
 
         # Check if amenity already exists
-        existing_amenity = repository.get_all(Amenity)
-        if any(amenity.name == name for amenity in existing_amenity):
+        if repository.query(Amenity, filters={"name": name}, limit=1):
             return jsonify({"Error": "Amenity already exists"}), 409
 
         new_amenity = Amenity(name=name)
@@ -47,14 +47,16 @@ def manage_amenities():
             return jsonify({"error": str(e)}), 500
 
     elif request.method == "GET":
-        # Retrieve all amenities
+        # Retrieve one page of amenities
         try:
-            amenities = repository.get_all(Amenity)
+            amenities, headers = get_page(repository, Amenity)
             amenity_list = [{
                 "id": amenity.id,
                 "name": amenity.name
             } for amenity in amenities]
-            return jsonify(amenity_list), 200
+            return jsonify(amenity_list), 200, headers
+        except ValueError as e:
+            return jsonify({"Error": str(e)}), 400
         except Exception as e:
             return jsonify({"Error": str(e)}), 500
 
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request
 from models.city import City
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 from src.persistence.db import DBRepository
+from src.routes.pagination import get_page
 
 # Create Blueprint for city-related endpoints
 cities = Blueprint("cities", __name__)
@@ -36,8 +37,7 @@ def manage_cities():
             return jsonify({"Error": "Missing required field."}), 400
 
         # Check if city already exists
-        existing_city = repository.get_all(City)
-        if any(city.name == name for city in existing_city):
+        if repository.query(City, filters={"name": name}, limit=1):
             return jsonify({"Error": "City already exists"}), 409
 
         new_city = City(name=name, country_id=country_id)
@@ -48,15 +48,17 @@ def manage_cities():
             return jsonify({"error": str(e)}), 500
 
     elif request.method == "GET":
-        # Retrieve all cities
+        # Retrieve one page of cities
         try:
-            cities = repository.get_all(City)
+            cities, headers = get_page(repository, City)
             city_list = [{
                 "id": city.id,
                 "name": city.name,
                 "country_id": city.country_id
             } for city in cities]
-            return jsonify(city_list), 200
+            return jsonify(city_list), 200, headers
+        except ValueError as e:
+            return jsonify({"Error": str(e)}), 400
         except Exception as e:
             return jsonify({"Error": str(e)}), 500
 
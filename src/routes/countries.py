@@ -4,6 +4,7 @@ from models.city import City
 import pycountry
 from flask_jwt_extended import jwt_required
 from src.persistence.db import DBRepository
+from src.routes.pagination import get_page
 
 # Create Blueprint for country-related endpoints
 country = Blueprint("country", __name__)
@@ -16,9 +17,10 @@ def add_country():
     Add countries to the database using ISO country codes.
     """
     try:
-        for country in pycountry.countries:
-            new_country = Country(name=country.name, code=country.alpha_2)
-            repository.save(new_country)
+        repository.save_many([
+            Country(name=country.name, code=country.alpha_2)
+            for country in pycountry.countries
+        ])
         return jsonify({"message": "Countries added successfully"}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -26,12 +28,14 @@ def add_country():
 @country.route("/countries", methods=["GET"])
 def get_countries():
     """
-    Retrieve all countries from the database.
+    Retrieve one page of countries from the database.
     """
     try:
-        countries = repository.get_all(Country)
+        countries, headers = get_page(repository, Country)
         country_list = [country.to_dict() for country in countries]
-        return jsonify(country_list), 200
+        return jsonify(country_list), 200, headers
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -77,8 +81,8 @@ def get_country_cities(country_code):
     try:
         country = repository.get(Country, country_code.upper())
         if country:
-            cities = repository.get_all(City)
-            city_list = [city.to_dict() for city in cities if city.country_id == country.id]
+            cities = repository.find_by(City, "country_id", country.id)
+            city_list = [city.to_dict() for city in cities]
             if city_list:
                 return jsonify(city_list), 200
             else:
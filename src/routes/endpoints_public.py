@@ -4,25 +4,32 @@ Module defines public endpoints.
 
 from flask import Blueprint, jsonify
 from ..models.place import Place
+from ..persistence.db import DBRepository
+from .pagination import get_page
 
 # Create a Blueprint for the public endpoints
 public_endpoints_bp = Blueprint('public_endpoints_bp', __name__)
+repository = DBRepository()
 
 @public_endpoints_bp.route('/places', methods=['GET'])
 def view_places():
     """
-    View all places.
+    View one page of places.
 
-    This endpoint allows anyone to view a list of all places.
+    This endpoint allows anyone to view the places, `limit` at a time,
+    following the `cursor` of the `Link` header.
 
     Returns:
-        JSON: A list of all places.
+        JSON: A list of places.
     """
-    # Query all places from the database
-    places = Place.query.all()
-    
+    # Query one page of places from the database
+    try:
+        places, headers = get_page(repository, Place)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
     # Convert each place to a dictionary and return as JSON
-    return jsonify([place.to_dict() for place in places]), 200
+    return jsonify([place.to_dict() for place in places]), 200, headers
 
 public_endpoints_bp.route('/places/<int:place_id>', methods=['GET'])
 def view_place_details(place_id):
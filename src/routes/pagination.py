@@ -0,0 +1,77 @@
+"""
+Keyset (cursor) pagination shared by the collection endpoints.
+
+Collections are sorted by (created_at, id). A cursor holds those values
+for the last object of a page, and the next page is read with
+`Repository.query(..., after=cursor)`, so every page costs the same as
+the first one whatever its position.
+"""
+
+import base64
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import request
+
+from utils.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+PAGE_ORDER = ("created_at", "id")
+
+
+def encode_cursor(obj) -> str:
+    """Returns the opaque cursor pointing right after an object"""
+    created_at = obj.created_at.isoformat() if obj.created_at else None
+    payload = json.dumps([created_at, obj.id]).encode()
+
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Returns the (created_at, id) values stored in a cursor"""
+    try:
+        created_at, obj_id = json.loads(base64.urlsafe_b64decode(cursor))
+        if created_at is not None:
+            created_at = datetime.fromisoformat(created_at)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    return created_at, obj_id
+
+
+def get_page(repository, model, filters: dict | None = None):
+    """
+    Returns one page of a collection read from the `limit` and `cursor`
+    query parameters, and the headers linking to the next page
+
+    Raises ValueError if the parameters are invalid.
+    """
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        raise ValueError("limit must be an integer") from e
+
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    cursor = request.args.get("cursor")
+    after = decode_cursor(cursor) if cursor else None
+
+    # One extra object tells whether there is a next page
+    objects = repository.query(
+        model,
+        filters=filters,
+        order_by=PAGE_ORDER,
+        limit=limit + 1,
+        after=after,
+    )
+    headers = {}
+
+    if len(objects) > limit:
+        objects = objects[:limit]
+        next_cursor = encode_cursor(objects[-1])
+        args = request.args.to_dict() | {"cursor": next_cursor}
+        headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+        headers["X-Next-Cursor"] = next_cursor
+
+    return objects, headers
@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request
 from models.place import Place
 from flask_jwt_extended import get_jwt, verify_jwt_in_request
 from src.persistence.db import DBRepository
+from src.routes.pagination import get_page
 
 # Create Blueprint for place-related endpoints
 place = Blueprint("place", __name__)
@@ -52,9 +53,9 @@ def add_place():
             return jsonify({"error": str(e)}), 500
 
     else:
-        # Retrieve all places
+        # Retrieve one page of places
         try:
-            places = repository.get_all(Place)
+            places, headers = get_page(repository, Place)
             place_list = [{
                 "name": place.name,
                 "city_id": place.city_id,
@@ -62,7 +63,9 @@ def add_place():
                 "created_at": place.created_at,
                 "updated_at": place.updated_at
             } for place in places]
-            return jsonify(place_list), 200
+            return jsonify(place_list), 200, headers
+        except ValueError as e:
+            return jsonify({"Error": str(e)}), 400
         except Exception as e:
             return jsonify({"Error": "No place found"}), 404
 
@@ -4,6 +4,7 @@ from models.user import User
 from models.place import Place
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.persistence.db import DBRepository
+from src.routes.pagination import get_page
 
 # Create Blueprint for review-related endpoints
 review = Blueprint("review", __name__)
@@ -58,10 +59,15 @@ def handle_place_review(id):
                 return jsonify({"error": str(e)}), 500
 
     elif request.method == "GET":
-        reviews = Review.query.filter_by(place_id=id).all()
+        try:
+            reviews, headers = get_page(
+                repository, Review, filters={"place_id": id}
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         if reviews:
             reviews_list = [review.to_dict() for review in reviews]
-            return jsonify(reviews_list), 200
+            return jsonify(reviews_list), 200, headers
         else:
             return jsonify({"error": "No reviews found for this place"}), 404
 
@@ -76,9 +82,13 @@ def user_review(id):
         if not user:
             return jsonify({"error": "No user found"}), 404
 
-        reviews = Review.query.filter_by(user_id=id).all()
+        reviews, headers = get_page(
+            repository, Review, filters={"user_id": id}
+        )
         review_list = [review.to_dict() for review in reviews]
-        return jsonify(review_list), 200
+        return jsonify(review_list), 200, headers
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -7,9 +7,12 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash
 from ..models.user import User
 from ..models import db
+from ..persistence.db import DBRepository
+from .pagination import get_page
 
 # Create a Blueprint for the user-related endpoints
 users_bp = Blueprint('users_bp', __name__)
+repository = DBRepository()
 
 
 @users_bp.route('/users', methods=['POST'], strict_slashes=False)
@@ -115,15 +118,19 @@ def get_user(user_id):
 @jwt_required()
 def get_users():
     """
-    Fetch all users.
+    Fetch one page of users.
 
-    This endpoint allows a logged-in user to fetch details of all users.
+    This endpoint allows a logged-in user to fetch details of the users,
+    `limit` at a time, following the `cursor` of the `Link` header.
 
     Returns:
-        JSON: A list of all users.
+        JSON: A list of users.
     """
-    # Retrieve all users from the database
-    users = User.query.all()
+    # Retrieve one page of users from the database
+    try:
+        users, headers = get_page(repository, User)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
 
     # Convert each user to a dictionary and return as JSON
-    return jsonify([user.to_dict() for user in users]), 200
+    return jsonify([user.to_dict() for user in users]), 200, headers
@@ -0,0 +1,32 @@
+"""
+Fixtures shared by the tests
+"""
+
+import pytest
+from flask import Flask
+
+
+@pytest.fixture
+def database_app(request):
+    """
+    Gives the test case, as `self.app`, an app with the tables of a new
+    in-memory SQLite database, dropped once the test is over
+    """
+    # Imported here so the tests that load modules by path do not need
+    # the app and its database
+    from src import db
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+
+    request.instance.app = app
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
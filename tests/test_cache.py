@@ -0,0 +1,104 @@
+"""
+Tests for the cache wrapped around the repositories
+"""
+
+import unittest
+import uuid
+
+import pytest
+
+from src.models.amenity import Amenity
+from src.persistence.cache import CachingRepository
+from src.persistence.db import DBRepository
+from src.persistence.memory import MemoryRepository
+from src.persistence.records import Place
+
+
+@pytest.mark.usefixtures("database_app")
+class TestCachingDatabaseRepository(unittest.TestCase):
+    """Tests for CachingRepository over DBRepository across app contexts"""
+
+    def setUp(self):
+        """Creates an empty cache over the database of the app"""
+        self.repo = CachingRepository(DBRepository())
+        self.amenity_id = str(uuid.uuid4())
+
+        with self.app.app_context():
+            self.repo.save(Amenity(id=self.amenity_id, name="Wifi"))
+
+    def test_cached_objects_outlive_their_app_context(self):
+        """Objects cached by one request can be read by the next ones"""
+        with self.app.app_context():
+            self.repo.get("amenity", self.amenity_id)
+            self.repo.get_all("amenity")
+
+        with self.app.app_context():
+            amenity = self.repo.get("amenity", self.amenity_id)
+            amenities = self.repo.get_all("amenity")
+
+            self.assertEqual(amenity.name, "Wifi")
+            self.assertEqual([a.name for a in amenities], ["Wifi"])
+            self.assertGreaterEqual(self.repo.hits, 2)
+
+    def test_updates_of_cached_objects_are_written(self):
+        """An object read from the cache is updated in the database"""
+        with self.app.app_context():
+            self.repo.get("amenity", self.amenity_id)
+
+        with self.app.app_context():
+            amenity = self.repo.get("amenity", self.amenity_id)
+            amenity.name = "Fast wifi"
+            self.repo.update(amenity)
+
+        with self.app.app_context():
+            stored = DBRepository().get("amenity", self.amenity_id)
+            cached = self.repo.get("amenity", self.amenity_id)
+
+            self.assertEqual(stored.name, "Fast wifi")
+            self.assertEqual(cached.name, "Fast wifi")
+
+    def test_updates_of_objects_of_an_earlier_context_are_written(self):
+        """An object read by an ended app context is merged on update"""
+        with self.app.app_context():
+            amenity = DBRepository().get("amenity", self.amenity_id)
+
+        with self.app.app_context():
+            amenity.name = "Fast wifi"
+            self.repo.update(amenity)
+
+        with self.app.app_context():
+            stored = DBRepository().get("amenity", self.amenity_id)
+
+            self.assertEqual(stored.name, "Fast wifi")
+
+
+class TestCachingRepositoryRaces(unittest.TestCase):
+    """Tests for CachingRepository reads racing writes"""
+
+    def setUp(self):
+        """Creates a cache over a repository holding one place"""
+        self.backend = MemoryRepository()
+        self.repo = CachingRepository(self.backend)
+        self.place = Place(name="Old")
+        self.backend.save(self.place)
+
+    def test_a_read_racing_a_write_is_not_cached(self):
+        """The value read before a write is returned but never cached"""
+        read = self.backend.get
+
+        def read_then_write(model_name, id):
+            """Reads the place, then lets a write replace it"""
+            obj = read(model_name, id)
+            self.repo.update(Place(id=self.place.id, name="New"))
+            return obj
+
+        self.backend.get = read_then_write
+        raced = self.repo.get("place", self.place.id)
+        self.backend.get = read
+
+        self.assertEqual(raced.name, "Old")
+        self.assertEqual(self.repo.get("place", self.place.id).name, "New")
+
+
+if __name__ == "__main__":
+    unittest.main()
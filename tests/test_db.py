@@ -0,0 +1,55 @@
+"""
+Tests for the database repository
+"""
+
+import unittest
+import uuid
+
+import pytest
+
+from src.models.amenity import Amenity
+from src.persistence.db import DBRepository
+from src.persistence.records import Amenity as AmenityRecord
+
+
+@pytest.mark.usefixtures("database_app")
+class TestDatabaseRepositoryDeletes(unittest.TestCase):
+    """Tests for the deletes of DBRepository"""
+
+    def setUp(self):
+        """Stores two amenities"""
+        self.repo = DBRepository()
+        self.ids = [str(uuid.uuid4()) for _ in range(2)]
+
+        with self.app.app_context():
+            self.repo.save_many(
+                [Amenity(id=obj_id, name="Wifi") for obj_id in self.ids]
+            )
+
+    def test_delete_many_counts_the_rows_deleted(self):
+        """Objects that are not stored are not counted"""
+        missing = Amenity(id=str(uuid.uuid4()), name="Pool")
+
+        with self.app.app_context():
+            stored = self.repo.get_many("amenity", self.ids)
+            deleted = self.repo.delete_many(stored + [missing])
+
+            self.assertEqual(deleted, 2)
+            self.assertEqual(self.repo.get_all("amenity"), [])
+
+    def test_delete_detached_objects(self):
+        """Objects read by an ended app context and records are deleted"""
+        with self.app.app_context():
+            amenity = self.repo.get("amenity", self.ids[0])
+
+        with self.app.app_context():
+            self.assertTrue(self.repo.delete(amenity))
+            self.assertTrue(
+                self.repo.delete(AmenityRecord(id=self.ids[1], name="Wifi"))
+            )
+            self.assertFalse(self.repo.delete(amenity))
+            self.assertEqual(self.repo.get_all("amenity"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
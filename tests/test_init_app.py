@@ -0,0 +1,131 @@
+"""
+Tests for how init_app sets up the repository of an app
+"""
+
+import threading
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+import src.persistence as persistence
+from src.persistence.memory import MemoryRepository
+from src.persistence.records import Country
+
+
+class TestInitApp(unittest.TestCase):
+    """Tests for init_app"""
+
+    def setUp(self):
+        """Creates an app using the memory backend and a fresh `repo`"""
+        self.app = Flask(__name__)
+        self.app.config["REPOSITORY"] = "memory"
+        patcher = mock.patch.object(
+            persistence, "repo", persistence.LazyRepository()
+        )
+        self.repo = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lazy_by_default(self):
+        """The repository is only built on its first use"""
+        persistence.init_app(self.app)
+
+        self.assertFalse(self.repo.is_built)
+        self.repo.get_all("country")
+        self.assertIsInstance(self.repo.repository, MemoryRepository)
+
+    def test_eager(self):
+        """REPOSITORY_EAGER_INIT builds the repository at startup"""
+        self.app.config["REPOSITORY_EAGER_INIT"] = True
+
+        repository = persistence.init_app(self.app)
+
+        self.assertTrue(self.repo.is_built)
+        self.assertIsInstance(repository, MemoryRepository)
+        self.assertIs(self.app.extensions["repository"], repository)
+
+
+class TestShutdown(unittest.TestCase):
+    """Tests for the flush and close hooks init_app registers"""
+
+    def setUp(self):
+        """Creates an app whose repository is a mock"""
+        self.app = Flask(__name__)
+        self.repository = mock.Mock(is_built=True)
+        patcher = mock.patch.object(persistence, "repo", self.repository)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        persistence.init_app(self.app)
+
+    def test_flushes_when_a_context_without_request_ends(self):
+        """CLI commands and scripts write what is buffered when done"""
+        with self.app.app_context():
+            self.repository.flush.assert_not_called()
+
+        self.repository.flush.assert_called_once_with()
+
+    def test_requests_leave_the_flush_to_the_writer(self):
+        """Requests do not wait for the buffered writes"""
+        self.app.add_url_rule("/", "index", lambda: "ok")
+        self.app.test_client().get("/")
+
+        self.repository.flush.assert_not_called()
+
+    def test_closes_at_exit(self):
+        """The repository is closed when the process exits"""
+        persistence._close_repository()
+
+        self.repository.close.assert_called_once_with()
+
+
+class TestUnitOfWork(unittest.TestCase):
+    """Tests for the transaction init_app runs each request in"""
+
+    def setUp(self):
+        """Creates an app running a unit of work and a fresh `repo`"""
+        self.app = Flask(__name__)
+        self.app.config["REPOSITORY_UNIT_OF_WORK"] = True
+        patcher = mock.patch.object(
+            persistence, "repo", persistence.LazyRepository()
+        )
+        self.repo = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_requests_run_in_a_transaction(self):
+        """A successful request commits its transaction once"""
+        transaction = mock.MagicMock()
+        repository = mock.Mock(unit_of_work=True)
+        repository.transaction.return_value = transaction
+
+        with mock.patch.object(persistence, "repo", repository):
+            persistence.init_app(self.app)
+            self.app.add_url_rule("/", "index", lambda: "ok")
+            response = self.app.test_client().get("/")
+
+        self.assertEqual(response.status_code, 200)
+        transaction.__enter__.assert_called_once_with()
+        transaction.__exit__.assert_called_once_with(None, None, None)
+
+    def test_memory_requests_do_not_hold_the_write_lock(self):
+        """Other threads write to MemoryRepository while a request runs"""
+        self.app.config["REPOSITORY"] = "memory"
+        persistence.init_app(self.app)
+
+        def write_from_another_thread():
+            """Saves a country from a thread the request waits for"""
+            writer = threading.Thread(
+                target=self.repo.save, args=(Country(name="Chile"),)
+            )
+            writer.start()
+            writer.join(timeout=5)
+
+            return "blocked" if writer.is_alive() else "written"
+
+        self.app.add_url_rule("/", "index", write_from_another_thread)
+        response = self.app.test_client().get("/")
+
+        self.assertEqual(response.get_data(as_text=True), "written")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Tests for the bus the caches of several processes share invalidations on
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+# Loaded from its file so the test does not need the app and its database
+_SPEC = importlib.util.spec_from_file_location(
+    "invalidation",
+    os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "src",
+        "persistence",
+        "invalidation.py",
+    ),
+)
+invalidation = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(invalidation)
+
+WORKERS = 4
+PUBLISHES = 50
+TIMEOUT = 30
+
+
+def watch(path: str, ready, published, changes) -> None:
+    """Polls the bus in a worker until a change is published"""
+    bus = invalidation.InvalidationBus(path)
+    ready.wait(TIMEOUT)
+    published.wait(TIMEOUT)
+    changes.put(bus.poll())
+    bus.close()
+
+
+def publish(path: str, model: str, times: int) -> None:
+    """Publishes changes of a model from a worker"""
+    bus = invalidation.InvalidationBus(path)
+
+    for _ in range(times):
+        bus.publish(model)
+
+    bus.close()
+
+
+class TestInvalidationBus(unittest.TestCase):
+    """Tests for InvalidationBus across processes"""
+
+    def setUp(self):
+        """Creates the path of a new counters file"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "generations")
+
+    def test_workers_see_a_change_published_by_another(self):
+        """Every worker polling the bus reports the changed model"""
+        ready = multiprocessing.Barrier(WORKERS + 1)
+        published = multiprocessing.Event()
+        changes = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=watch, args=(self.path, ready, published, changes)
+            )
+            for _ in range(WORKERS)
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        # Workers opened the bus before the change, so they must see it
+        ready.wait(TIMEOUT)
+        bus = invalidation.InvalidationBus(self.path)
+        bus.publish("place")
+        published.set()
+
+        reported = [changes.get(timeout=TIMEOUT) for _ in workers]
+
+        for worker in workers:
+            worker.join(TIMEOUT)
+
+        self.assertEqual(reported, [["place"]] * WORKERS)
+        self.assertEqual(bus.poll(), [])
+        bus.close()
+
+    def test_concurrent_publishes_are_all_counted(self):
+        """Generations bumped by several workers at once add up"""
+        bus = invalidation.InvalidationBus(self.path)
+        workers = [
+            multiprocessing.Process(
+                target=publish, args=(self.path, "review", PUBLISHES)
+            )
+            for _ in range(WORKERS)
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join(TIMEOUT)
+
+        self.assertEqual(bus.generations()["review"], WORKERS * PUBLISHES)
+        self.assertEqual(bus.poll(), ["review"])
+        self.assertEqual(bus.poll(), [])
+        bus.close()
+
+    def test_own_changes_are_not_reported(self):
+        """A process is not told about the changes it published"""
+        bus = invalidation.InvalidationBus(self.path)
+        bus.publish("user")
+
+        self.assertEqual(bus.poll(), [])
+        bus.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
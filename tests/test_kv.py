@@ -0,0 +1,106 @@
+"""
+Tests for the repository stored in a dbm file
+"""
+
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from src.persistence.kv import KVRepository
+from src.persistence.records import Review
+
+
+def open_store(filename: str, errors) -> None:
+    """Opens a store from another process, reporting the error raised"""
+    try:
+        KVRepository(filename).close()
+    except RuntimeError as e:
+        errors.put(str(e))
+    else:
+        errors.put(None)
+
+
+class TestKVRepository(unittest.TestCase):
+    """Tests for KVRepository"""
+
+    def setUp(self):
+        """Opens a store in a temporary directory, with small buckets"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "data.kv")
+        self.repo = KVRepository(self.filename, bucket_size=4)
+        self.addCleanup(self.repo.close)
+
+    def test_seeds_the_dummy_country_once(self):
+        """A new store gets the dummy country, reopening it adds none"""
+        self.repo.reload()
+        self.repo.reload()
+
+        countries = self.repo.get_all("country")
+
+        self.assertEqual([country.code for country in countries], ["UY"])
+
+    def test_sets_grow_with_their_buckets(self):
+        """Ids spread over more buckets are all found again"""
+        reviews = [
+            Review(text=f"{i}", place_id=f"place {i % 3}") for i in range(200)
+        ]
+        self.repo.save_many(reviews[:100])
+
+        for review in reviews[100:]:
+            self.repo.save(review)
+
+        self.repo.delete_many(reviews[:50])
+        moved = reviews[50]
+        moved.place_id = "place 0"
+        self.repo.update(moved)
+
+        stored = reviews[50:]
+        self.assertCountEqual(
+            [review.id for review in self.repo.get_all("review")],
+            [review.id for review in stored],
+        )
+        found = self.repo.find_by("review", "place_id", "place 0")
+        self.assertCountEqual(
+            [review.id for review in found],
+            [review.id for review in stored if review.place_id == "place 0"],
+        )
+
+    def test_failed_transaction_is_undone(self):
+        """Writes of a block that raises leave the store as it was"""
+        kept = Review(text="kept", place_id="place 0")
+        self.repo.save(kept)
+
+        with self.assertRaises(ValueError):
+            with self.repo.transaction():
+                self.repo.save_many(
+                    [Review(text=f"{i}", place_id="place 0") for i in range(9)]
+                )
+                kept.text = "changed"
+                self.repo.update(kept)
+                raise ValueError
+
+        self.assertEqual(
+            [review.text for review in self.repo.get_all("review")], ["kept"]
+        )
+        self.assertEqual(
+            [r.id for r in self.repo.find_by("review", "place_id", "place 0")],
+            [kept.id],
+        )
+
+    def test_refuses_a_second_process(self):
+        """Another process cannot open a store that is open"""
+        errors = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=open_store, args=(self.filename, errors)
+        )
+        process.start()
+        error = errors.get(timeout=30)
+        process.join()
+
+        self.assertIn("another process", error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Tests for the reader/writer lock shared by the in-memory repositories
+"""
+
+import importlib.util
+import os
+import threading
+import time
+import unittest
+
+# Loaded from its file so the test does not need the app and its database
+_SPEC = importlib.util.spec_from_file_location(
+    "locks",
+    os.path.join(
+        os.path.dirname(__file__), "..", "src", "persistence", "locks.py"
+    ),
+)
+locks = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(locks)
+
+THREADS = 8
+WRITES = 500
+
+
+class TestRWLock(unittest.TestCase):
+    """Tests for RWLock under concurrent threads"""
+
+    def setUp(self):
+        """Creates an unlocked lock"""
+        self.lock = locks.RWLock()
+
+    def run_threads(self, *targets) -> None:
+        """Runs each target in its own thread and waits for all of them"""
+        threads = [threading.Thread(target=target) for target in targets]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join(timeout=60)
+            self.assertFalse(thread.is_alive())
+
+    def test_no_lost_updates(self):
+        """Writers incrementing a counter never overwrite each other"""
+        counter = [0]
+
+        def increment():
+            """Reads then writes the counter, yielding in between"""
+            for _ in range(WRITES):
+                with self.lock.write():
+                    value = counter[0]
+                    time.sleep(0)
+                    counter[0] = value + 1
+
+        self.run_threads(*[increment] * THREADS)
+
+        self.assertEqual(counter[0], THREADS * WRITES)
+
+    def test_no_torn_reads(self):
+        """Readers never see a pair of values half written"""
+        pair = [0, 0]
+        torn = []
+        done = threading.Event()
+
+        def write():
+            """Updates both values, yielding in between"""
+            for value in range(1, WRITES + 1):
+                with self.lock.write():
+                    pair[0] = value
+                    time.sleep(0)
+                    pair[1] = value
+
+            done.set()
+
+        def read():
+            """Checks both values agree until the writer is done"""
+            while not done.is_set():
+                with self.lock.read():
+                    first = pair[0]
+                    time.sleep(0)
+                    if pair[1] != first:
+                        torn.append((first, pair[1]))
+
+        self.run_threads(write, *[read] * THREADS)
+
+        self.assertEqual(torn, [])
+        self.assertEqual(pair, [WRITES, WRITES])
+
+    def test_reentrant(self):
+        """A writer may read and write again, a reader may read again"""
+        with self.lock.write():
+            with self.lock.read():
+                with self.lock.write():
+                    pass
+
+        with self.lock.read():
+            with self.lock.read():
+                with self.assertRaises(RuntimeError):
+                    self.lock.acquire_write()
+
+
+if __name__ == "__main__":
+    unittest.main()
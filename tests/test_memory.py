@@ -0,0 +1,108 @@
+"""
+Tests for MemoryRepository shared by several threads
+"""
+
+import threading
+import unittest
+
+from src.persistence.memory import MemoryRepository
+from src.persistence.records import Country, Place
+
+THREADS = 8
+WRITES = 200
+
+
+class TestMemoryRepositoryThreads(unittest.TestCase):
+    """Tests for concurrent saves, updates and reads of MemoryRepository"""
+
+    def setUp(self):
+        """Creates a repository holding only the dummy country"""
+        self.repo = MemoryRepository()
+
+    def run_threads(self, *targets) -> None:
+        """Runs each target in its own thread and waits for all of them"""
+        threads = [threading.Thread(target=target) for target in targets]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join(timeout=60)
+            self.assertFalse(thread.is_alive())
+
+    def test_no_lost_saves(self):
+        """Every object saved by concurrent threads is stored"""
+        before = len(self.repo.get_all("country"))
+
+        def save():
+            """Saves countries one at a time"""
+            for i in range(WRITES):
+                self.repo.save(Country(name=f"Country {i}"))
+
+        self.run_threads(*[save] * THREADS)
+
+        self.assertEqual(
+            len(self.repo.get_all("country")), before + THREADS * WRITES
+        )
+
+    def test_no_lost_updates(self):
+        """Increments made in transactions by several threads add up"""
+        place = Place(name="Counter", description="0")
+        self.repo.save(place)
+
+        def increment():
+            """Reads the place and updates it in one transaction"""
+            for _ in range(WRITES):
+                with self.repo.transaction():
+                    stored = self.repo.get("place", place.id)
+                    count = int(stored.description) + 1
+                    self.repo.update(
+                        Place(
+                            id=place.id,
+                            name=stored.name,
+                            description=str(count),
+                        )
+                    )
+
+        self.run_threads(*[increment] * THREADS)
+
+        stored = self.repo.get("place", place.id)
+        self.assertEqual(int(stored.description), THREADS * WRITES)
+
+    def test_no_torn_reads(self):
+        """get_all never returns the places of a transaction half done"""
+        places = [Place(name="0") for _ in range(10)]
+        self.repo.save_many(places)
+        torn = []
+        done = threading.Event()
+
+        def write():
+            """Replaces every place with its next version in a transaction"""
+            for version in range(1, WRITES + 1):
+                with self.repo.transaction():
+                    for place in places:
+                        self.repo.update(Place(id=place.id, name=f"{version}"))
+
+            done.set()
+
+        def read():
+            """Checks that all places are of the same version"""
+            while not done.is_set():
+                versions = {
+                    place.name for place in self.repo.get_all("place")
+                }
+
+                if len(versions) != 1:
+                    torn.append(versions)
+
+        self.run_threads(write, *[read] * THREADS)
+
+        self.assertEqual(torn, [])
+        self.assertEqual(
+            {place.name for place in self.repo.get_all("place")},
+            {f"{WRITES}"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Tests for resuming a migration into the database
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from src import db
+from src.persistence.db import DBRepository
+from src.persistence.memory import MemoryRepository
+from src.persistence.migrate import migrate
+from src.persistence.records import Amenity
+
+
+@pytest.mark.usefixtures("database_app")
+class TestMigrateToDatabase(unittest.TestCase):
+    """Tests for migrate with a DBRepository target"""
+
+    def setUp(self):
+        """Opens a context of the app and creates a source with data"""
+        self.context = self.app.app_context()
+        self.context.push()
+
+        self.source = MemoryRepository()
+        self.source.save_many([Amenity(name=f"Amenity {i}") for i in range(5)])
+        self.target = DBRepository()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.state_path = os.path.join(directory.name, "migrate.json")
+
+    def tearDown(self):
+        """Closes the context"""
+        db.session.remove()
+        self.context.pop()
+
+    def copy_amenities(self) -> dict:
+        """Runs the migration of the amenities, 2 at a time"""
+        return migrate(
+            self.source,
+            self.target,
+            batch_size=2,
+            models=("amenity",),
+            state_path=self.state_path,
+            report=lambda line: None,
+        )
+
+    def test_resume_after_a_batch_was_saved_but_not_recorded(self):
+        """A batch saved again on resume updates its copies"""
+        self.copy_amenities()
+
+        # As if the process died after saving the last batches, before
+        # recording them in the state
+        with open(self.state_path, "w", encoding="utf-8") as file:
+            json.dump({"last_ids": {}, "done": []}, file)
+
+        copied = self.copy_amenities()
+
+        self.assertEqual(copied, {"amenity": 5})
+        self.assertEqual(len(self.target.get_all("amenity")), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
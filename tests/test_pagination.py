@@ -0,0 +1,84 @@
+"""
+Tests for the keyset pagination of the collection endpoints on the database
+"""
+
+from datetime import datetime
+import unittest
+import uuid
+
+import pytest
+
+from src import db
+from src.models.amenity import Amenity
+from src.persistence.db import DBRepository
+from src.routes.pagination import get_page
+
+
+@pytest.mark.usefixtures("database_app")
+class TestDatabasePagination(unittest.TestCase):
+    """Tests for get_page over DBRepository"""
+
+    def setUp(self):
+        """Opens a context of the app and its database"""
+        self.context = self.app.app_context()
+        self.context.push()
+        self.repo = DBRepository()
+
+    def tearDown(self):
+        """Closes the context"""
+        db.session.remove()
+        self.context.pop()
+
+    def pages(self, limit: int) -> list[list[str]]:
+        """Returns the ids of every page of amenities, following cursors"""
+        pages, cursor = [], None
+
+        while True:
+            query = {"limit": limit} | ({"cursor": cursor} if cursor else {})
+
+            with self.app.test_request_context("/", query_string=query):
+                objects, headers = get_page(self.repo, Amenity)
+
+            pages.append([amenity.id for amenity in objects])
+            cursor = headers.get("X-Next-Cursor")
+
+            if cursor is None:
+                return pages
+
+    def test_rows_created_in_the_same_second(self):
+        """Rows saved together with default timestamps are all paged"""
+        amenities = [
+            Amenity(id=str(uuid.uuid4()), name=f"Amenity {i}")
+            for i in range(5)
+        ]
+        self.repo.save_many(amenities)
+
+        pages = self.pages(2)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertCountEqual(
+            sum(pages, []), [amenity.id for amenity in amenities]
+        )
+
+    def test_rows_sharing_a_timestamp(self):
+        """Rows with the same creation time are paged by id"""
+        created_at = datetime(2024, 1, 1, 12, 0, 0)
+        amenities = [
+            Amenity(id=str(uuid.uuid4()), name=f"Amenity {i}")
+            for i in range(5)
+        ]
+
+        for amenity in amenities:
+            amenity.created_at = created_at
+
+        self.repo.save_many(amenities)
+
+        pages = self.pages(2)
+
+        self.assertEqual(
+            sum(pages, []), sorted(amenity.id for amenity in amenities)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
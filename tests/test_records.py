@@ -0,0 +1,66 @@
+"""
+Tests for the conversion of model instances to the records the repositories
+store
+"""
+
+import importlib.util
+import os
+import unittest
+
+# Loaded from its file so the test does not need the app and its database
+_SPEC = importlib.util.spec_from_file_location(
+    "records",
+    os.path.join(
+        os.path.dirname(__file__), "..", "src", "persistence", "records.py"
+    ),
+)
+records = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(records)
+
+
+class Country:
+    """Stand-in for the ORM model, which has no id before it is stored"""
+
+    def __init__(self, name: str, code: str) -> None:
+        """Creates a country that was never stored"""
+        self.id = None
+        self.name = name
+        self.code = code
+        self.created_at = None
+        self.updated_at = None
+
+
+class TestToRecord(unittest.TestCase):
+    """Tests for to_record"""
+
+    def test_stamps_the_generated_values_on_the_object(self):
+        """The object passed gets the id and creation time of its record"""
+        country = Country("Uruguay", "UY")
+        record = records.to_record(country)
+
+        self.assertIsNotNone(country.id)
+        self.assertIsNotNone(country.created_at)
+        self.assertEqual(record.id, country.id)
+        self.assertEqual(record.created_at, country.created_at)
+
+    def test_keeps_the_values_of_a_stored_object(self):
+        """An object that has an id and creation time keeps them"""
+        country = Country("Uruguay", "UY")
+        records.to_record(country)
+        obj_id, created_at = country.id, country.created_at
+
+        record = records.to_record(country)
+
+        self.assertEqual(country.id, obj_id)
+        self.assertEqual(country.created_at, created_at)
+        self.assertEqual(record.id, obj_id)
+
+    def test_returns_records_unchanged(self):
+        """A record is already what the repositories store"""
+        record = records.Country(name="Uruguay", code="UY")
+
+        self.assertIs(records.to_record(record), record)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Tests for the repository stored in an SQLite database through sqlite3
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from src.persistence.sqlite import SQLiteRepository
+
+
+class TestSQLiteRepository(unittest.TestCase):
+    """Tests for the tables and seed data of SQLiteRepository"""
+
+    def setUp(self):
+        """Creates the path of a new database"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "data.db")
+
+    def open(self) -> SQLiteRepository:
+        """Opens the database, closed when the test ends"""
+        repo = SQLiteRepository(self.filename, pragmas={})
+        self.addCleanup(repo.close)
+
+        return repo
+
+    def test_seeds_the_dummy_country_once(self):
+        """A new database gets the dummy country, reopening it adds none"""
+        self.open().close()
+        countries = self.open().get_all("country")
+
+        self.assertEqual(
+            [(country.name, country.code) for country in countries],
+            [("Uruguay", "UY")],
+        )
+
+    def test_adds_the_code_to_an_earlier_country_table(self):
+        """A countries table made without the code column gets it"""
+        connection = sqlite3.connect(self.filename)
+        connection.execute(
+            "CREATE TABLE countries (id VARCHAR(36) PRIMARY KEY,"
+            " name VARCHAR(128), created_at TIMESTAMP, updated_at TIMESTAMP)"
+        )
+        connection.execute("INSERT INTO countries (id, name) VALUES (1, 'X')")
+        connection.commit()
+        connection.close()
+
+        countries = self.open().get_all("country")
+
+        self.assertEqual(
+            [(country.name, country.code) for country in countries],
+            [("X", None)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
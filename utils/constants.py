@@ -1,6 +1,82 @@
 """ Export constants for the application """
 
 REPOSITORY_ENV_VAR = "REPOSITORY"
+# Set to "1" for MemoryRepository to keep reviews in a columnar store
+MEMORY_COLUMNAR_ENV_VAR = "MEMORY_COLUMNAR_REVIEWS"
 
 FILE_STORAGE_FILENAME = "data.json"
+# Set to "binary" for FileRepository to keep its snapshot in
+# FILE_STORAGE_BINARY_FILENAME (see src/persistence/binary.py)
+FILE_STORAGE_FORMAT_ENV_VAR = "FILE_STORAGE_FORMAT"
+FILE_STORAGE_BINARY_FILENAME = "data.bin"
 PICKLE_STORAGE_FILENAME = "data.pkl"
+SQLITE_STORAGE_FILENAME = "data.sqlite3"
+KV_STORAGE_FILENAME = "data.kv"
+# Ids per bucket of the id sets of KVRepository, more buckets are added as
+# a set grows so writes rewrite a short list
+KV_STORAGE_BUCKET_SIZE = 256
+# Directory holding one pickle file per model and shard
+PICKLE_STORAGE_DIRNAME = "data.pkl.d"
+# Number of files each model is split into, by hash of the object id
+PICKLE_STORAGE_SHARDS = 1
+# Set to "1" for PickleRepository to keep reviews in columnar shards whose
+# columns are memory mapped on reload (see src/persistence/outofband.py)
+PICKLE_COLUMNAR_ENV_VAR = "PICKLE_COLUMNAR_REVIEWS"
+
+# Set to "journal" to append each write to FILE_STORAGE_JOURNAL_FILENAME
+# instead of rewriting FILE_STORAGE_FILENAME
+FILE_STORAGE_MODE_ENV_VAR = "FILE_STORAGE_MODE"
+FILE_STORAGE_JOURNAL_FILENAME = "data.journal"
+# Journal records after which the snapshot is rewritten and the journal
+# truncated
+FILE_STORAGE_COMPACT_THRESHOLD = 1000
+# Objects between two progress messages while reloading the file storage
+FILE_STORAGE_PROGRESS_EVERY = 100_000
+# Worker processes FileRepository reloads a JSON snapshot with, 1 reads it
+# in the current process (see src/persistence/parallel.py)
+FILE_STORAGE_RELOAD_WORKERS_ENV_VAR = "FILE_STORAGE_RELOAD_WORKERS"
+FILE_STORAGE_RELOAD_WORKERS = 1
+# Objects of each chunk a worker loads, and suffix of the chunk index
+FILE_STORAGE_RELOAD_CHUNK = 50_000
+FILE_STORAGE_CHUNKS_SUFFIX = ".chunks"
+
+# Compression of the file and pickle repositories' files: "none", "gzip",
+# "lzma", "bz2" or a codec registered in src/persistence/codecs.py
+STORAGE_COMPRESSION_ENV_VAR = "STORAGE_COMPRESSION"
+# Levels of the gzip and lzma codecs, trading size for write speed
+STORAGE_GZIP_LEVEL = 6
+STORAGE_LZMA_PRESET = 6
+
+# Set to "1" so the file and pickle repositories write from a background
+# thread instead of inside the request that changed the data
+STORAGE_WRITE_BEHIND_ENV_VAR = "STORAGE_WRITE_BEHIND"
+# Seconds a change may wait before being written in write-behind mode
+STORAGE_FLUSH_INTERVAL_ENV_VAR = "STORAGE_FLUSH_INTERVAL"
+STORAGE_FLUSH_INTERVAL = 1.0
+# Pending changes that trigger a write before the interval elapses
+STORAGE_FLUSH_THRESHOLD_ENV_VAR = "STORAGE_FLUSH_THRESHOLD"
+STORAGE_FLUSH_THRESHOLD = 100
+
+# Page size of collection endpoints when `limit` is not given, and the
+# largest `limit` accepted
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Set to "1" to wrap the repository with a read-through cache
+REPOSITORY_CACHE_ENV_VAR = "REPOSITORY_CACHE"
+# Largest number of cached entries, least recently used go first
+REPOSITORY_CACHE_SIZE_ENV_VAR = "REPOSITORY_CACHE_SIZE"
+REPOSITORY_CACHE_SIZE = 10_000
+# Seconds a cached entry is served before being read again
+REPOSITORY_CACHE_TTL_ENV_VAR = "REPOSITORY_CACHE_TTL"
+REPOSITORY_CACHE_TTL = 60.0
+# Path of the file the caches of every worker of a host use to tell each
+# other which models changed, sharing is disabled when unset
+REPOSITORY_CACHE_BUS_ENV_VAR = "REPOSITORY_CACHE_BUS"
+# Set to "1" for create_app to build and load the repository at startup
+# rather than on its first use
+REPOSITORY_EAGER_INIT_ENV_VAR = "REPOSITORY_EAGER_INIT"
+# Set to "1" to run each request in one repository transaction
+REPOSITORY_UNIT_OF_WORK_ENV_VAR = "REPOSITORY_UNIT_OF_WORK"
+# Objects copied per batch by `manage.py migrate-data`
+MIGRATION_BATCH_SIZE = 1_000
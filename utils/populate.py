@@ -5,7 +5,7 @@ from src.persistence.repository import Repository
 
 def populate_db(repo: Repository) -> None:
     """Populates the db with a dummy country"""
-    from src.models.country import Country
+    from src.persistence.records import Country
 
     countries = [
         Country(name="Uruguay", code="UY"),